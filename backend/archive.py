@@ -0,0 +1,246 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import logger
+from logger import (
+    EXPORT_COLUMNS, LOG_COUNTS_SQL, LOG_INDEXES, LOGS_FTS_SQL, LOGS_TABLE_SQL, UNLOCKED,
+    _register_functions, drop_archived_rows, finish_partition_moves, forget_archive, get_db
+)
+
+# Partition periods by name length: "2024-06" (month) or "2024-06-15" (day)
+ARCHIVE_PERIODS = {"month": 7, "day": 10}
+
+# One archive operation at a time (API calls and the retention thread)
+_archive_lock = threading.Lock()
+
+def period_range(name: str) -> Tuple[str, str]:
+    """[start, end) timestamps of a period name."""
+    if len(name) == ARCHIVE_PERIODS["month"]:
+        first = date.fromisoformat(f"{name}-01")
+        following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    elif len(name) == ARCHIVE_PERIODS["day"]:
+        first = date.fromisoformat(name)
+        following = first + timedelta(days=1)
+    else:
+        raise ValueError(f"Period must look like YYYY-MM or YYYY-MM-DD, got {name!r}")
+    return first.isoformat(), following.isoformat()
+
+def closed_periods(older_than_days: float, period: str = "month") -> List[str]:
+    """Periods that ended at least ``older_than_days`` ago, still have unlocked logs in logs.db and aren't archived."""
+    cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).isoformat()
+    length = ARCHIVE_PERIODS[period]
+    with get_db().reader() as conn:
+        names = [row[0] for row in conn.execute(f'''
+            SELECT DISTINCT substr(day, 1, {length}) FROM log_counts
+            WHERE count > locked AND substr(day, 1, {length}) NOT IN (SELECT name FROM log_partitions)
+            ORDER BY 1
+        ''')]
+    return [name for name in names if period_range(name)[1] <= cutoff]
+
+def archive_partition(name: str, compress: bool = False) -> Dict[str, Any]:
+    """
+    Move the unlocked logs of a closed period into a read-only archive file.
+
+    The archive (logs table with the same ids, indexes, search index and
+    per-day counts) is built from a read snapshot of logs.db without
+    blocking writers, then registered; the rows are then deleted from
+    logs.db in batches (see logger.finish_partition_moves). Locked logs stay
+    in logs.db. Stats rollups are unaffected.
+    """
+    start, end = period_range(name)
+    if end > datetime.utcnow().isoformat():
+        raise ValueError(f"Period {name} hasn't ended yet")
+    with _archive_lock:
+        partition = _build_partition(name, start, end)
+    return compress_partition(name) if compress else partition
+
+def _build_partition(name: str, start: str, end: str) -> Dict[str, Any]:
+    with get_db().reader() as conn:
+        if conn.execute('SELECT 1 FROM log_partitions WHERE name = ?', (name,)).fetchone():
+            raise ValueError(f"Period {name} is already archived")
+
+    started = time.perf_counter()
+    directory = logger._archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    file = f"logs-{name}.db"
+    path = directory / file
+    tmp = path.with_name(file + ".tmp")
+    tmp.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp, isolation_level=None)
+    _register_functions(conn)
+    try:
+        # A scratch file until it is renamed into place, so no journal needed
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(LOGS_TABLE_SQL.replace(" AUTOINCREMENT", ""))
+        conn.execute("ATTACH DATABASE ? AS hot", (f"file:{logger.DB_FILE.resolve()}?mode=ro",))
+        # Compressed bodies are copied as they are, with their previews
+        columns = ", ".join(EXPORT_COLUMNS + ("prompt_preview",))
+        conn.execute("BEGIN")
+        conn.execute(f'''
+            INSERT INTO logs ({columns})
+            SELECT {columns} FROM hot.logs
+            WHERE timestamp >= ? AND timestamp < ? AND {UNLOCKED}
+            ORDER BY id
+        ''', (start, end))
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE hot")
+
+        rows, min_id, max_id = conn.execute('SELECT COUNT(*), MIN(id), MAX(id) FROM logs').fetchone()
+        if not rows:
+            raise ValueError(f"No unlocked logs in {name}")
+        for index, column in LOG_INDEXES:
+            conn.execute(f'CREATE INDEX {index} ON logs({column})')
+        conn.execute(LOG_COUNTS_SQL)
+        conn.execute('''
+            INSERT INTO log_counts (day, tag, count, locked)
+            SELECT substr(timestamp, 1, 10), COALESCE(tag, ''), COUNT(*), 0 FROM logs GROUP BY 1, 2
+        ''')
+        try:
+            conn.execute(LOGS_FTS_SQL)
+            # Not 'rebuild', which would index the stored frames of compressed bodies
+            conn.execute('''
+                INSERT INTO logs_fts (rowid, prompt, response, error, tag)
+                SELECT id, log_body(prompt), log_body(response), error, tag FROM logs
+            ''')
+            conn.execute("INSERT INTO logs_fts (logs_fts) VALUES ('optimize')")
+        except sqlite3.OperationalError as e:
+            print(f"Archive {name} built without full-text search: {e}")
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("VACUUM")
+    except Exception:
+        conn.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    conn.close()
+    tmp.rename(path)
+    os.chmod(path, 0o444)
+
+    with get_db().writer() as conn:
+        conn.execute('''
+            INSERT INTO log_partitions (name, start_ts, end_ts, file, rows, min_id, max_id, visible_id, state, bytes, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 0, 'moving', ?, ?)
+        ''', (name, start, end, file, rows, min_id, max_id, path.stat().st_size, datetime.utcnow().isoformat()))
+    finish_partition_moves()
+    partition = _partition(name)
+    print(f"Archived {partition['rows']} logs from {name} in {time.perf_counter() - started:.1f}s.")
+    return partition
+
+def compress_partition(name: str) -> Dict[str, Any]:
+    """gzip an archived partition; it is decompressed into a cache when queried."""
+    with _archive_lock:
+        return _compress_partition(name)
+
+def _compress_partition(name: str) -> Dict[str, Any]:
+    partition = _partition(name)
+    if partition is None:
+        raise ValueError(f"Unknown partition {name}")
+    if partition["state"] != "archived":
+        raise ValueError(f"Partition {name} is still being moved")
+    if partition["file"].endswith(".gz"):
+        return partition
+    directory = logger._archive_dir()
+    path = directory / partition["file"]
+    target = path.with_name(path.name + ".gz")
+    tmp = target.with_name(target.name + ".tmp")
+    with open(path, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    tmp.rename(target)
+    os.chmod(target, 0o444)
+    with get_db().writer() as conn:
+        conn.execute(
+            'UPDATE log_partitions SET file = ?, bytes = ? WHERE name = ?',
+            (target.name, target.stat().st_size, name)
+        )
+    forget_archive(path.name)
+    path.unlink()
+    return _partition(name)
+
+def drop_partition(name: str) -> bool:
+    """Delete an archived partition and its logs for good."""
+    with _archive_lock:
+        return _drop_partition(name)
+
+def _drop_partition(name: str) -> bool:
+    partition = _partition(name)
+    if partition is None:
+        return False
+    if partition["state"] != "archived":
+        raise ValueError(f"Partition {name} is still being moved")
+    with get_db().writer() as conn:
+        conn.execute('DELETE FROM log_partitions WHERE name = ?', (name,))
+    forget_archive(partition["file"])
+    (logger._archive_dir() / partition["file"]).unlink(missing_ok=True)
+    return True
+
+def set_archived_lock(log_id: int, locked: bool) -> bool:
+    """
+    Lock status of a log held by an archive partition; False if none holds it.
+
+    Archived logs are all unlocked. Locking one moves it back into logs.db
+    (locked) and drops it from the archive, so retention never drops it
+    with its partition.
+    """
+    with _archive_lock:
+        with get_db().reader() as conn:
+            partition = conn.execute(
+                'SELECT * FROM log_partitions WHERE min_id <= ? AND max_id >= ? AND visible_id >= ?',
+                (log_id, log_id, log_id)
+            ).fetchone()
+        if partition is None:
+            return False
+        # Compressed bodies are copied as they are, with their previews
+        columns = EXPORT_COLUMNS + ("prompt_preview",)
+        with logger._archive_db(partition["file"]).reader() as archive:
+            row = archive.execute(f'SELECT {", ".join(columns)} FROM logs WHERE id = ?', (log_id,)).fetchone()
+        if row is None:
+            return False
+        if not locked:
+            return True
+        values = dict(zip(columns, row), locked=1)
+        with get_db().writer() as conn:
+            conn.execute(
+                f'INSERT INTO logs ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                [values[name] for name in columns]
+            )
+            # Before the insert commits, so the log is never read from both places
+            _drop_from_archive(partition["file"], [log_id])
+            conn.execute(
+                'UPDATE log_partitions SET rows = rows - 1, bytes = ? WHERE name = ?',
+                ((logger._archive_dir() / partition["file"]).stat().st_size, partition["name"])
+            )
+        return True
+
+def _drop_from_archive(file: str, ids: List[int]):
+    """Delete rows from an archive file; a gzipped one is unpacked, edited and packed again."""
+    path = logger._archive_dir() / file
+    if not file.endswith(".gz"):
+        drop_archived_rows(path, ids)
+        return
+    plain = path.with_name(path.name[:-3] + ".tmp")
+    packed = path.with_name(path.name + ".tmp")
+    try:
+        with gzip.open(path, "rb") as src, open(plain, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        drop_archived_rows(plain, ids)
+        with open(plain, "rb") as src, gzip.open(packed, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.chmod(packed, 0o444)
+        packed.rename(path)
+    finally:
+        plain.unlink(missing_ok=True)
+        packed.unlink(missing_ok=True)
+    # Drops the unpacked copy in the cache
+    forget_archive(file)
+
+def _partition(name: str) -> Optional[Dict[str, Any]]:
+    with get_db().reader() as conn:
+        row = conn.execute('SELECT * FROM log_partitions WHERE name = ?', (name,)).fetchone()
+    return dict(row) if row else None
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+from logger import ConnectionManager
+
+CACHE_DB_FILE = Path("../data/cache.db")
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024   # In-memory budget
+DEFAULT_TTL_SECONDS = 24 * 3600
+ENTRY_OVERHEAD_BYTES = 256             # Rough per-entry bookkeeping cost
+
+# Per-request cache controls
+CACHE_MODES = ("default", "bypass", "refresh")
+
+def make_cache_key(model: str, messages: List[Dict[str, Any]], temperature: float) -> str:
+    """Hash of the normalized request that determines the provider's answer."""
+    normalized = [
+        {"role": m.get("role"), "content": (m.get("content") or "").strip()}
+        for m in messages
+    ]
+    payload = json.dumps(
+        {"model": model, "messages": normalized, "temperature": temperature},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Exact-match cache of provider replies: (raw content, usage) by request key.
+
+    Entries live in an in-memory LRU bounded by ``max_bytes`` and, when
+    ``persistent`` is set, also in a SQLite table so they survive restarts.
+    Both tiers honour ``ttl_seconds``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        persistent: bool = False,
+        db_file: Path = CACHE_DB_FILE
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, dict, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._db: Optional[ConnectionManager] = None
+        if persistent:
+            db_file.parent.mkdir(parents=True, exist_ok=True)
+            self._db = ConnectionManager(db_file, pool_size=2)
+            with self._db.writer() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS response_cache (
+                        key TEXT PRIMARY KEY,
+                        content TEXT NOT NULL,
+                        usage TEXT,
+                        expires_at REAL NOT NULL
+                    ) WITHOUT ROWID
+                ''')
+                conn.execute('DELETE FROM response_cache WHERE expires_at < ?', (time.time(),))
+
+    def get(self, key: str) -> Optional[Tuple[str, dict]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                content, usage, expires_at, size = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return content, usage
+                del self._entries[key]
+                self._bytes -= size
+
+        if self._db is not None:
+            try:
+                with self._db.reader() as conn:
+                    row = conn.execute(
+                        'SELECT content, usage, expires_at FROM response_cache WHERE key = ?', (key,)
+                    ).fetchone()
+                if row and row["expires_at"] >= now:
+                    usage = json.loads(row["usage"]) if row["usage"] else {}
+                    self._remember(key, row["content"], usage, row["expires_at"])
+                    with self._lock:
+                        self.hits += 1
+                    return row["content"], usage
+            except Exception as e:
+                print(f"Error reading response cache: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, content: str, usage: Optional[dict] = None):
+        usage = usage or {}
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, content, usage, expires_at)
+        if self._db is not None:
+            try:
+                with self._db.writer() as conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO response_cache (key, content, usage, expires_at) VALUES (?, ?, ?, ?)',
+                        (key, content, json.dumps(usage), expires_at)
+                    )
+            except Exception as e:
+                print(f"Error writing response cache: {e}")
+
+    def _remember(self, key: str, content: str, usage: dict, expires_at: float):
+        size = len(content.encode("utf-8")) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[3]
+            self._entries[key] = (content, usage, expires_at, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[3]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "persistent": self._db is not None
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._db is not None:
+            with self._db.writer() as conn:
+                conn.execute('DELETE FROM response_cache')
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,121 @@
+import os
+import threading
+from typing import Dict, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies shorter than this (UTF-8 bytes) stay plain TEXT; 0 turns compression off
+COMPRESS_MIN_BYTES = int(os.getenv("SIMPLE_LLM_COMPRESS_MIN_BYTES", "4096"))
+COMPRESS_LEVEL = 3
+PREVIEW_CHARS = 200           # Prompt characters shown in list views (stored uncompressed for compressed prompts)
+DICT_SIZE = 112640            # zstd's default dictionary size (110KB)
+DICT_TRAIN_SAMPLES = 2000     # Recent large bodies a dictionary is trained on
+DICT_TRAIN_AFTER = 500        # Bodies compressed without a dictionary before one is trained
+MISSING_CODEC = "Reading compressed logs requires zstandard (pip install zstandard)"
+
+class BodyCodec:
+    """
+    zstd compression for large prompt and response bodies.
+
+    Text of at least ``min_bytes`` is encoded as a zstd frame (a BLOB), shorter
+    text is returned unchanged, so stored values tell themselves apart by
+    type. Frames record the id of the shared dictionary they were compressed
+    with; every dictionary stays registered for reading while only the
+    active (newest) one is used for writing. zstd contexts aren't thread-safe,
+    so each thread keeps its own.
+    """
+
+    def __init__(self, min_bytes: int = COMPRESS_MIN_BYTES, level: int = COMPRESS_LEVEL):
+        self.min_bytes = min_bytes
+        self.level = level
+        self.active: Optional[int] = None
+        self.compressed = 0  # Bodies compressed without a dictionary (see DICT_TRAIN_AFTER)
+        self._dicts: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self._local = threading.local()
+
+    @property
+    def available(self) -> bool:
+        """zstandard is installed (needed to read compressed bodies)."""
+        return zstandard is not None
+
+    @property
+    def enabled(self) -> bool:
+        """New bodies get compressed."""
+        return zstandard is not None and self.min_bytes > 0
+
+    def add_dictionary(self, data: bytes, active: bool = False) -> int:
+        """Register a trained dictionary; returns its zstd dict id."""
+        dictionary = zstandard.ZstdCompressionDict(data)
+        dictionary.precompute_compress(level=self.level)
+        dict_id = dictionary.dict_id()
+        self._dicts[dict_id] = dictionary
+        if active:
+            self.active = dict_id
+        return dict_id
+
+    def has_dictionary(self, dict_id: int) -> bool:
+        return dict_id in self._dicts
+
+    def clear(self):
+        self._dicts = {}
+        self.active = None
+        self.compressed = 0
+        self._local = threading.local()
+
+    def _contexts(self) -> tuple:
+        local = self._local
+        if not hasattr(local, "compressors"):
+            local.compressors = {}
+            local.decompressors = {}
+        return local.compressors, local.decompressors
+
+    def encode(self, text: Optional[str]) -> Union[str, bytes, None]:
+        if text is None or not self.enabled:
+            return text
+        data = text.encode("utf-8")
+        if len(data) < self.min_bytes:
+            return text
+        dict_id = self.active
+        compressors, _ = self._contexts()
+        compressor = compressors.get(dict_id)
+        if compressor is None:
+            dictionary = self._dicts.get(dict_id) if dict_id else None
+            compressor = compressors[dict_id] = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+        if dict_id is None:
+            self.compressed += 1
+        return compressor.compress(data)
+
+    def decode(self, value: Union[str, bytes, None]) -> Optional[str]:
+        """
+        Text of a stored value. Raises LookupError(dict_id) for a frame whose
+        dictionary isn't registered yet.
+        """
+        if not isinstance(value, bytes):
+            return value
+        if zstandard is None:
+            raise RuntimeError(MISSING_CODEC)
+        dict_id = zstandard.get_frame_parameters(value).dict_id
+        _, decompressors = self._contexts()
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            if dict_id and dict_id not in self._dicts:
+                raise LookupError(dict_id)
+            dictionary = self._dicts[dict_id] if dict_id else None
+            decompressor = decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return decompressor.decompress(value).decode("utf-8")
+
+    def train(self, samples: List[str], dict_size: int = DICT_SIZE) -> bytes:
+        """Train a dictionary on sample bodies; returns its bytes for add_dictionary()."""
+        if zstandard is None:
+            raise RuntimeError("Training a dictionary requires zstandard (pip install zstandard)")
+        data = [sample.encode("utf-8") for sample in samples]
+        return zstandard.train_dictionary(dict_size, data, level=self.level).as_bytes()
+
+def preview(text: Optional[str]) -> Optional[str]:
+    return text[:PREVIEW_CHARS] if text is not None else None
+
+# Singleton instance
+body_codec = BodyCodec()
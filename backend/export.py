@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List
+
+from logger import EXPORT_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+_RESPONSE = EXPORT_FIELDS.index("response")
+_METADATA = EXPORT_FIELDS.index("metadata")
+_LOCKED = EXPORT_FIELDS.index("locked")
+_SCALARS = [i for i in range(len(EXPORT_FIELDS)) if i not in (_RESPONSE, _METADATA)]
+_SCALAR_NAMES = [EXPORT_FIELDS[i] for i in _SCALARS]
+_SCALAR_LOCKED = _SCALARS.index(_LOCKED)
+_ENCODER = json.JSONEncoder(ensure_ascii=False)  # json.dumps(ensure_ascii=False) builds one per call
+
+def ndjson_chunks(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """One JSON object per row; response/metadata are spliced in as stored (already JSON)."""
+    for rows in batches:
+        lines = []
+        for row in rows:
+            scalars = [row[i] for i in _SCALARS]
+            scalars[_SCALAR_LOCKED] = bool(row[_LOCKED])
+            head = _ENCODER.encode(dict(zip(_SCALAR_NAMES, scalars)))
+            lines.append(
+                f'{head[:-1]}, "response": {row[_RESPONSE] or "null"}, "metadata": {row[_METADATA] or "null"}}}\n'
+            )
+        yield "".join(lines).encode("utf-8")
+
+def csv_chunks(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """CSV with a header row; response/metadata columns hold their JSON text."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+class _ChunkSink:
+    """Write-only file object that hands out what was written since the last take()."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+def _parquet_schema():
+    text = pa.string()
+    integer = pa.int64()
+    types = {
+        "id": integer, "duration_ms": pa.float64(), "locked": pa.bool_(),
+        "prompt_tokens": integer, "completion_tokens": integer, "total_tokens": integer, "schema_id": integer,
+    }
+    return pa.schema([(name, types.get(name, text)) for name in EXPORT_FIELDS])
+
+def parquet_chunks(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """Parquet file streamed one row group per batch (requires pyarrow)."""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in batches:
+            columns = [list(column) for column in zip(*rows)]
+            columns[_LOCKED] = [bool(value) for value in columns[_LOCKED]]
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+def export_chunks(fmt: str, batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    if fmt == "csv":
+        return csv_chunks(batches)
+    if fmt == "parquet":
+        return parquet_chunks(batches)
+    return ndjson_chunks(batches)
@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = 1024      # Smaller bodies are sent as they are
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5            # Close to gzip -6 in speed, smaller output on JSON
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+def _accepted(accept_encoding: str) -> Optional[str]:
+    """Preferred content coding the client accepts: br (if brotli is installed), then gzip."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip()] = q
+    for coding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in tags]
+
+class CompactResponseMiddleware:
+    """
+    ETags and compression for complete (single-message) responses.
+
+    Successful GETs get a weak ETag hashed from the body and
+    ``Cache-Control: no-cache``, so browsers revalidate with If-None-Match
+    and an unchanged page comes back as an empty 304. Bodies of at least
+    ``minimum_size`` are brotli or gzip compressed as Accept-Encoding allows.
+    Streaming responses (server-sent events, exports) pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        coding = _accepted(request_headers.get("accept-encoding", ""))
+        if_none_match = request_headers.get("if-none-match") if scope["method"] == "GET" else None
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start = message
+            elif message.get("more_body", False):
+                # A stream: send it on as it comes
+                passthrough = True
+                await send(start)
+                await send(message)
+            else:
+                await self._send_complete(start, message.get("body", b""), scope["method"], coding, if_none_match, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_complete(self, start, body: bytes, method: str, coding: Optional[str],
+                             if_none_match: Optional[str], send):
+        headers = MutableHeaders(raw=start["headers"])
+        compressible = headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+        if method == "GET" and start["status"] == 200 and "etag" not in headers:
+            etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            headers["ETag"] = etag
+            if "cache-control" not in headers:
+                headers["Cache-Control"] = "no-cache"
+            if if_none_match and _etag_matches(if_none_match, etag):
+                for name in ("content-length", "content-type", "content-encoding"):
+                    if name in headers:
+                        del headers[name]
+                await send({**start, "status": 304})
+                await send({"type": "http.response.body", "body": b""})
+                return
+        if compressible and coding and len(body) >= self.minimum_size and "content-encoding" not in headers:
+            if coding == "br":
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            headers["Content-Encoding"] = coding
+            headers["Content-Length"] = str(len(body))
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
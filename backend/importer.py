@@ -0,0 +1,148 @@
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from logger import get_db, _insert_logs, _log_row
+
+IMPORT_CHUNK_SIZE = 10000     # Lines parsed and committed per transaction
+MAX_ERROR_SAMPLES = 10        # Bad lines reported back per import
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False)  # json.dumps(ensure_ascii=False) builds one per call
+
+Line = Union[str, bytes]
+
+class LogImporter:
+    """
+    Bulk loader for JSONL logs: the legacy llm.jsonl file, or the NDJSON
+    written by GET /api/logs/export on this or another instance.
+
+    Lines are committed ``chunk_size`` at a time, each chunk in one
+    transaction together with a checkpoint (the number of lines consumed)
+    stored in log_meta under ``import:<import_id>``. Re-running an import
+    with the same id skips the lines that were already committed, so an
+    interrupted import resumes where it stopped and a finished one is a no-op.
+
+    Ids, schema_id and the typed columns of exported rows are not copied;
+    rows get new ids and their typed columns are derived again from the
+    metadata. An entry's "schema" text (as written by the export and
+    returned by GET /api/logs/{id}) is stored in the schema table; entries
+    with a schema_id but no schema text (exports from before the text was
+    included) are imported without it and counted in ``unresolved_schemas``.
+    """
+
+    def __init__(self, import_id: Optional[str] = None, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.import_id = import_id
+        self.chunk_size = chunk_size
+        self.lines = 0
+        self.imported = 0
+        self.skipped = 0
+        self.errors = 0
+        self.unresolved_schemas = 0
+        self.error_samples: List[str] = []
+        self.resume_from = 0
+        self._started = time.perf_counter()
+        if import_id:
+            with get_db().reader() as conn:
+                row = conn.execute('SELECT value FROM log_meta WHERE key = ?', (self._meta_key,)).fetchone()
+            self.resume_from = int(row[0]) if row else 0
+
+    @property
+    def _meta_key(self) -> str:
+        return f"import:{self.import_id}"
+
+    def add_lines(self, lines: List[Line]):
+        """Parse and commit one chunk of lines in a single transaction."""
+        rows = []
+        locked = []
+        for line in lines:
+            self.lines += 1
+            if self.lines <= self.resume_from:
+                self.skipped += 1
+                continue
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                rows.append(_entry_row(entry))
+                locked.append(bool(entry.get("locked")))
+                if entry.get("schema_id") is not None and not entry.get("schema"):
+                    self.unresolved_schemas += 1
+            except Exception as e:
+                self.errors += 1
+                if len(self.error_samples) < MAX_ERROR_SAMPLES:
+                    self.error_samples.append(f"line {self.lines}: {e}")
+
+        if not rows and not self.import_id:
+            return
+        with get_db().writer() as conn:
+            if rows:
+                first_id = _insert_logs(conn, rows)
+                locked_ids = [first_id + i for i, is_locked in enumerate(locked) if is_locked]
+                if locked_ids:
+                    conn.executemany('UPDATE logs SET locked = 1 WHERE id = ?', [(i,) for i in locked_ids])
+            if self.import_id and self.lines > self.resume_from:
+                conn.execute(
+                    'INSERT OR REPLACE INTO log_meta (key, value) VALUES (?, ?)',
+                    (self._meta_key, str(self.lines))
+                )
+        self.imported += len(rows)
+
+    def import_lines(self, lines: Iterable[Line], progress: bool = False) -> Dict[str, Any]:
+        """Import every line of ``lines`` in chunks, optionally printing progress."""
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) >= self.chunk_size:
+                self.add_lines(chunk)
+                chunk = []
+                if progress:
+                    self.print_progress()
+        if chunk:
+            self.add_lines(chunk)
+            if progress:
+                self.print_progress()
+        return self.progress()
+
+    def progress(self) -> Dict[str, Any]:
+        seconds = time.perf_counter() - self._started
+        return {
+            "import_id": self.import_id,
+            "lines": self.lines,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "unresolved_schemas": self.unresolved_schemas,
+            "error_samples": self.error_samples,
+            "seconds": round(seconds, 2),
+            "rows_per_second": round(self.imported / seconds) if seconds else 0,
+        }
+
+    def print_progress(self):
+        p = self.progress()
+        print(
+            f"  {p['lines']} lines, {p['imported']} imported, {p['skipped']} already imported, "
+            f"{p['errors']} errors ({p['seconds']:.1f}s, {p['rows_per_second']} rows/s)"
+        )
+        if p["unresolved_schemas"]:
+            print(f"  {p['unresolved_schemas']} logs had a schema_id without its schema text; imported without a schema")
+
+def _entry_row(entry: Dict[str, Any]) -> tuple:
+    """Map a legacy or exported log entry onto a _log_row() row."""
+    if not isinstance(entry, dict):
+        raise ValueError("expected a JSON object")
+    metadata = entry.get("metadata") or {}
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    if entry.get("schema") and "schema" not in metadata:
+        metadata = dict(metadata, schema=entry["schema"])
+    return _log_row(
+        entry.get("timestamp") or datetime.utcnow().isoformat(),
+        entry.get("model"),
+        entry.get("prompt"),
+        _ENCODER.encode(entry.get("response")),
+        entry.get("duration_ms"),
+        entry.get("error"),
+        metadata,
+        entry.get("tag"),
+    )
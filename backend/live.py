@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from logger import add_log_listener, logs_after, remove_log_listener
+
+LIVE_BUFFER_SIZE = 1000       # Logs queued per subscriber before it is dropped as too slow
+LIVE_RESUME_LIMIT = 1000      # Missed logs replayed on reconnect before asking for a reload
+LIVE_KEEPALIVE = 15.0         # Seconds of silence before a keepalive event
+
+_DROPPED = object()
+
+class Subscription:
+    """One live tail: logs matching its filters, queued for one client."""
+
+    def __init__(self, tag: Optional[str], model: Optional[str], buffer_size: int):
+        self.tag = tag
+        self.model = model
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size + 1)
+        self.buffer_size = buffer_size
+        self.dropped = False
+
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        return (self.tag is None or entry["tag"] == self.tag) and (self.model is None or entry["model"] == self.model)
+
+    def offer(self, entries: List[Dict[str, Any]]):
+        """Queue entries (on the subscriber's loop); a full buffer drops the subscriber."""
+        if self.dropped:
+            return
+        for entry in entries:
+            if self.queue.qsize() >= self.buffer_size:
+                self.dropped = True
+                self.queue.put_nowait(_DROPPED)
+                return
+            self.queue.put_nowait(entry)
+
+class LogBroker:
+    """
+    In-process pub/sub for newly written logs.
+
+    The log writer publishes each committed batch (see
+    logger.add_log_listener); every subscription gets the matching entries
+    through its own bounded queue, filtered on the writer thread. A
+    subscriber that falls LIVE_BUFFER_SIZE logs behind is dropped instead of
+    buffering without limit; it reconnects and resumes from its last id.
+    """
+
+    def __init__(self, buffer_size: int = LIVE_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, tag: Optional[str] = None, model: Optional[str] = None) -> Subscription:
+        subscription = Subscription(tag, model, self.buffer_size)
+        with self._lock:
+            self._subscriptions.append(subscription)
+            add_log_listener(self.publish)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            if not self._subscriptions:
+                # Nobody listening: the write path skips reading back new rows
+                remove_log_listener(self.publish)
+
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
+
+    def publish(self, entries: List[Dict[str, Any]]):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            matched = [entry for entry in entries if subscription.matches(entry)]
+            if matched:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, matched)
+                except RuntimeError:
+                    pass  # Event loop already closed
+
+    async def tail(
+        self,
+        after_id: Optional[int] = None,
+        tag: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield {"event": "log", "data": entry} for new logs as they are written.
+
+        With ``after_id`` (the last id a client saw) the logs it missed are
+        replayed first; if more than LIVE_RESUME_LIMIT were missed it gets
+        {"event": "reset"} instead and should reload its page. Ends with
+        {"event": "dropped"} when the client fell too far behind. Yields
+        {"event": "keepalive"} after LIVE_KEEPALIVE seconds without logs.
+        """
+        # Subscribe before reading the backlog so nothing falls in between
+        subscription = self.subscribe(tag, model)
+        try:
+            replayed = None
+            if after_id is not None:
+                missed = await asyncio.to_thread(logs_after, after_id, LIVE_RESUME_LIMIT + 1, tag, model)
+                if len(missed) > LIVE_RESUME_LIMIT:
+                    yield {"event": "reset"}
+                    missed = []
+                for entry in missed:
+                    replayed = entry["id"]
+                    yield {"event": "log", "data": entry}
+            while True:
+                try:
+                    entry = await asyncio.wait_for(subscription.queue.get(), LIVE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield {"event": "keepalive"}
+                    continue
+                if entry is _DROPPED:
+                    yield {"event": "dropped"}
+                    return
+                # Skip logs already replayed from the database
+                if replayed is None or entry["id"] > replayed:
+                    yield {"event": "log", "data": entry}
+        finally:
+            self.unsubscribe(subscription)
+
+# Singleton instance
+log_broker = LogBroker()
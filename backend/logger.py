@@ -1,40 +1,322 @@
+import asyncio
+import gzip
+import hashlib
+import heapq
 import json
+import math
+import os
+import queue
+import shutil
 import sqlite3
+import threading
 import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from itertools import islice
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, Any, Optional, List
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Any, Optional, List, Tuple
+
+from compression import DICT_TRAIN_AFTER, DICT_TRAIN_SAMPLES, MISSING_CODEC, PREVIEW_CHARS, body_codec, preview
+from metrics import Gauge, LOG_ROWS, LOG_WRITE_SECONDS
 
 DB_FILE = Path("../data/logs.db")
 LEGACY_LOG_FILE = Path("../logs/llm.jsonl")
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Connection tuning
+READER_POOL_SIZE = 4
+STATEMENT_CACHE_SIZE = 256
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",   # Safe with WAL, avoids an fsync per commit
+    "PRAGMA cache_size = -16000",    # ~16MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Full-text search
+FTS_BACKFILL_CHUNK = 5000     # Rows indexed per transaction when backfilling
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+SNIPPET_TOKENS = 16
+SNIPPET_SQL = f"snippet(logs_fts, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS})"
+
+# Analytics rollups
+LATENCY_BUCKET_BASE = 1.1     # Log-scale latency buckets, ~5% relative error on percentiles
+ROLLUP_BACKFILL_CHUNK = 10000
+STATS_GROUPS = {"model": "model", "tag": "tag", "hour": "period", "day": "substr(period, 1, 10)"}
+
+# Write-behind log queue
+LOG_BATCH_SIZE = 200          # Max rows per transaction
+LOG_FLUSH_INTERVAL = 0.05     # Seconds to wait for a batch to fill
+LOG_QUEUE_SIZE = 10000        # Pending rows before callers are slowed down
+LOG_QUEUE_PUT_TIMEOUT = 5.0   # Seconds to wait for queue space before writing inline
+SYNC_LOG_WRITES = os.getenv("SIMPLE_LLM_SYNC_LOGS", "").lower() in ("1", "true", "yes")
+
+# Typed columns promoted out of the metadata blob (see _log_row)
+TYPED_COLUMNS = ("format", "provider", "status", "prompt_tokens", "completion_tokens", "total_tokens")
+# The last row column, schema_id, holds the schema text until _insert_logs
+# swaps it for the id of its content-addressed log_schemas row
+LOG_ROW_COLUMNS = (
+    "timestamp", "model", "prompt", "response", "duration_ms", "error", "metadata", "tag"
+) + TYPED_COLUMNS + ("prompt_preview", "schema_id")
+INSERT_LOG_SQL = f'''
+    INSERT INTO logs ({", ".join(LOG_ROW_COLUMNS)}, locked)
+    VALUES ({", ".join("?" * len(LOG_ROW_COLUMNS))}, 0)
+'''
+COLUMN_BACKFILL_CHUNK = 5000
+
+# Secondary indexes on logs (dropped and rebuilt around deferred bulk imports)
+LOG_INDEXES = (
+    ("idx_logs_timestamp", "timestamp"),
+    ("idx_logs_tag", "tag"),
+    ("idx_logs_locked", "locked"),
+    ("idx_logs_format", "format"),
+    ("idx_logs_provider", "provider"),
+    ("idx_logs_status", "status"),
+    ("idx_logs_total_tokens", "total_tokens"),
+    ("idx_logs_duration", "duration_ms"),
+    ("idx_logs_schema_id", "schema_id"),
+)
+SCHEMA_BACKFILL_CHUNK = 5000
+SCHEMA_ID_CACHE_SIZE = 1024   # schema hash -> id entries kept in memory
+
+# Light list rows leave out the response and metadata blobs
+LIST_COLUMNS = ("id", "timestamp", "model", "prompt", "duration_ms", "error", "locked", "tag", "schema_id") + TYPED_COLUMNS
+# ...and cut the prompt to a fixed-length preview in SQL (compressed prompts have theirs stored, see _log_row)
+LIST_SELECT = ", ".join(
+    f"substr(IFNULL(logs.prompt_preview, logs.prompt), 1, {PREVIEW_CHARS}) AS prompt" if name == "prompt"
+    else f"logs.{name}" for name in LIST_COLUMNS
+)
+LOG_SORT_COLUMNS = ("id", "duration_ms", "total_tokens")
+
+# Exports: raw response/metadata JSON text, fetched from one cursor in chunks
+EXPORT_COLUMNS = (
+    "id", "timestamp", "model", "prompt", "response", "duration_ms", "error", "metadata", "locked", "tag"
+) + TYPED_COLUMNS + ("schema_id",)
+# Exported rows also carry their schema text: schema_id only means something on this instance
+EXPORT_FIELDS = EXPORT_COLUMNS + ("schema",)
+_EXPORT_SCHEMA_ID = EXPORT_COLUMNS.index("schema_id")
+EXPORT_SELECT = ", ".join(f"log_body({name}) AS {name}" if name in ("prompt", "response") else name for name in EXPORT_COLUMNS)
+EXPORT_CHUNK_SIZE = 2000
+
+# Retention: deletes run in short transactions so queued log writes get the writer in between
+RETENTION_BATCH_SIZE = 200
+RETENTION_BATCH_PAUSE = 0.01  # Seconds to yield the writer between batches
+VACUUM_STEP_PAGES = 1000      # Free pages returned to the filesystem per transaction
+FTS_MERGE_PAGES = 50          # Search index pages rewritten per compaction step
+FTS_MERGE_MAX_STEPS = 1000    # Compaction steps per retention run
+# Written so it can't use idx_logs_locked: the planner would pick it and sort every unlocked row per batch
+UNLOCKED = "IFNULL(locked, 0) = 0"
+
+# Archive partitions: closed periods moved out of logs.db into read-only files (see archive.py)
+ARCHIVE_CACHE_FILES = 4       # Archives kept open (and decompressed, for .db.gz) for queries
+
+# Shared with archive partitions (which keep the ids but not AUTOINCREMENT)
+LOGS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        model TEXT,
+        prompt TEXT,
+        response TEXT,
+        duration_ms REAL,
+        error TEXT,
+        metadata TEXT,
+        locked BOOLEAN DEFAULT 0,
+        tag TEXT,
+        format TEXT,
+        provider TEXT,
+        status TEXT,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        total_tokens INTEGER,
+        schema_id INTEGER,
+        prompt_preview TEXT
+    )
+'''
+LOG_COUNTS_SQL = '''
+    CREATE TABLE IF NOT EXISTS log_counts (
+        day TEXT NOT NULL,
+        tag TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        locked INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, tag)
+    ) WITHOUT ROWID
+'''
+LOGS_FTS_SQL = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+        prompt, response, error, tag,
+        content = 'logs', content_rowid = 'id',
+        tokenize = '{FTS_TOKENIZE}'
+    )
+'''
+
+class ConnectionManager:
+    """
+    Long-lived SQLite connections for one database file.
+
+    A single writer connection (serialized by a lock) and a small pool of
+    read-only connections. The database runs in WAL mode so readers never
+    block the writer and vice versa. Statements are compiled once per
+    connection and reused through sqlite3's statement cache.
+    """
+
+    def __init__(self, db_file: Path, pool_size: int = READER_POOL_SIZE):
+        self.db_file = Path(db_file)
+        self.pool_size = pool_size
+        self._write_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_count = 0
+        self._closed = False
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        if readonly:
+            conn = sqlite3.connect(
+                f"file:{self.db_file.resolve()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_file,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+            # Only takes effect on a new database (or at the next VACUUM);
+            # lets incremental_vacuum() return pages freed by retention
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        conn.row_factory = sqlite3.Row
+        _register_functions(conn)
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Yield the writer connection inside a transaction (commit on success)."""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def dedicated_reader(self):
+        """A read-only connection outside the pool, for long scans such as exports."""
+        conn = self._connect(readonly=True)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection from the pool."""
+        conn = None
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                if self._reader_count < self.pool_size:
+                    self._reader_count += 1
+                    try:
+                        conn = self._connect(readonly=True)
+                    except Exception:
+                        self._reader_count -= 1
+                        raise
+            if conn is None:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._readers.put(conn)
+
+    def close(self):
+        """Close all connections held by the manager."""
+        self._closed = True
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+_manager: Optional[ConnectionManager] = None
+_manager_lock = threading.Lock()
+_schema_ids: Dict[str, int] = {}
+
+def get_db() -> ConnectionManager:
+    """Return the connection manager for DB_FILE, creating it on first use."""
+    global _manager
+    manager = _manager
+    if manager is None or manager.db_file != Path(DB_FILE):
+        with _manager_lock:
+            if _manager is None or _manager.db_file != Path(DB_FILE):
+                if _manager is not None:
+                    _manager.close()
+                _schema_ids.clear()
+                body_codec.clear()
+                _manager = ConnectionManager(DB_FILE)
+            manager = _manager
+    return manager
+
+def close_db():
+    """Close pooled connections (called on application shutdown)."""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+            _manager = None
+    with _archives_lock:
+        while _archives:
+            _archives.popitem()[1].close()
 
 def init_db():
     """Initialize the SQLite database and migrate legacy logs if they exist."""
     DB_FILE.parent.mkdir(parents=True, exist_ok=True)
     
-    conn = get_db_connection()
+    with get_db().writer() as conn:
+        _init_schema(conn)
+        
+    # Check for legacy file and migrate
+    if LEGACY_LOG_FILE.exists():
+        from importer import LogImporter
+        print(f"Migrating legacy logs from {LEGACY_LOG_FILE}...")
+        try:
+            importer = LogImporter(import_id=f"legacy:{LEGACY_LOG_FILE.resolve()}")
+            with open(LEGACY_LOG_FILE, "rb") as f:
+                importer.import_lines(f)
+            for sample in importer.error_samples:
+                print(f"Skipping bad line during migration: {sample}")
+            print(f"Migrated {importer.imported} logs.")
+            # Rename legacy file so we don't migrate again
+            LEGACY_LOG_FILE.rename(LEGACY_LOG_FILE.with_suffix(".jsonl.bak"))
+        except Exception as e:
+            print(f"Migration failed: {e}")
+
+def _init_schema(conn: sqlite3.Connection):
     c = conn.cursor()
     
     # Create table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            model TEXT,
-            prompt TEXT,
-            response TEXT,
-            duration_ms REAL,
-            error TEXT,
-            metadata TEXT,
-            locked BOOLEAN DEFAULT 0,
-            tag TEXT
-        )
-    ''')
+    c.execute(LOGS_TABLE_SQL)
     
     try:
         c.execute('ALTER TABLE logs ADD COLUMN locked BOOLEAN DEFAULT 0')
@@ -46,42 +328,1133 @@ def init_db():
     except sqlite3.OperationalError:
         pass # Column likely already exists
 
-    # Check for legacy file and migrate
-    if LEGACY_LOG_FILE.exists():
-        print(f"Migrating legacy logs from {LEGACY_LOG_FILE}...")
+    _init_typed_columns(c)
+    _init_schemas(c)
+    _init_compression(c)
+
+    # Indexes for date-range filters, tag lookups, lock-aware purges and the typed columns
+    for name, column in LOG_INDEXES:
+        c.execute(f'CREATE INDEX IF NOT EXISTS {name} ON logs({column})')
+
+    _init_counters(c)
+    _init_search(c)
+    _init_rollups(c)
+    _init_partitions(c)
+
+def _init_typed_columns(c: sqlite3.Cursor):
+    """
+    Add the typed columns (format, provider, status, token counts).
+
+    New rows fill them in _log_row. When the columns are added to a database
+    that already holds logs, those rows are filled later by
+    backfill_typed_columns() in small transactions.
+    """
+    existing = {row[1] for row in c.execute('PRAGMA table_info(logs)')}
+    missing = [name for name in TYPED_COLUMNS if name not in existing]
+    for name in missing:
+        kind = "TEXT" if name in ("format", "provider", "status") else "INTEGER"
+        c.execute(f'ALTER TABLE logs ADD COLUMN {name} {kind}')
+    if missing:
+        c.execute('CREATE TABLE IF NOT EXISTS log_meta (key TEXT PRIMARY KEY, value TEXT)')
+        max_id = c.execute('SELECT MAX(id) FROM logs').fetchone()[0]
+        if max_id:
+            c.executemany(
+                'INSERT OR REPLACE INTO log_meta (key, value) VALUES (?, ?)',
+                [("columns_backfill_last_id", "0"), ("columns_backfill_max_id", str(max_id))]
+            )
+
+def _init_schemas(c: sqlite3.Cursor):
+    """
+    Content-addressed store for dict-mode schemas.
+
+    Each distinct schema text is stored once in log_schemas (keyed by its
+    SHA-256) and logs reference it through schema_id instead of repeating it
+    in the metadata blob. Older rows that still carry metadata.schema are
+    moved over by backfill_schemas().
+    """
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS log_schemas (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL UNIQUE,
+            schema TEXT NOT NULL
+        )
+    ''')
+    existing = {row[1] for row in c.execute('PRAGMA table_info(logs)')}
+    if "schema_id" not in existing:
+        c.execute('ALTER TABLE logs ADD COLUMN schema_id INTEGER')
+        c.execute('CREATE TABLE IF NOT EXISTS log_meta (key TEXT PRIMARY KEY, value TEXT)')
+        max_id = c.execute('SELECT MAX(id) FROM logs').fetchone()[0]
+        if max_id:
+            c.executemany(
+                'INSERT OR REPLACE INTO log_meta (key, value) VALUES (?, ?)',
+                [("schema_backfill_last_id", "0"), ("schema_backfill_max_id", str(max_id))]
+            )
+
+def _schema_text(schema: Any) -> Optional[str]:
+    if schema is None or schema == "":
+        return None
+    if isinstance(schema, str):
+        return schema
+    return json.dumps(schema, ensure_ascii=False, sort_keys=True)
+
+def _schema_id(conn: sqlite3.Connection, schema: Optional[str]) -> Optional[int]:
+    """Id of the log_schemas row for this schema text, inserting it if new."""
+    if schema is None:
+        return None
+    digest = hashlib.sha256(schema.encode("utf-8")).hexdigest()
+    schema_id = _schema_ids.get(digest)
+    if schema_id is not None:
+        return schema_id
+    inserted = conn.execute(
+        'INSERT OR IGNORE INTO log_schemas (hash, schema) VALUES (?, ?)', (digest, schema)
+    ).rowcount
+    schema_id = conn.execute('SELECT id FROM log_schemas WHERE hash = ?', (digest,)).fetchone()[0]
+    # Ids inserted in this transaction are only cached once seen committed,
+    # so a rolled-back batch can't leave a dangling id behind
+    if not inserted:
+        if len(_schema_ids) >= SCHEMA_ID_CACHE_SIZE:
+            _schema_ids.clear()
+        _schema_ids[digest] = schema_id
+    return schema_id
+
+def backfill_schemas(chunk_size: int = SCHEMA_BACKFILL_CHUNK) -> int:
+    """Move metadata.schema of older logs into log_schemas. Returns rows updated."""
+    if not DB_FILE.exists():
+        return 0
+    updated = 0
+    try:
+        with get_db().reader() as conn:
+            meta = dict(conn.execute(
+                "SELECT key, value FROM log_meta WHERE key LIKE 'schema_backfill_%'"
+            ).fetchall())
+        if "schema_backfill_max_id" not in meta:
+            return 0
+        last_id = int(meta.get("schema_backfill_last_id", 0))
+        max_id = int(meta["schema_backfill_max_id"])
+        
+        while last_id < max_id:
+            upper = min(last_id + chunk_size, max_id)
+            with get_db().writer() as conn:
+                rows = conn.execute('''
+                    SELECT id, json_extract(metadata, '$.schema') AS schema FROM logs
+                    WHERE id > ? AND id <= ? AND json_valid(metadata)
+                      AND json_type(metadata, '$.schema') IS NOT NULL
+                ''', (last_id, upper)).fetchall()
+                conn.executemany(
+                    "UPDATE logs SET schema_id = ?, metadata = json_remove(metadata, '$.schema') WHERE id = ?",
+                    [(_schema_id(conn, _schema_text(row["schema"])), row["id"]) for row in rows]
+                )
+                conn.execute(
+                    "UPDATE log_meta SET value = ? WHERE key = 'schema_backfill_last_id'", (str(upper),)
+                )
+            updated += len(rows)
+            last_id = upper
+            
+        with get_db().writer() as conn:
+            conn.execute("DELETE FROM log_meta WHERE key LIKE 'schema_backfill_%'")
+        if updated:
+            print(f"Moved schemas of {updated} existing logs to log_schemas.")
+    except Exception as e:
+        print(f"Schema backfill failed: {e}")
+    return updated
+
+def _init_compression(c: sqlite3.Cursor):
+    """
+    Compressed storage for large prompts and responses.
+
+    Bodies of at least COMPRESS_MIN_BYTES are stored as zstd frames (BLOBs)
+    by _log_row, with the start of the prompt in prompt_preview for list
+    views. Shared dictionaries live in log_dicts, keyed by their zstd dict
+    id, and are never deleted since frames refer to them. Existing rows stay
+    as they are.
+    """
+    existing = {row[1] for row in c.execute('PRAGMA table_info(logs)')}
+    if "prompt_preview" not in existing:
+        c.execute('ALTER TABLE logs ADD COLUMN prompt_preview TEXT')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS log_dicts (
+            id INTEGER PRIMARY KEY,
+            dict BLOB NOT NULL,
+            samples INTEGER,
+            created_at TEXT
+        )
+    ''')
+    _load_dictionaries(c, activate=True)
+
+def _load_dictionaries(conn, activate: bool = False):
+    """Register the dictionaries of log_dicts with the codec (the newest one for writing with ``activate``)."""
+    if not body_codec.available:
+        return
+    for dict_id, data in conn.execute('SELECT id, dict FROM log_dicts ORDER BY created_at, id').fetchall():
+        if activate or not body_codec.has_dictionary(dict_id):
+            body_codec.add_dictionary(data, active=activate)
+
+def _log_body(value: Any) -> Optional[str]:
+    """Text of a stored prompt/response, decompressing zstd frames (SQL: log_body(prompt))."""
+    try:
+        return body_codec.decode(value)
+    except RuntimeError:
+        # SQLite only reports "user-defined function raised exception"
+        print(MISSING_CODEC)
+        raise
+    except LookupError:
+        # Trained since this process loaded log_dicts (dictionaries stay in logs.db)
+        with get_db().dedicated_reader() as conn:
+            _load_dictionaries(conn)
+        return body_codec.decode(value)
+
+def _register_functions(conn: sqlite3.Connection):
+    """SQL functions the search triggers and exports rely on; needed on every connection that writes logs."""
+    conn.create_function("log_body", 1, _log_body, deterministic=True)
+
+_dict_training = threading.Lock()
+
+def train_dictionary(samples: int = DICT_TRAIN_SAMPLES) -> Dict[str, Any]:
+    """
+    Train a shared zstd dictionary on the most recent compressed bodies and
+    compress new logs with it. Older frames keep their dictionary.
+    """
+    if not body_codec.enabled:
+        raise ValueError("Log compression is disabled (needs zstandard and SIMPLE_LLM_COMPRESS_MIN_BYTES > 0)")
+    with _dict_training:
+        with get_db().dedicated_reader() as conn:
+            texts = [body for row in conn.execute('''
+                SELECT CASE WHEN typeof(prompt) = 'blob' THEN log_body(prompt) END,
+                       CASE WHEN typeof(response) = 'blob' THEN log_body(response) END
+                FROM logs WHERE typeof(prompt) = 'blob' OR typeof(response) = 'blob'
+                ORDER BY id DESC LIMIT ?
+            ''', (samples,)) for body in row if body is not None]
+        if len(texts) < 10:
+            raise ValueError(f"Not enough compressed logs to train a dictionary ({len(texts)} bodies)")
         try:
-            with open(LEGACY_LOG_FILE, "r", encoding="utf-8") as f:
-                count = 0
-                for line in f:
-                    if not line.strip():
-                        continue
-                    try:
-                        entry = json.loads(line)
-                        c.execute('''
-                            INSERT INTO logs (timestamp, model, prompt, response, duration_ms, error, metadata, locked, tag)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
-                        ''', (
-                            entry.get("timestamp"),
-                            entry.get("model"),
-                            entry.get("prompt"),
-                            json.dumps(entry.get("response"), ensure_ascii=False),
-                            entry.get("duration_ms"),
-                            entry.get("error"),
-                            json.dumps(entry.get("metadata", {}), ensure_ascii=False),
-                            None # tag
-                        ))
-                        count += 1
-                    except Exception as e:
-                        print(f"Skipping bad line during migration: {e}")
-                
-            print(f"Migrated {count} logs.")
-            # Rename legacy file so we don't migrate again
-            LEGACY_LOG_FILE.rename(LEGACY_LOG_FILE.with_suffix(".jsonl.bak"))
+            data = body_codec.train(texts)
         except Exception as e:
-            print(f"Migration failed: {e}")
+            raise ValueError(f"Dictionary training failed: {e}")
+        dict_id = body_codec.add_dictionary(data)
+        created_at = datetime.utcnow().isoformat()
+        with get_db().writer() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO log_dicts (id, dict, samples, created_at) VALUES (?, ?, ?, ?)',
+                (dict_id, data, len(texts), created_at)
+            )
+        # Only written with once it is stored, so every frame can be read back
+        body_codec.add_dictionary(data, active=True)
+    print(f"Trained a {len(data) // 1024}KB log dictionary on {len(texts)} bodies.")
+    return {"id": dict_id, "bytes": len(data), "samples": len(texts), "created_at": created_at, "active": True}
+
+def _maybe_train_dictionary():
+    """Train the first dictionary in the background once enough bodies were compressed without one."""
+    if body_codec.active is not None or body_codec.compressed < DICT_TRAIN_AFTER or _dict_training.locked():
+        return
+    body_codec.compressed = 0
+
+    def train():
+        try:
+            train_dictionary()
+        except Exception as e:
+            print(f"Log dictionary training failed: {e}")
+
+    threading.Thread(target=train, name="log-dict-training", daemon=True).start()
+
+def list_dictionaries() -> Dict[str, Any]:
+    """Compression settings and the stored dictionaries."""
+    dictionaries = []
+    if DB_FILE.exists():
+        try:
+            with get_db().reader() as conn:
+                dictionaries = [dict(row) for row in conn.execute(
+                    'SELECT id, length(dict) AS bytes, samples, created_at FROM log_dicts ORDER BY created_at'
+                )]
+        except Exception as e:
+            print(f"Error reading log dictionaries: {e}")
+    for entry in dictionaries:
+        entry["active"] = entry["id"] == body_codec.active
+    return {
+        "enabled": body_codec.enabled,
+        "min_bytes": body_codec.min_bytes,
+        "level": body_codec.level,
+        "dictionaries": dictionaries,
+    }
+
+def _provider_of(model: Optional[str]) -> str:
+    """Provider prefix of a model string (same rule as LLMService)."""
+    if model and ":" in model:
+        return model.split(":", 1)[0].lower()
+    return "openrouter"
+
+def _log_row(
+    timestamp: str,
+    model: Optional[str],
+    prompt: Optional[str],
+    response_json: Optional[str],
+    duration_ms: Optional[float],
+    error: Optional[str],
+    metadata: Optional[Dict[str, Any]],
+    tag: Optional[str]
+) -> tuple:
+    """
+    Build a log row for _insert_logs, including the typed columns.
+
+    metadata["schema"] is not kept in the metadata blob; the row carries the
+    schema text in its last (schema_id) position instead. Large prompts and
+    responses are compressed here, on the caller's thread.
+    """
+    metadata = dict(metadata or {})
+    schema = _schema_text(metadata.pop("schema", None))
+    usage = metadata.get("usage") or {}
+    stored_prompt = body_codec.encode(prompt)
+    return (
+        timestamp, model, stored_prompt, body_codec.encode(response_json), duration_ms, error,
+        json.dumps(metadata, ensure_ascii=False), tag,
+        metadata.get("format"),
+        _provider_of(model),
+        "error" if error else "success",
+        usage.get("prompt_tokens"),
+        usage.get("completion_tokens"),
+        usage.get("total_tokens"),
+        preview(prompt) if stored_prompt is not prompt else None,
+        schema,
+    )
+
+def backfill_typed_columns(chunk_size: int = COLUMN_BACKFILL_CHUNK) -> int:
+    """Fill the typed columns of logs written before they existed. Returns rows updated."""
+    if not DB_FILE.exists():
+        return 0
+    updated = 0
+    try:
+        with get_db().reader() as conn:
+            meta = dict(conn.execute(
+                "SELECT key, value FROM log_meta WHERE key LIKE 'columns_backfill_%'"
+            ).fetchall())
+        if "columns_backfill_max_id" not in meta:
+            return 0
+        last_id = int(meta.get("columns_backfill_last_id", 0))
+        max_id = int(meta["columns_backfill_max_id"])
+        
+        while last_id < max_id:
+            upper = min(last_id + chunk_size, max_id)
+            with get_db().writer() as conn:
+                c = conn.execute('''
+                    UPDATE logs SET
+                        format = CASE WHEN json_valid(metadata) THEN json_extract(metadata, '$.format') END,
+                        provider = CASE WHEN instr(model, ':') > 0
+                            THEN lower(substr(model, 1, instr(model, ':') - 1)) ELSE 'openrouter' END,
+                        status = CASE WHEN error IS NULL OR error = '' THEN 'success' ELSE 'error' END,
+                        prompt_tokens = CASE WHEN json_valid(metadata) THEN json_extract(metadata, '$.usage.prompt_tokens') END,
+                        completion_tokens = CASE WHEN json_valid(metadata) THEN json_extract(metadata, '$.usage.completion_tokens') END,
+                        total_tokens = CASE WHEN json_valid(metadata) THEN json_extract(metadata, '$.usage.total_tokens') END
+                    WHERE id > ? AND id <= ?
+                ''', (last_id, upper))
+                conn.execute(
+                    "UPDATE log_meta SET value = ? WHERE key = 'columns_backfill_last_id'", (str(upper),)
+                )
+            updated += c.rowcount
+            last_id = upper
+            
+        with get_db().writer() as conn:
+            conn.execute("DELETE FROM log_meta WHERE key LIKE 'columns_backfill_%'")
+        if updated:
+            print(f"Filled typed columns for {updated} existing logs.")
+    except Exception as e:
+        print(f"Typed column backfill failed: {e}")
+    return updated
+
+def _init_counters(c: sqlite3.Cursor):
+    """
+    Per-day, per-tag row counters kept exact by triggers on logs.
+
+    Every insert, delete and tag/timestamp/lock update adjusts log_counts in
+    the same transaction, so totals never need a COUNT(*) over logs. NULL
+    tags are counted under ''.
+    """
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'log_counts'"
+    ).fetchone()
+    c.execute(LOG_COUNTS_SQL)
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_logs_count_insert AFTER INSERT ON logs BEGIN
+            INSERT INTO log_counts (day, tag, count, locked)
+            VALUES (substr(NEW.timestamp, 1, 10), COALESCE(NEW.tag, ''), 1, COALESCE(NEW.locked, 0) != 0)
+            ON CONFLICT (day, tag) DO UPDATE SET count = count + 1, locked = locked + excluded.locked;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_logs_count_delete AFTER DELETE ON logs BEGIN
+            UPDATE log_counts SET count = count - 1, locked = locked - (COALESCE(OLD.locked, 0) != 0)
+            WHERE day = substr(OLD.timestamp, 1, 10) AND tag = COALESCE(OLD.tag, '');
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_logs_count_update AFTER UPDATE OF timestamp, tag, locked ON logs BEGIN
+            UPDATE log_counts SET count = count - 1, locked = locked - (COALESCE(OLD.locked, 0) != 0)
+            WHERE day = substr(OLD.timestamp, 1, 10) AND tag = COALESCE(OLD.tag, '');
+            INSERT INTO log_counts (day, tag, count, locked)
+            VALUES (substr(NEW.timestamp, 1, 10), COALESCE(NEW.tag, ''), 1, COALESCE(NEW.locked, 0) != 0)
+            ON CONFLICT (day, tag) DO UPDATE SET count = count + 1, locked = locked + excluded.locked;
+        END
+    ''')
+    if not exists:
+        # First run on an existing database: seed the counters from logs
+        c.execute('''
+            INSERT INTO log_counts (day, tag, count, locked)
+            SELECT substr(timestamp, 1, 10), COALESCE(tag, ''), COUNT(*), SUM(COALESCE(locked, 0) != 0)
+            FROM logs GROUP BY 1, 2
+        ''')
+
+def _init_search(c: sqlite3.Cursor):
+    """
+    FTS5 index over prompt, response, error and tag, kept in sync by triggers.
+
+    The triggers index the text of compressed bodies (log_body()); the
+    external-content snippet() would read the stored frames, so get_logs
+    builds snippets of compressed rows itself (see _compressed_snippets).
+    Deletes and updates only touch rows that are in the index
+    (logs_fts_docsize): a 'delete' for a row that was never indexed, such as
+    one a deferred import or the backfill hasn't reached yet, would corrupt
+    the external-content index. On databases that already hold logs, the existing rows are indexed later
+    by backfill_search_index() in small transactions; progress is stored in
+    log_meta so an interrupted backfill resumes where it stopped.
+    """
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS log_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs_fts'"
+    ).fetchone()
+    try:
+        c.execute(LOGS_FTS_SQL)
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable (SQLite built without FTS5?): {e}")
+        return
+    # Triggers from before compressed bodies indexed the stored values as-is,
+    # and older delete/update triggers didn't check that the row was indexed
+    for (name,) in c.execute('''
+        SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_logs_fts_%'
+          AND (sql NOT LIKE '%log_body%' OR (name != 'trg_logs_fts_insert' AND sql NOT LIKE '%logs_fts_docsize%'))
+    ''').fetchall():
+        c.execute(f'DROP TRIGGER {name}')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_logs_fts_insert AFTER INSERT ON logs BEGIN
+            INSERT INTO logs_fts (rowid, prompt, response, error, tag)
+            VALUES (NEW.id, log_body(NEW.prompt), log_body(NEW.response), NEW.error, NEW.tag);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_logs_fts_delete AFTER DELETE ON logs
+        WHEN EXISTS (SELECT 1 FROM logs_fts_docsize WHERE id = OLD.id) BEGIN
+            INSERT INTO logs_fts (logs_fts, rowid, prompt, response, error, tag)
+            VALUES ('delete', OLD.id, log_body(OLD.prompt), log_body(OLD.response), OLD.error, OLD.tag);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_logs_fts_update AFTER UPDATE OF prompt, response, error, tag ON logs
+        WHEN EXISTS (SELECT 1 FROM logs_fts_docsize WHERE id = OLD.id) BEGIN
+            INSERT INTO logs_fts (logs_fts, rowid, prompt, response, error, tag)
+            VALUES ('delete', OLD.id, log_body(OLD.prompt), log_body(OLD.response), OLD.error, OLD.tag);
+            INSERT INTO logs_fts (rowid, prompt, response, error, tag)
+            VALUES (NEW.id, log_body(NEW.prompt), log_body(NEW.response), NEW.error, NEW.tag);
+        END
+    ''')
+    if not exists:
+        max_id = c.execute('SELECT MAX(id) FROM logs').fetchone()[0]
+        if max_id:
+            # Rows up to max_id predate the triggers and still need indexing
+            c.executemany(
+                'INSERT OR REPLACE INTO log_meta (key, value) VALUES (?, ?)',
+                [("fts_backfill_last_id", "0"), ("fts_backfill_max_id", str(max_id))]
+            )
+
+def backfill_search_index(chunk_size: int = FTS_BACKFILL_CHUNK) -> int:
+    """
+    Index logs written before the FTS table existed. Returns rows indexed.
+
+    Each chunk is its own short transaction so live log writes are never
+    blocked for long.
+    """
+    if not DB_FILE.exists():
+        return 0
+    indexed = 0
+    try:
+        with get_db().reader() as conn:
+            meta = dict(conn.execute(
+                "SELECT key, value FROM log_meta WHERE key LIKE 'fts_backfill_%'"
+            ).fetchall())
+        if "fts_backfill_max_id" not in meta:
+            return 0
+        last_id = int(meta.get("fts_backfill_last_id", 0))
+        max_id = int(meta["fts_backfill_max_id"])
+        
+        while last_id < max_id:
+            upper = min(last_id + chunk_size, max_id)
+            with get_db().writer() as conn:
+                c = conn.execute('''
+                    INSERT INTO logs_fts (rowid, prompt, response, error, tag)
+                    SELECT id, log_body(prompt), log_body(response), error, tag FROM logs WHERE id > ? AND id <= ?
+                ''', (last_id, upper))
+                indexed += c.rowcount
+                conn.execute(
+                    "UPDATE log_meta SET value = ? WHERE key = 'fts_backfill_last_id'", (str(upper),)
+                )
+            last_id = upper
+            
+        with get_db().writer() as conn:
+            conn.execute("DELETE FROM log_meta WHERE key LIKE 'fts_backfill_%'")
+        if indexed:
+            print(f"Indexed {indexed} existing logs for search.")
+    except Exception as e:
+        print(f"Search index backfill failed: {e}")
+    return indexed
+
+def catch_up_search_index(chunk_size: int = FTS_BACKFILL_CHUNK) -> int:
+    """
+    Index rows that a deferred bulk import left out of logs_fts. Returns rows indexed.
+
+    Scans ids from log_meta 'fts_catchup_from_id' on and only indexes those
+    missing from logs_fts_docsize, so rows the trigger already indexed (live
+    writes during or after the import) are never added twice.
+    """
+    if not DB_FILE.exists():
+        return 0
+    indexed = 0
+    try:
+        with get_db().reader() as conn:
+            row = conn.execute("SELECT value FROM log_meta WHERE key = 'fts_catchup_from_id'").fetchone()
+            if row is None:
+                return 0
+            last_id = int(row[0]) - 1
+            max_id = conn.execute('SELECT MAX(id) FROM logs').fetchone()[0] or 0
+            
+        while last_id < max_id:
+            upper = min(last_id + chunk_size, max_id)
+            with get_db().writer() as conn:
+                c = conn.execute('''
+                    INSERT INTO logs_fts (rowid, prompt, response, error, tag)
+                    SELECT id, log_body(prompt), log_body(response), error, tag FROM logs
+                    WHERE id > ? AND id <= ?
+                      AND id NOT IN (SELECT id FROM logs_fts_docsize WHERE id > ? AND id <= ?)
+                ''', (last_id, upper, last_id, upper))
+                indexed += c.rowcount
+                conn.execute(
+                    "UPDATE log_meta SET value = ? WHERE key = 'fts_catchup_from_id'", (str(upper + 1),)
+                )
+            last_id = upper
+            
+        with get_db().writer() as conn:
+            conn.execute("DELETE FROM log_meta WHERE key = 'fts_catchup_from_id'")
+        if indexed:
+            print(f"Indexed {indexed} imported logs for search.")
+    except Exception as e:
+        print(f"Search index catch-up failed: {e}")
+    return indexed
+
+@contextmanager
+def deferred_indexes():
+    """
+    Drop the secondary indexes and the FTS insert trigger for a bulk load.
+
+    The indexes are rebuilt (one sort each) when the block exits, even on
+    failure. Search indexing of the loaded rows is left to
+    catch_up_search_index(), which start_backfills() runs; until then the
+    delete trigger skips them, so retention and deletes can run meanwhile.
+    """
+    with get_db().writer() as conn:
+        first_id = (conn.execute('SELECT MAX(id) FROM logs').fetchone()[0] or 0) + 1
+        for name, _ in LOG_INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {name}')
+        fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_logs_fts_insert'"
+        ).fetchone()
+        if fts:
+            conn.execute('DROP TRIGGER trg_logs_fts_insert')
+            # Keep the lowest pending id if an earlier catch-up hasn't finished
+            conn.execute('''
+                INSERT INTO log_meta (key, value) VALUES ('fts_catchup_from_id', ?)
+                ON CONFLICT (key) DO UPDATE SET value = min(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))
+            ''', (str(first_id),))
+    try:
+        yield
+    finally:
+        with get_db().writer() as conn:
+            c = conn.cursor()
+            for name, column in LOG_INDEXES:
+                c.execute(f'CREATE INDEX IF NOT EXISTS {name} ON logs({column})')
+            if fts:
+                _init_search(c)
+
+def _init_partitions(c: sqlite3.Cursor):
+    """
+    Registry of archive partitions: periods whose logs were moved into
+    read-only files in the archive directory.
+
+    While a partition is 'moving', its rows are deleted from logs in id
+    order and ``visible_id`` follows the last deleted id, so every row is
+    read from exactly one place at any time.
+    """
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS log_partitions (
+            name TEXT PRIMARY KEY,
+            start_ts TEXT NOT NULL,
+            end_ts TEXT NOT NULL,
+            file TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            min_id INTEGER,
+            max_id INTEGER,
+            visible_id INTEGER NOT NULL DEFAULT 0,
+            state TEXT NOT NULL,
+            bytes INTEGER,
+            created_at TEXT
+        )
+    ''')
+
+def _archive_dir() -> Path:
+    return DB_FILE.parent / "archive"
+
+_archives: "OrderedDict[str, ConnectionManager]" = OrderedDict()
+_archives_lock = threading.Lock()
+
+def _archive_db(file: str) -> ConnectionManager:
+    """Connection manager for an archive file; .db.gz archives are decompressed into a cache first."""
+    with _archives_lock:
+        manager = _archives.get(file)
+        if manager is not None:
+            _archives.move_to_end(file)
+            return manager
+        path = _archive_dir() / file
+        if file.endswith(".gz"):
+            path = _archive_dir() / ".cache" / file[:-3]
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(path.name + ".tmp")
+                with gzip.open(_archive_dir() / file, "rb") as src, open(tmp, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                tmp.rename(path)
+        manager = ConnectionManager(path, pool_size=2)
+        _archives[file] = manager
+        while len(_archives) > ARCHIVE_CACHE_FILES:
+            _evict_archive(*_archives.popitem(last=False))
+        return manager
+
+def _evict_archive(file: str, manager: ConnectionManager):
+    manager.close()
+    if file.endswith(".gz"):
+        (_archive_dir() / ".cache" / file[:-3]).unlink(missing_ok=True)
+
+def forget_archive(file: str):
+    """Close an archive's connections (before it is compressed or dropped)."""
+    with _archives_lock:
+        manager = _archives.pop(file, None)
+        if manager is not None:
+            _evict_archive(file, manager)
+
+@contextmanager
+def _snapshot(conn: sqlite3.Connection):
+    """Read the partition registry and logs from one snapshot (reader connections autocommit)."""
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+def _partitions(
+    conn: sqlite3.Connection,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
+) -> List[sqlite3.Row]:
+    """Partitions with visible rows that can match the date range / id cursor, newest first."""
+    query = "SELECT * FROM log_partitions WHERE rows > 0 AND visible_id >= min_id"
+    params = []
+    if start_date:
+        query += " AND end_ts > ?"
+        params.append(start_date)
+    if end_date:
+        query += " AND start_ts <= ?"
+        params.append(end_date)
+    if before_id is not None:
+        query += " AND min_id < ?"
+        params.append(before_id)
+    if after_id is not None:
+        query += " AND max_id > ?"
+        params.append(after_id)
+    return conn.execute(query + " ORDER BY start_ts DESC", params).fetchall()
+
+def _visible_limit(partition: sqlite3.Row) -> Optional[int]:
+    """Highest visible id of a partition still being moved, None once archived."""
+    return partition["visible_id"] if partition["state"] == "moving" else None
+
+def list_partitions() -> List[Dict[str, Any]]:
+    if not DB_FILE.exists():
+        return []
+    try:
+        with get_db().reader() as conn:
+            return [dict(row) for row in conn.execute('SELECT * FROM log_partitions ORDER BY start_ts')]
+    except Exception as e:
+        print(f"Error reading partitions: {e}")
+        return []
+
+def drop_archived_rows(path: Path, ids: List[int]) -> int:
+    """
+    Delete rows from an uncompressed archive file, with their search index
+    entries and per-day counts. Archives are read-only files, so the file
+    is made writable for the edit. Returns count of deleted rows.
+    """
+    placeholders = ", ".join("?" * len(ids))
+    os.chmod(path, 0o644)
+    conn = sqlite3.connect(path, isolation_level=None)
+    _register_functions(conn)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs_fts'").fetchone():
+            conn.execute(f'''
+                INSERT INTO logs_fts (logs_fts, rowid, prompt, response, error, tag)
+                SELECT 'delete', id, log_body(prompt), log_body(response), error, tag FROM logs WHERE id IN ({placeholders})
+            ''', ids)
+        conn.execute(f'''
+            UPDATE log_counts SET count = count - (
+                SELECT COUNT(*) FROM logs
+                WHERE id IN ({placeholders})
+                  AND substr(timestamp, 1, 10) = log_counts.day AND COALESCE(tag, '') = log_counts.tag
+            )
+        ''', ids)
+        deleted = conn.execute(f'DELETE FROM logs WHERE id IN ({placeholders})', ids).rowcount
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+        os.chmod(path, 0o444)
+    return deleted
+
+def finish_partition_moves(batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """
+    Delete rows copied into 'moving' partitions from logs, a batch per
+    transaction (resumes after a restart). Returns count of deleted rows.
+
+    Rows locked since the copy stay in logs.db and are dropped from the
+    archive instead, so locked logs are never archived.
+    """
+    if not DB_FILE.exists():
+        return 0
+    deleted = 0
+    try:
+        with get_db().reader() as conn:
+            moving = conn.execute("SELECT * FROM log_partitions WHERE state = 'moving'").fetchall()
+        for partition in moving:
+            last_id = partition["visible_id"]
+            while True:
+                # The archive holds exactly the copied ids
+                with _archive_db(partition["file"]).reader() as archive:
+                    ids = [row[0] for row in archive.execute(
+                        'SELECT id FROM logs WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size)
+                    )]
+                with get_db().writer() as conn:
+                    if not ids:
+                        conn.execute(
+                            "UPDATE log_partitions SET state = 'archived', visible_id = max_id WHERE name = ?",
+                            (partition["name"],)
+                        )
+                        break
+                    placeholders = ", ".join("?" * len(ids))
+                    # Still under the write lock, so no row gets locked in between
+                    locked = [row[0] for row in conn.execute(
+                        f'SELECT id FROM logs WHERE id IN ({placeholders}) AND NOT {UNLOCKED}', ids
+                    )]
+                    if locked:
+                        drop_archived_rows(_archive_dir() / partition["file"], locked)
+                        conn.execute(
+                            'UPDATE log_partitions SET rows = rows - ? WHERE name = ?', (len(locked), partition["name"])
+                        )
+                    c = conn.execute(f'DELETE FROM logs WHERE id IN ({placeholders}) AND {UNLOCKED}', ids)
+                    deleted += c.rowcount
+                    last_id = ids[-1]
+                    conn.execute('UPDATE log_partitions SET visible_id = ? WHERE name = ?', (last_id, partition["name"]))
+                time.sleep(RETENTION_BATCH_PAUSE)
+    except Exception as e:
+        print(f"Error moving logs into archive partitions: {e}")
+    return deleted
+
+def _init_rollups(c: sqlite3.Cursor):
+    """
+    Hourly analytics rollups per model and tag, updated by _insert_logs.
+
+    log_rollups holds counts, errors, token and duration sums; the latency
+    sketch is log_rollup_latency (count per log-scale bucket), which merges
+    across periods/models/tags by summing. Each log lands in an hourly row
+    (grain 'h', period 'YYYY-MM-DDTHH') and a daily row (grain 'd', period
+    'YYYY-MM-DD') so long ranges read days and only the edges read hours.
+    Rollups are history: purging logs does not change them. Existing logs are
+    folded in by backfill_rollups().
+    """
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'log_rollups'"
+    ).fetchone()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS log_rollups (
+            grain TEXT NOT NULL,
+            period TEXT NOT NULL,
+            model TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            total_tokens INTEGER NOT NULL DEFAULT 0,
+            duration_ms_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (grain, period, model, tag)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS log_rollup_latency (
+            grain TEXT NOT NULL,
+            period TEXT NOT NULL,
+            model TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (grain, period, model, tag, bucket)
+        ) WITHOUT ROWID
+    ''')
+    if not exists:
+        max_id = c.execute('SELECT MAX(id) FROM logs').fetchone()[0]
+        if max_id:
+            c.executemany(
+                'INSERT OR REPLACE INTO log_meta (key, value) VALUES (?, ?)',
+                [("rollup_backfill_last_id", "0"), ("rollup_backfill_max_id", str(max_id))]
+            )
+
+def _latency_bucket(duration_ms: Optional[float]) -> int:
+    if not duration_ms or duration_ms <= 1:
+        return 0
+    return math.ceil(math.log(duration_ms, LATENCY_BUCKET_BASE))
+
+def _bucket_value(bucket: int) -> float:
+    """Representative latency (ms) of a bucket: its geometric midpoint."""
+    if bucket <= 0:
+        return 1.0
+    return LATENCY_BUCKET_BASE ** (bucket - 0.5)
+
+def _update_rollups(conn: sqlite3.Connection, rows: List[tuple]):
+    """Fold INSERT_LOG_SQL parameter tuples into the hourly rollups."""
+    totals: Dict[tuple, List[float]] = {}
+    latency: Dict[tuple, int] = {}
+    for row in rows:
+        timestamp, model, _, _, duration_ms, error, _, tag = row[:8]
+        prompt_tokens, completion_tokens, total_tokens = row[11:14]
+        bucket = _latency_bucket(duration_ms)
+        timestamp = timestamp or ""
+        for key in (("h", timestamp[:13], model or "", tag or ""), ("d", timestamp[:10], model or "", tag or "")):
+            group = totals.get(key)
+            if group is None:
+                group = totals[key] = [0, 0, 0, 0, 0, 0.0]
+            group[0] += 1
+            group[1] += 1 if error else 0
+            group[2] += prompt_tokens or 0
+            group[3] += completion_tokens or 0
+            group[4] += total_tokens or 0
+            group[5] += duration_ms or 0.0
+            bucket_key = key + (bucket,)
+            latency[bucket_key] = latency.get(bucket_key, 0) + 1
+            
+
+    conn.executemany('''
+        INSERT INTO log_rollups (grain, period, model, tag, count, errors, prompt_tokens, completion_tokens, total_tokens, duration_ms_sum)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (grain, period, model, tag) DO UPDATE SET
+            count = count + excluded.count,
+            errors = errors + excluded.errors,
+            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+            completion_tokens = completion_tokens + excluded.completion_tokens,
+            total_tokens = total_tokens + excluded.total_tokens,
+            duration_ms_sum = duration_ms_sum + excluded.duration_ms_sum
+    ''', [key + tuple(group) for key, group in totals.items()])
+    conn.executemany('''
+        INSERT INTO log_rollup_latency (grain, period, model, tag, bucket, count) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (grain, period, model, tag, bucket) DO UPDATE SET count = count + excluded.count
+    ''', [key + (count,) for key, count in latency.items()])
+
+def backfill_rollups(chunk_size: int = ROLLUP_BACKFILL_CHUNK) -> int:
+    """Fold logs written before the rollup tables existed into them. Returns rows processed."""
+    if not DB_FILE.exists():
+        return 0
+    processed = 0
+    try:
+        with get_db().reader() as conn:
+            meta = dict(conn.execute(
+                "SELECT key, value FROM log_meta WHERE key LIKE 'rollup_backfill_%'"
+            ).fetchall())
+        if "rollup_backfill_max_id" not in meta:
+            return 0
+        last_id = int(meta.get("rollup_backfill_last_id", 0))
+        max_id = int(meta["rollup_backfill_max_id"])
+        
+        while last_id < max_id:
+            upper = min(last_id + chunk_size, max_id)
+            with get_db().writer() as conn:
+                rows = [tuple(row) for row in conn.execute(f'''
+                    SELECT {", ".join(LOG_ROW_COLUMNS)} FROM logs WHERE id > ? AND id <= ?
+                ''', (last_id, upper))]
+                if rows:
+                    _update_rollups(conn, rows)
+                conn.execute(
+                    "UPDATE log_meta SET value = ? WHERE key = 'rollup_backfill_last_id'", (str(upper),)
+                )
+            processed += len(rows)
+            last_id = upper
             
-    conn.commit()
-    conn.close()
+        with get_db().writer() as conn:
+            conn.execute("DELETE FROM log_meta WHERE key LIKE 'rollup_backfill_%'")
+        if processed:
+            print(f"Rolled up {processed} existing logs for stats.")
+    except Exception as e:
+        print(f"Stats rollup backfill failed: {e}")
+    return processed
+
+def rebuild_rollups() -> int:
+    """
+    Recompute the rollups from scratch (e.g. after rows were inserted outside
+    log_llm_call). Only logs.db is read, so archived periods lose their rollups.
+    """
+    with get_db().writer() as conn:
+        conn.execute('DELETE FROM log_rollups')
+        conn.execute('DELETE FROM log_rollup_latency')
+        max_id = conn.execute('SELECT MAX(id) FROM logs').fetchone()[0] or 0
+        conn.executemany(
+            'INSERT OR REPLACE INTO log_meta (key, value) VALUES (?, ?)',
+            [("rollup_backfill_last_id", "0"), ("rollup_backfill_max_id", str(max_id))]
+        )
+    return backfill_rollups()
+
+def _run_backfills():
+    backfill_search_index()
+    catch_up_search_index()
+    # Rollups read the typed columns, so fill those first
+    backfill_typed_columns()
+    backfill_schemas()
+    backfill_rollups()
+    finish_partition_moves()
+
+def start_backfills():
+    """Run the one-time search index, typed column, schema and rollup backfills (and any search
+    catch-up left by bulk imports or partition move cut short by a restart) on a background thread."""
+    threading.Thread(target=_run_backfills, name="log-backfill", daemon=True).start()
+
+def _match_expression(q: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match, and a
+    trailing * on a word makes it a prefix search.
+    """
+    terms = []
+    for word in q.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if not word:
+            continue
+        term = '"' + word.replace('"', '""') + '"'
+        terms.append(term + "*" if prefix else term)
+    return " ".join(terms)
+
+def _insert_logs(conn: sqlite3.Connection, rows: List[tuple]) -> int:
+    """
+    Insert rows built by _log_row and update the rollups. Returns the id of
+    the first row; AUTOINCREMENT hands out consecutive ids inside one write
+    transaction.
+    """
+    conn.executemany(INSERT_LOG_SQL, [row[:-1] + (_schema_id(conn, row[-1]),) for row in rows])
+    last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    _update_rollups(conn, rows)
+    return last_id - len(rows) + 1
+
+# Called with the list entries of every batch of logs written by log_llm_call, after commit
+_log_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+def add_log_listener(listener: Callable[[List[Dict[str, Any]]], None]):
+    if listener not in _log_listeners:
+        _log_listeners.append(listener)
+
+def remove_log_listener(listener: Callable[[List[Dict[str, Any]]], None]):
+    if listener in _log_listeners:
+        _log_listeners.remove(listener)
+
+def _insert_and_read(conn: sqlite3.Connection, rows: List[tuple]) -> Optional[List[Dict[str, Any]]]:
+    """_insert_logs, plus the new rows as list entries when someone is listening."""
+    first_id = _insert_logs(conn, rows)
+    if not _log_listeners:
+        return None
+    return [_log_entry(row, False) for row in conn.execute(
+        f'SELECT {LIST_SELECT} FROM logs WHERE id >= ? AND id < ? ORDER BY id',
+        (first_id, first_id + len(rows))
+    )]
+
+def _notify(entries: Optional[List[Dict[str, Any]]]):
+    for listener in list(_log_listeners) if entries else ():
+        try:
+            listener(entries)
+        except Exception as e:
+            print(f"Log listener failed: {e}")
+
+def _write_logs(rows: List[tuple]):
+    """Write rows in one transaction, falling back to row-by-row on failure."""
+    started = time.perf_counter()
+    try:
+        with get_db().writer() as conn:
+            entries = _insert_and_read(conn, rows)
+        LOG_WRITE_SECONDS.observe(time.perf_counter() - started)
+        LOG_ROWS.inc(amount=len(rows))
+        _notify(entries)
+        _maybe_train_dictionary()
+        return
+    except Exception as e:
+        if len(rows) == 1:
+            print(f"Failed to write log to DB: {e}")
+            return
+        print(f"Batch log write failed, retrying rows individually: {e}")
+    for row in rows:
+        try:
+            with get_db().writer() as conn:
+                entries = _insert_and_read(conn, [row])
+            _notify(entries)
+        except Exception as e:
+            print(f"Failed to write log to DB: {e}")
+
+_STOP = object()
+
+class LogWriter:
+    """
+    Background write-behind queue for log rows.
+
+    Rows are grouped into multi-row transactions, flushed when a batch
+    reaches ``batch_size`` or ``flush_interval`` seconds after its first row.
+    When the queue is full, callers wait for space (backpressure) and after
+    ``LOG_QUEUE_PUT_TIMEOUT`` write their row inline instead; async callers
+    use submit_async(), which does that waiting on a worker thread.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        max_queue: int = LOG_QUEUE_SIZE
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row: tuple):
+        try:
+            self._queue.put(row, timeout=LOG_QUEUE_PUT_TIMEOUT)
+        except queue.Full:
+            _write_logs([row])
+
+    async def submit_async(self, row: tuple):
+        """submit() for the event loop: a full queue slows this caller down, not the loop."""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            await asyncio.to_thread(self.submit, row)
+
+    def flush(self):
+        """Block until every queued row has been written."""
+        self._queue.join()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Drain the queue and stop the writer thread."""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            _write_logs(batch)
+            for _ in range(len(batch) + (1 if stopping else 0)):
+                self._queue.task_done()
+
+_log_writer: Optional[LogWriter] = None
+
+def start_log_writer():
+    """Start the background log writer (no-op when SYNC_LOG_WRITES is set)."""
+    global _log_writer
+    if SYNC_LOG_WRITES:
+        return
+    if _log_writer is None:
+        _log_writer = LogWriter()
+    _log_writer.start()
+
+def stop_log_writer():
+    """Flush pending log rows and stop the background writer."""
+    global _log_writer
+    if _log_writer is not None:
+        _log_writer.stop()
+        _log_writer = None
+
+def flush_logs():
+    """Wait until all queued log rows are committed."""
+    if _log_writer is not None and _log_writer.running:
+        _log_writer.flush()
+
+def log_queue_depth() -> int:
+    """Number of log rows waiting to be written."""
+    return _log_writer.qsize() if _log_writer is not None else 0
+
+Gauge(
+    "simple_llm_log_queue_depth", "Log rows waiting for the background writer.",
+    callback=lambda: {(): log_queue_depth()}
+)
+
+def _call_row(
+    model: str,
+    prompt: str,
+    response: Any,
+    start_time: float,
+    error: Optional[str],
+    metadata: Optional[Dict[str, Any]],
+    tag: Optional[str]
+) -> Optional[tuple]:
+    duration_ms = (time.time() - start_time) * 1000
+    
+    timestamp = datetime.utcnow().isoformat()
+    try:
+        response_json = json.dumps(response, ensure_ascii=False)
+        return _log_row(timestamp, model, prompt, response_json, duration_ms, error, metadata, tag)
+    except Exception as e:
+        print(f"Failed to write log to DB: {e}")
+        return None
 
 def log_llm_call(
     model: str,
@@ -92,218 +1465,888 @@ def log_llm_call(
     metadata: Optional[Dict[str, Any]] = None,
     tag: Optional[str] = None
 ):
-    """Logs an LLM call to the SQLite database."""
-    duration_ms = (time.time() - start_time) * 1000
+    """
+    Logs an LLM call to the SQLite database.
+
+    The row is handed to the background writer when it is running (see
+    start_log_writer), otherwise it is written synchronously.
+    """
+    row = _call_row(model, prompt, response, start_time, error, metadata, tag)
+    if row is None:
+        return
     
-    timestamp = datetime.utcnow().isoformat()
-    metadata_json = json.dumps(metadata or {}, ensure_ascii=False)
-    response_json = json.dumps(response, ensure_ascii=False)
+    writer = _log_writer
+    if writer is not None and writer.running:
+        writer.submit(row)
+    else:
+        _write_logs([row])
+
+async def log_llm_call_async(
+    model: str,
+    prompt: str,
+    response: Any,
+    start_time: float,
+    error: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    tag: Optional[str] = None
+):
+    """
+    log_llm_call for the event loop. Only queueing happens on the loop; a
+    full queue or a synchronous write is waited for on a worker thread.
+    """
+    row = _call_row(model, prompt, response, start_time, error, metadata, tag)
+    if row is None:
+        return
     
-    try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO logs (timestamp, model, prompt, response, duration_ms, error, metadata, locked, tag)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
-        ''', (timestamp, model, prompt, response_json, duration_ms, error, metadata_json, tag))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Failed to write log to DB: {e}")
+    writer = _log_writer
+    if writer is not None and writer.running:
+        await writer.submit_async(row)
+    else:
+        await asyncio.to_thread(_write_logs, [row])
 
 def get_logs(
     limit: int = 50,
     offset: int = 0,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    tag: Optional[str] = None
+    tag: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    q: Optional[str] = None,
+    format: Optional[str] = None,
+    provider: Optional[str] = None,
+    status: Optional[str] = None,
+    min_tokens: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    schema_id: Optional[int] = None,
+    sort: str = "id",
+    order: str = "desc",
+    full: bool = False
 ):
-    """Retrieve logs from the database with pagination and filtering."""
+    """
+    Retrieve logs from the database with pagination and filtering.
+
+    Pass ``before_id`` (older rows) or ``after_id`` (newer rows) for keyset
+    pagination; ``offset`` is ignored in that case. Rows are returned newest
+    first unless ``sort``/``order`` ask otherwise (any other order uses
+    OFFSET pagination only).
+
+    With ``q`` the rows are a full-text search over prompt, response, error
+    and tag, ordered by relevance (OFFSET pagination only), and each row
+    carries a ``snippet`` with matches wrapped in <mark></mark>.
+
+    Rows carry the typed columns and the first PREVIEW_CHARS characters of
+    the prompt, but not the response and metadata blobs unless ``full`` is
+    set (get_log() returns one full log). Compressed prompts are shown as
+    their stored preview, so list pages never decompress. Schemas are only
+    resolved by get_log().
+
+    Archive partitions overlapping the date range (or id cursor) are queried
+    too and their rows merged in; the others are never opened.
+    """
     logs = []
     if not DB_FILE.exists():
         return logs
         
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        query = 'SELECT * FROM logs'
+        match = _match_expression(q) if q else None
+        if q and not match:
+            return logs
+            
+        if sort not in LOG_SORT_COLUMNS:
+            sort = "id"
+        direction = "ASC" if order.lower() == "asc" else "DESC"
+        columns = "logs.*" if full else LIST_SELECT
+            
         params = []
         conditions = []
+        if match:
+            query = f'''
+                SELECT {{}}, logs_fts.rank AS rank,
+                       typeof(logs.prompt) = 'blob' OR typeof(logs.response) = 'blob' AS compressed,
+                       CASE WHEN typeof(logs.prompt) = 'blob' OR typeof(logs.response) = 'blob' THEN NULL
+                            ELSE {SNIPPET_SQL} END AS snippet
+                FROM logs_fts JOIN logs ON logs.id = logs_fts.rowid
+            '''
+            conditions.append("logs_fts MATCH ?")
+            params.append(match)
+        else:
+            query = 'SELECT {} FROM logs'
         
         if start_date:
-            conditions.append("timestamp >= ?")
+            conditions.append("logs.timestamp >= ?")
             params.append(start_date)
         if end_date:
-            conditions.append("timestamp <= ?")
+            conditions.append("logs.timestamp <= ?")
             params.append(end_date)
         if tag:
-            conditions.append("tag LIKE ?")
+            conditions.append("logs.tag LIKE ?")
             params.append(f"%{tag}%")
+        _add_column_filters(conditions, params, format, provider, status, min_tokens, max_tokens, schema_id)
+        if match or sort != "id" or direction != "DESC":
+            before_id = after_id = None  # Only newest-first id order has a cursor
+        elif before_id is not None:
+            conditions.append("logs.id < ?")
+            params.append(before_id)
+        elif after_id is not None:
+            conditions.append("logs.id > ?")
+            params.append(after_id)
             
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-            
-        query += " ORDER BY id DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
+        keyset = before_id is not None or after_id is not None
+        ascending = before_id is None and after_id is not None
+        if match:
+            order = " ORDER BY logs_fts.rank"
+            key, descending = (lambda row: row["rank"]), False
+        elif ascending:
+            # Page of rows just above the cursor, flipped back to newest first below
+            order = " ORDER BY id ASC"
+            key, descending = (lambda row: row["id"]), False
+        elif before_id is not None:
+            order = " ORDER BY id DESC"
+            key, descending = (lambda row: row["id"]), True
+        else:
+            # id breaks ties so equal sort values page deterministically
+            tiebreak = f", id {direction}" if sort != "id" else ""
+            order = f" ORDER BY {sort} {direction}{tiebreak}"
+            # NULLs sort first ascending, as in SQLite
+            key = lambda row: (row[sort] is not None, row[sort] or 0, row["id"])
+            descending = direction == "DESC"
+        if keyset:
+            offset = 0
+        
+        snippets: Dict[int, str] = {}
+        
+        def fetch(conn, max_id: Optional[int] = None, page_limit: int = limit, page_offset: int = offset,
+                  select: str = columns):
+            where = conditions + (["logs.id <= ?"] if max_id is not None else [])
+            sql = query.format(select) + (" WHERE " + " AND ".join(where) if where else "") + order + " LIMIT ?"
+            args = params + ([max_id] if max_id is not None else []) + [page_limit]
+            if not keyset:
+                sql += " OFFSET ?"
+                args.append(page_offset)
+            rows = conn.execute(sql, args).fetchall()
+            if match:
+                snippets.update(_compressed_snippets(conn, match, [row["id"] for row in rows if row["compressed"]]))
+            return rows
         
-        c.execute(query, params)
-        rows = c.fetchall()
+        with get_db().reader() as conn, _snapshot(conn):
+            partitions = _partitions(conn, start_date, end_date, before_id, after_id)
+            # With partitions, each source returns its first offset + limit rows to merge
+            rows = fetch(conn) if not partitions else fetch(conn, None, offset + limit, 0)
+        if partitions:
+            sources = [rows]
+            for partition in partitions:
+                with _archive_db(partition["file"]).reader() as archive:
+                    select = columns if full else _list_select(archive)
+                    sources.append(fetch(archive, _visible_limit(partition), offset + limit, 0, select))
+            rows = list(islice(heapq.merge(*sources, key=key, reverse=descending), offset, offset + limit))
+        if ascending:
+            rows.reverse()
         
         for row in rows:
-            # Parse JSON fields back to objects
-            try:
-                response_obj = json.loads(row["response"])
-            except:
-                response_obj = row["response"]
-                
-            try:
-                metadata_obj = json.loads(row["metadata"])
-            except:
-                metadata_obj = {}
-
-            # Handle possible missing 'locked' column if using old read code (shouldn't happen with init_db running)
-            is_locked = bool(row["locked"]) if "locked" in row.keys() else False
-
-            logs.append({
-                "id": row["id"],
-                "timestamp": row["timestamp"],
-                "model": row["model"],
-                "prompt": row["prompt"],
-                "response": response_obj,
-                "duration_ms": row["duration_ms"],
-                "error": row["error"],
-                "metadata": metadata_obj,
-                "locked": is_locked,
-                "tag": row["tag"] if "tag" in row.keys() else None
-            })
-            
-        conn.close()
+            entry = _log_entry(row, full)
+            if match:
+                entry["snippet"] = snippets.get(row["id"], row["snippet"])
+            logs.append(entry)
     except Exception as e:
         print(f"Error reading logs from DB: {e}")
         
     return logs
 
+def _list_select(conn: sqlite3.Connection) -> str:
+    """LIST_SELECT, minus prompt_preview for archives built before it existed (nothing in them is compressed)."""
+    if any(row[1] == "prompt_preview" for row in conn.execute('PRAGMA table_info(logs)')):
+        return LIST_SELECT
+    return LIST_SELECT.replace("IFNULL(logs.prompt_preview, logs.prompt)", "logs.prompt")
+
+def _compressed_snippets(conn: sqlite3.Connection, match: str, ids: List[int]) -> Dict[int, str]:
+    """
+    Snippets of matched rows with compressed bodies: their text is indexed in
+    a scratch in-memory FTS table (same tokenizer) and the match rerun there.
+    """
+    if not ids:
+        return {}
+    bodies = conn.execute(f'''
+        SELECT id, log_body(prompt), log_body(response), error, tag FROM logs
+        WHERE id IN ({", ".join("?" * len(ids))})
+    ''', ids).fetchall()
+    scratch = sqlite3.connect(":memory:")
+    try:
+        scratch.execute(f"CREATE VIRTUAL TABLE logs_fts USING fts5(prompt, response, error, tag, tokenize = '{FTS_TOKENIZE}')")
+        scratch.executemany('INSERT INTO logs_fts (rowid, prompt, response, error, tag) VALUES (?, ?, ?, ?, ?)', bodies)
+        return dict(scratch.execute(f'SELECT rowid, {SNIPPET_SQL} FROM logs_fts WHERE logs_fts MATCH ?', (match,)))
+    finally:
+        scratch.close()
+
+def logs_after(
+    after_id: int,
+    limit: int,
+    tag: Optional[str] = None,
+    model: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Up to ``limit`` list entries newer than ``after_id``, oldest first (logs.db only)."""
+    query = f'SELECT {LIST_SELECT} FROM logs WHERE id > ?'
+    params: List[Any] = [after_id]
+    if tag:
+        query += ' AND tag = ?'
+        params.append(tag)
+    if model:
+        query += ' AND model = ?'
+        params.append(model)
+    params.append(limit)
+    with get_db().reader() as conn:
+        return [_log_entry(row, False) for row in conn.execute(query + ' ORDER BY id LIMIT ?', params)]
+
+def export_logs(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    tag: Optional[str] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    **filters
+):
+    """
+    Yield lists of up to ``chunk_size`` EXPORT_FIELDS tuples, oldest first.
+
+    Takes the get_logs date/tag filters plus the typed-column filters. Rows
+    come from a cursor on a dedicated read-only connection, so the export
+    sees one consistent snapshot and memory stays at one chunk.
+    response and metadata are left as their JSON text (decompressed). Overlapping
+    archive partitions get a cursor each, merged in order. The schema text
+    is looked up once per schema_id (schemas stay in logs.db).
+    """
+    if not DB_FILE.exists():
+        return
+    params = []
+    conditions = []
+    if start_date:
+        conditions.append("logs.timestamp >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("logs.timestamp <= ?")
+        params.append(end_date)
+    if tag:
+        conditions.append("logs.tag LIKE ?")
+        params.append(f"%{tag}%")
+    _add_column_filters(conditions, params, **filters)
+    
+    def select(max_id: Optional[int] = None) -> Tuple[str, list]:
+        where = conditions + (["logs.id <= ?"] if max_id is not None else [])
+        query = f'SELECT {EXPORT_SELECT} FROM logs'
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        # Walk the timestamp index for date ranges, the table itself otherwise;
+        # either way no sort step is needed
+        query += " ORDER BY timestamp, id" if by_time else " ORDER BY id"
+        return query, params + ([max_id] if max_id is not None else [])
+    
+    by_time = bool(start_date or end_date)
+    with get_db().dedicated_reader() as conn, _snapshot(conn), ExitStack() as archives:
+        partitions = _partitions(conn, start_date, end_date)
+        conn.row_factory = None
+        cursors = [conn.execute(*select())]
+        for partition in partitions:
+            archive = archives.enter_context(_archive_db(partition["file"]).dedicated_reader())
+            archive.row_factory = None
+            cursors.append(archive.execute(*select(_visible_limit(partition))))
+        if len(cursors) == 1:
+            rows = cursors[0]
+        else:
+            rows = heapq.merge(*cursors, key=(lambda row: (row[1], row[0])) if by_time else (lambda row: row[0]))
+        schemas: Dict[int, Optional[str]] = {}
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            missing = {row[_EXPORT_SCHEMA_ID] for row in chunk} - schemas.keys() - {None}
+            if missing:
+                schemas.update(dict.fromkeys(missing))
+                schemas.update(conn.execute(
+                    f'SELECT id, schema FROM log_schemas WHERE id IN ({", ".join("?" * len(missing))})', list(missing)
+                ).fetchall())
+            yield [row + (schemas.get(row[_EXPORT_SCHEMA_ID]),) for row in chunk]
+
+def _display_body(value: Any) -> Optional[str]:
+    """Like _log_body, but a compressed body reads as a notice when zstandard is missing."""
+    if isinstance(value, bytes) and not body_codec.available:
+        return f"[{MISSING_CODEC}]"
+    return _log_body(value)
+
+def _log_entry(row: sqlite3.Row, full: bool) -> Dict[str, Any]:
+    entry = {
+        "id": row["id"],
+        "timestamp": row["timestamp"],
+        "model": row["model"],
+        "prompt": _display_body(row["prompt"]),
+        "duration_ms": row["duration_ms"],
+        "error": row["error"],
+        "locked": bool(row["locked"]),
+        "tag": row["tag"],
+        "schema_id": row["schema_id"]
+    }
+    for name in TYPED_COLUMNS:
+        entry[name] = row[name]
+    if full:
+        # Parse JSON fields back to objects
+        response = _display_body(row["response"])
+        try:
+            entry["response"] = json.loads(response)
+        except:
+            entry["response"] = response
+            
+        try:
+            entry["metadata"] = json.loads(row["metadata"])
+        except:
+            entry["metadata"] = {}
+    return entry
+
+def get_log(log_id: int) -> Optional[Dict[str, Any]]:
+    """One log with its response, metadata and (resolved) schema, or None."""
+    if not DB_FILE.exists():
+        return None
+        
+    try:
+        with get_db().reader() as conn, _snapshot(conn):
+            row = conn.execute('''
+                SELECT logs.*, log_schemas.schema AS schema
+                FROM logs LEFT JOIN log_schemas ON log_schemas.id = logs.schema_id
+                WHERE logs.id = ?
+            ''', (log_id,)).fetchone()
+            partitions = [] if row else conn.execute(
+                'SELECT * FROM log_partitions WHERE min_id <= ? AND max_id >= ? AND visible_id >= ?',
+                (log_id, log_id, log_id)
+            ).fetchall()
+        schema = row["schema"] if row else None
+        for partition in partitions:
+            with _archive_db(partition["file"]).reader() as archive:
+                row = archive.execute('SELECT * FROM logs WHERE id = ?', (log_id,)).fetchone()
+            if row is not None:
+                if row["schema_id"] is not None:
+                    # Schemas stay in logs.db
+                    with get_db().reader() as conn:
+                        found = conn.execute('SELECT schema FROM log_schemas WHERE id = ?', (row["schema_id"],)).fetchone()
+                    schema = found[0] if found else None
+                break
+    except Exception as e:
+        print(f"Error reading log from DB: {e}")
+        return None
+    if row is None:
+        return None
+    entry = _log_entry(row, full=True)
+    entry["schema"] = schema
+    return entry
+
+def list_schemas() -> List[Dict[str, Any]]:
+    """Stored schemas with the number of logs that reference each."""
+    if not DB_FILE.exists():
+        return []
+        
+    try:
+        with get_db().reader() as conn:
+            rows = conn.execute('''
+                SELECT id, hash, schema,
+                       (SELECT COUNT(*) FROM logs WHERE logs.schema_id = log_schemas.id) AS logs
+                FROM log_schemas ORDER BY id
+            ''').fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        print(f"Error reading schemas: {e}")
+        return []
+
+def _add_column_filters(
+    conditions: List[str],
+    params: list,
+    format: Optional[str] = None,
+    provider: Optional[str] = None,
+    status: Optional[str] = None,
+    min_tokens: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    schema_id: Optional[int] = None
+):
+    """Append exact-match and token-range filters on the typed columns."""
+    for name, value in (("format", format), ("provider", provider), ("status", status)):
+        if value:
+            conditions.append(f"logs.{name} = ?")
+            params.append(value)
+    if min_tokens is not None:
+        conditions.append("logs.total_tokens >= ?")
+        params.append(min_tokens)
+    if max_tokens is not None:
+        conditions.append("logs.total_tokens <= ?")
+        params.append(max_tokens)
+    if schema_id is not None:
+        conditions.append("logs.schema_id = ?")
+        params.append(schema_id)
+
+def _day_of(value: str) -> Optional[str]:
+    """Return the YYYY-MM-DD prefix of an ISO date/timestamp, or None if it isn't one."""
+    try:
+        return date.fromisoformat(value[:10]).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+def _count_log_rows(
+    conn: sqlite3.Connection,
+    start: Optional[str],
+    end: Optional[str],
+    before: Optional[str],
+    tag: Optional[str],
+    match: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    max_id: Optional[int] = None
+) -> int:
+    """COUNT(*) over logs for timestamp >= start, <= end and < before (and id <= max_id)."""
+    query = 'SELECT COUNT(*) FROM logs'
+    params = []
+    conditions = []
+    
+    if match:
+        query += ' JOIN logs_fts ON logs_fts.rowid = logs.id'
+        conditions.append("logs_fts MATCH ?")
+        params.append(match)
+    if start:
+        conditions.append("logs.timestamp >= ?")
+        params.append(start)
+    if end:
+        conditions.append("logs.timestamp <= ?")
+        params.append(end)
+    if before:
+        conditions.append("logs.timestamp < ?")
+        params.append(before)
+    if tag:
+        conditions.append("logs.tag LIKE ?")
+        params.append(f"%{tag}%")
+    _add_column_filters(conditions, params, **(filters or {}))
+    if max_id is not None:
+        conditions.append("logs.id <= ?")
+        params.append(max_id)
+        
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+        
+    return conn.execute(query, params).fetchone()[0]
+
 def count_logs(
     start_date: Optional[str] = None, 
     end_date: Optional[str] = None,
-    tag: Optional[str] = None
+    tag: Optional[str] = None,
+    q: Optional[str] = None,
+    format: Optional[str] = None,
+    provider: Optional[str] = None,
+    status: Optional[str] = None,
+    min_tokens: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    schema_id: Optional[int] = None
 ) -> int:
-    """Count total logs matching filters."""
+    """
+    Count total logs matching filters.
+
+    Whole days are summed from the log_counts buckets; only the partial days
+    at either end of a date range are counted from the logs table (through
+    the timestamp index). Search queries (``q``) are counted from the FTS
+    index, and filters on the typed columns through their indexes. Archive
+    partitions overlapping the range are counted the same way.
+    """
     if not DB_FILE.exists():
         return 0
         
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        query = 'SELECT COUNT(*) FROM logs'
-        params = []
-        conditions = []
-        
-        if start_date:
-            conditions.append("timestamp >= ?")
-            params.append(start_date)
-        if end_date:
-            conditions.append("timestamp <= ?")
-            params.append(end_date)
-        if tag:
-            conditions.append("tag LIKE ?")
-            params.append(f"%{tag}%")
-            
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+        filters = {
+            "format": format, "provider": provider, "status": status,
+            "min_tokens": min_tokens, "max_tokens": max_tokens, "schema_id": schema_id
+        }
+        match = _match_expression(q) if q else None
+        if q and not match:
+            return 0
             
-        c.execute(query, params)
-        count = c.fetchone()[0]
-        conn.close()
-        return count
+        with get_db().reader() as conn, _snapshot(conn):
+            total = _count_source(conn, start_date, end_date, tag, match, filters)
+            partitions = _partitions(conn, start_date, end_date)
+        for partition in partitions:
+            with _archive_db(partition["file"]).reader() as archive:
+                total += _count_source(archive, start_date, end_date, tag, match, filters, _visible_limit(partition))
+        return total
     except Exception as e:
         print(f"Error counting logs: {e}")
         return 0
 
-def purge_logs(days_to_keep: int) -> int:
+def _count_source(
+    conn: sqlite3.Connection,
+    start_date: Optional[str],
+    end_date: Optional[str],
+    tag: Optional[str],
+    match: Optional[str],
+    filters: Dict[str, Any],
+    max_id: Optional[int] = None
+) -> int:
+    """count_logs() for one database (logs.db or an archive partition)."""
+    if match or max_id is not None or any(value not in (None, "") for value in filters.values()):
+        return _count_log_rows(conn, start_date, end_date, None, tag, match, filters, max_id)
+        
+    start_day = _day_of(start_date) if start_date else None
+    end_day = _day_of(end_date) if end_date else None
+    if (start_date and not start_day) or (end_date and not end_day):
+        # Not an ISO date, so day buckets don't apply
+        return _count_log_rows(conn, start_date, end_date, None, tag)
+        
+    query = 'SELECT COALESCE(SUM(count), 0) FROM log_counts'
+    params = []
+    conditions = []
+    
+    if start_day:
+        conditions.append("day > ?")
+        params.append(start_day)
+    if end_day:
+        conditions.append("day < ?")
+        params.append(end_day)
+    if tag:
+        conditions.append("tag LIKE ?")
+        params.append(f"%{tag}%")
+        
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+        
+    total = conn.execute(query, params).fetchone()[0]
+    
+    # Partial days at the edges of the range
+    if start_day and start_day == end_day:
+        total += _count_log_rows(conn, start_date, end_date, None, tag)
+    else:
+        if start_day:
+            next_day = (date.fromisoformat(start_day) + timedelta(days=1)).isoformat()
+            total += _count_log_rows(conn, start_date, end_date, next_day, tag)
+        if end_day:
+            lower = max(end_day, start_date) if start_date else end_day
+            total += _count_log_rows(conn, lower, end_date, None, tag)
+    return total
+
+def _delete_in_batches(where: str, params: tuple, limit: Optional[int] = None,
+                       batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """
+    Delete unlocked logs matching ``where`` a batch per transaction, at most
+    ``limit`` (oldest ids first). Returns count of deleted rows.
+    """
+    order = "ORDER BY id" if limit is not None else ""
+    deleted = 0
+    while limit is None or deleted < limit:
+        size = batch_size if limit is None else min(batch_size, limit - deleted)
+        with get_db().writer() as conn:
+            c = conn.execute(f'''
+                DELETE FROM logs WHERE id IN (
+                    SELECT id FROM logs WHERE {where} AND {UNLOCKED} {order} LIMIT ?
+                )
+            ''', params + (size,))
+        deleted += c.rowcount
+        if c.rowcount < size:
+            break
+        time.sleep(RETENTION_BATCH_PAUSE)
+    return deleted
+
+def purge_logs(days_to_keep: int, batch_size: int = RETENTION_BATCH_SIZE) -> int:
     """Delete logs older than N days, respecting locks. Returns count of deleted rows."""
     if not DB_FILE.exists():
         return 0
         
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        # Calculate cutoff date
-        cutoff_date = datetime.utcnow().timestamp() - (days_to_keep * 86400)
-        cutoff_iso = datetime.fromtimestamp(cutoff_date).isoformat()
-        
-        c.execute('DELETE FROM logs WHERE timestamp < ? AND (locked IS NULL OR locked = 0)', (cutoff_iso,))
-        deleted_count = c.rowcount
-        
-        conn.commit()
-        conn.close()
-        return deleted_count
+        cutoff_iso = (datetime.utcnow() - timedelta(days=days_to_keep)).isoformat()
+        return _delete_in_batches('timestamp < ?', (cutoff_iso,), batch_size=batch_size)
     except Exception as e:
         print(f"Error purging logs: {e}")
         return 0
 
-def purge_logs_by_count(count_to_keep: int) -> int:
+def purge_logs_by_count(count_to_keep: int, batch_size: int = RETENTION_BATCH_SIZE) -> int:
     """Keep only the most recent N logs, respecting locks. Returns count of deleted rows."""
     if not DB_FILE.exists():
         return 0
         
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        # Find the ID of the N-th newest log
-        c.execute('SELECT id FROM logs ORDER BY id DESC LIMIT 1 OFFSET ?', (count_to_keep - 1,))
-        row = c.fetchone()
-        
+        with get_db().reader() as conn:
+            # Find the ID of the N-th newest log
+            row = conn.execute('SELECT id FROM logs ORDER BY id DESC LIMIT 1 OFFSET ?', (count_to_keep - 1,)).fetchone()
+            
         if not row:
-            conn.close()
             return 0
             
-        cutoff_id = row[0]
-        
         # Delete logs with id < cutoff_id that are not locked
-        c.execute('DELETE FROM logs WHERE id < ? AND (locked IS NULL OR locked = 0)', (cutoff_id,))
-        deleted_count = c.rowcount
-        
-        conn.commit()
-        conn.close()
-        return deleted_count
+        return _delete_in_batches('id < ?', (row[0],), batch_size=batch_size)
     except Exception as e:
         print(f"Error purging logs by count: {e}")
         return 0
 
+def db_size() -> Dict[str, Any]:
+    """Database file size, the part of it holding data, and the WAL size (bytes)."""
+    if not DB_FILE.exists():
+        return {"file_bytes": 0, "used_bytes": 0, "free_bytes": 0, "wal_bytes": 0, "auto_vacuum": None}
+    with get_db().reader() as conn:
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        pages = conn.execute('PRAGMA page_count').fetchone()[0]
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    wal = DB_FILE.with_name(DB_FILE.name + "-wal")
+    return {
+        "file_bytes": pages * page_size,
+        "used_bytes": (pages - free) * page_size,
+        "free_bytes": free * page_size,
+        "wal_bytes": wal.stat().st_size if wal.exists() else 0,
+        "auto_vacuum": ("none", "full", "incremental")[auto_vacuum],
+    }
+
+def purge_logs_by_size(max_bytes: int, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """
+    Delete the oldest unlocked logs until the data in the database fits in
+    ``max_bytes``, respecting locks. Returns count of deleted rows.
+
+    Rows to delete are estimated from the average row size, then checked
+    again (deleting rows doesn't always free whole pages). Stats rollups
+    count towards the size but are never deleted.
+    """
+    if not DB_FILE.exists():
+        return 0
+
+    deleted = 0
+    try:
+        for _ in range(3):
+            excess = db_size()["used_bytes"] - max_bytes
+            if excess <= 0:
+                break
+            with get_db().reader() as conn:
+                rows = conn.execute('SELECT COUNT(*) FROM logs').fetchone()[0]
+            if not rows:
+                break
+            row_bytes = max(db_size()["used_bytes"] / rows, 1)
+            batch = _delete_in_batches('1', (), limit=math.ceil(excess / row_bytes), batch_size=batch_size)
+            deleted += batch
+            if not batch:
+                break
+            # Deleted rows stay in the search index until it is compacted
+            compact_search_index()
+    except Exception as e:
+        print(f"Error purging logs by size: {e}")
+    return deleted
+
+def incremental_vacuum(max_pages: Optional[int] = None) -> int:
+    """
+    Return free pages to the filesystem a step at a time. Returns pages released.
+
+    Only works when the database uses auto_vacuum = INCREMENTAL (new
+    databases do; older ones switch with vacuum_db()).
+    """
+    if not DB_FILE.exists():
+        return 0
+    released = 0
+    try:
+        while max_pages is None or released < max_pages:
+            with get_db().writer() as conn:
+                if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                    break
+                free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                step = min(free, VACUUM_STEP_PAGES if max_pages is None else min(VACUUM_STEP_PAGES, max_pages - released))
+                if step <= 0:
+                    break
+                # executescript steps the pragma to completion (execute() frees a single page)
+                conn.executescript(f'PRAGMA incremental_vacuum({step})')
+            released += step
+            time.sleep(RETENTION_BATCH_PAUSE)
+    except Exception as e:
+        print(f"Error running incremental vacuum: {e}")
+    return released
+
+def compact_search_index(max_steps: int = FTS_MERGE_MAX_STEPS) -> int:
+    """
+    Merge search index segments a step at a time so entries of deleted logs
+    are dropped (FTS5 only records deletions until segments are merged).
+    Returns the steps that did work.
+
+    Uses the positive 'merge' form: the negative (merge everything) form
+    corrupted the index on SQLite 3.40 when log inserts ran between steps.
+    """
+    if not DB_FILE.exists():
+        return 0
+    steps = 0
+    try:
+        while steps < max_steps:
+            with get_db().writer() as conn:
+                before = conn.total_changes
+                conn.execute("INSERT INTO logs_fts (logs_fts, rank) VALUES ('merge', ?)", (FTS_MERGE_PAGES,))
+                if conn.total_changes - before < 2:
+                    break
+            steps += 1
+            time.sleep(RETENTION_BATCH_PAUSE)
+    except Exception as e:
+        print(f"Error compacting search index: {e}")
+    return steps
+
+def vacuum_db():
+    """
+    Rebuild the database with a full VACUUM, switching it to incremental
+    auto-vacuum. Blocks writes while it runs; meant for a one-off on
+    databases created before retention existed.
+    """
+    with get_db().writer() as conn:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.commit()
+        conn.execute('VACUUM')
+
 def toggle_log_lock(log_id: int, locked: bool) -> bool:
     """Update the lock status of a log entry."""
     if not DB_FILE.exists():
         return False
         
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('UPDATE logs SET locked = ? WHERE id = ?', (1 if locked else 0, log_id))
-        conn.commit()
-        updated = c.rowcount > 0
-        conn.close()
-        return updated
+        with get_db().writer() as conn:
+            c = conn.execute('UPDATE logs SET locked = ? WHERE id = ?', (1 if locked else 0, log_id))
+            return c.rowcount > 0
     except Exception as e:
         print(f"Error toggling log locks: {e}")
         return False
 
+def _percentile(buckets: List[tuple], total: int, pct: float) -> Optional[float]:
+    """Percentile (ms) from sorted (bucket, count) pairs."""
+    if not total:
+        return None
+    rank = pct / 100 * total
+    seen = 0
+    for bucket, count in buckets:
+        seen += count
+        if seen >= rank:
+            return round(_bucket_value(bucket), 1)
+    return round(_bucket_value(buckets[-1][0]), 1)
+
+def _shift_day(day: str, days: int) -> str:
+    return (datetime.fromisoformat(day) + timedelta(days=days)).strftime("%Y-%m-%d")
+
+def _rollup_ranges(start_hour: Optional[str], end_hour: Optional[str], hourly: bool) -> Tuple[str, list]:
+    """
+    WHERE clause selecting rollup rows covering [start_hour, end_hour].
+
+    Whole days come from daily rows; partial days at either edge from hourly
+    rows. ``hourly`` forces hourly rows throughout (for group_by=hour).
+    """
+    if hourly:
+        clause, params = "grain = 'h'", []
+        if start_hour:
+            clause += " AND period >= ?"
+            params.append(start_hour)
+        if end_hour:
+            clause += " AND period <= ?"
+            params.append(end_hour)
+        return "(" + clause + ")", params
+        
+    first_day = None
+    if start_hour:
+        first_day = start_hour[:10] if start_hour.endswith("T00") else _shift_day(start_hour[:10], 1)
+    last_day = None
+    if end_hour:
+        last_day = end_hour[:10] if end_hour.endswith("T23") else _shift_day(end_hour[:10], -1)
+    if first_day and last_day and first_day > last_day:
+        return "(grain = 'h' AND period >= ? AND period <= ?)", [start_hour, end_hour]
+        
+    day_clause, day_params = "grain = 'd'", []
+    edges, edge_params = [], []
+    if first_day:
+        day_clause += " AND period >= ?"
+        day_params.append(first_day)
+        if not start_hour.endswith("T00"):
+            edges.append("(grain = 'h' AND period >= ? AND period < ?)")
+            edge_params.extend([start_hour, first_day + "T00"])
+    if last_day:
+        day_clause += " AND period <= ?"
+        day_params.append(last_day)
+        if not end_hour.endswith("T23"):
+            edges.append("(grain = 'h' AND period > ? AND period <= ?)")
+            edge_params.extend([last_day + "T23", end_hour])
+    return "(" + " OR ".join(["(" + day_clause + ")"] + edges) + ")", day_params + edge_params
+
+def get_stats(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    model: Optional[str] = None,
+    tag: Optional[str] = None,
+    group_by: Optional[List[str]] = None,
+    percentiles: Optional[List[float]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate stats from the hourly rollups.
+
+    Dates are matched at hour granularity (a date-only end_date covers the
+    whole day). ``group_by`` takes any of model, tag, hour and day; model and
+    tag filters are exact matches. Latency percentiles come from the merged
+    log-bucket sketches.
+    """
+    if not DB_FILE.exists():
+        return []
+    group_by = [g for g in (["model"] if group_by is None else group_by) if g in STATS_GROUPS]
+    percentiles = percentiles or [50, 95, 99]
+    
+    start_hour = start_date[:13] if start_date and len(start_date) > 10 else (start_date and start_date[:10] + "T00")
+    end_hour = end_date[:13] if end_date and len(end_date) > 10 else (end_date and end_date[:10] + "T23")
+    range_clause, params = _rollup_ranges(start_hour, end_hour, hourly="hour" in group_by)
+    conditions = [range_clause]
+    if model:
+        conditions.append("model = ?")
+        params.append(model)
+    if tag is not None:
+        conditions.append("tag = ?")
+        params.append(tag)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    columns = [f"{STATS_GROUPS[g]} AS {g}" for g in group_by]
+    group_clause = " GROUP BY " + ", ".join(group_by) if group_by else ""
+    select_groups = ", ".join(columns) + ", " if columns else ""
+    
+    try:
+        with get_db().reader() as conn:
+            totals = conn.execute(f'''
+                SELECT {select_groups}SUM(count) AS count, SUM(errors) AS errors,
+                       SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+                       SUM(total_tokens) AS total_tokens, SUM(duration_ms_sum) AS duration_ms_sum
+                FROM log_rollups{where}{group_clause}
+            ''', params).fetchall()
+            latency_group = " GROUP BY " + ", ".join(group_by + ["bucket"])
+            latency_rows = conn.execute(f'''
+                SELECT {select_groups}bucket, SUM(count) AS count
+                FROM log_rollup_latency{where}{latency_group}
+                ORDER BY {", ".join(group_by + ["bucket"])}
+            ''', params).fetchall()
+    except Exception as e:
+        print(f"Error reading stats: {e}")
+        return []
+        
+    sketches: Dict[tuple, List[tuple]] = {}
+    for row in latency_rows:
+        key = tuple(row[g] for g in group_by)
+        sketches.setdefault(key, []).append((row["bucket"], row["count"]))
+        
+    stats = []
+    for row in totals:
+        count = row["count"] or 0
+        if not count:
+            continue
+        key = tuple(row[g] for g in group_by)
+        buckets = sketches.get(key, [])
+        entry = {g: row[g] for g in group_by}
+        entry.update({
+            "count": count,
+            "errors": row["errors"],
+            "error_rate": round(row["errors"] / count, 4),
+            "prompt_tokens": row["prompt_tokens"],
+            "completion_tokens": row["completion_tokens"],
+            "total_tokens": row["total_tokens"],
+            "avg_duration_ms": round(row["duration_ms_sum"] / count, 1),
+            "latency_ms": {
+                f"p{p:g}": _percentile(buckets, sum(c for _, c in buckets), p) for p in percentiles
+            }
+        })
+        stats.append(entry)
+    return stats
+
 def get_unique_tags() -> List[str]:
     """Retrieve all unique tags from the logs table."""
     if not DB_FILE.exists():
         return []
         
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('SELECT DISTINCT tag FROM logs WHERE tag IS NOT NULL AND tag != "" ORDER BY tag COLLATE NOCASE')
-        tags = [row[0] for row in c.fetchall()]
-        conn.close()
-        return tags
+        with get_db().reader() as conn:
+            rows = conn.execute("SELECT DISTINCT tag FROM log_counts WHERE tag != '' AND count > 0 ORDER BY tag COLLATE NOCASE").fetchall()
+        return [row[0] for row in rows]
     except Exception as e:
         print(f"Error fetching unique tags: {e}")
         return []
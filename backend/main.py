@@ -5,20 +5,38 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict, Any, Union
 
 from service import llm_service
-from logger import get_logs, init_db, count_logs, purge_logs, purge_logs_by_count
+import metrics
+from logger import LOG_SORT_COLUMNS, get_logs, init_db, close_db, start_log_writer, stop_log_writer, start_backfills, count_logs
+from retention import RetentionScheduler
 
 
 from fastapi.middleware.cors import CORSMiddleware
+from http_middleware import CompactResponseMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import asyncio
 import json
+import uuid
 from pathlib import Path
+from datetime import datetime
 
 # ... (imports) ...
 
 app = FastAPI(title="Simple LLM Service")
+retention = RetentionScheduler(lambda: llm_service.retention_settings)
 
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    start_log_writer()
+    start_backfills()
+    retention.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await llm_service.aclose()
+    retention.stop()
+    stop_log_writer()
+    close_db()
 
 # Allow CORS for frontend dev
 app.add_middleware(
@@ -28,19 +46,25 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# ETags (304 for unchanged pages) and gzip/brotli for JSON responses
+app.add_middleware(CompactResponseMiddleware)
 
 
 
 class Settings(BaseModel):
-    providers: Dict[str, Dict[str, str]]
+    providers: Dict[str, Dict[str, Any]]
     model_names: str = ""
+    cache: Dict[str, Any] = {}
+    retention: Dict[str, Any] = {}
 
 @app.get("/api/settings")
 async def get_settings():
     # Helper to return current merged settings
     return {
         "providers": llm_service.providers,
-        "model_names": llm_service.model_names
+        "model_names": llm_service.model_names,
+        "cache": llm_service.cache_settings,
+        "retention": llm_service.retention_settings
     }
 
 @app.post("/api/settings")
@@ -52,6 +76,7 @@ async def update_settings(settings: Settings):
         
         # Reload service
         llm_service.load_settings()
+        retention.trigger()
         
         return {"status": "success"}
     except Exception as e:
@@ -63,11 +88,48 @@ class GenerateRequest(BaseModel):
     response_format: Optional[str] = "text"  # text or dict
     schema: Optional[str] = None
     tag: Optional[str] = None
+    temperature: Optional[float] = None
+    cache: Optional[str] = None  # default, bypass or refresh (when the response cache is enabled)
+    stream: bool = False  # Server-sent events: {"delta": ...} chunks, then {"done": true, "data": ...}
+    repair: bool = False  # Dict mode: one extra round trip to fix a reply that fails the schema (not streamed)
+    hedge: Optional[bool] = None  # Hedge slow provider calls (default: the provider's "hedge" setting; not streamed)
+    coalesce: Optional[bool] = None  # Share one provider call among identical concurrent requests (default: only at temperature 0; not streamed)
 
 @app.get("/")
 async def read_root():
     return {"message": "Simple LLM API"}
 
+@app.get("/metrics")
+async def read_metrics():
+    """Prometheus text exposition of request, provider and log-writer metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/endpoints")
+async def read_endpoints():
+    """Load, latency and health of each endpoint of multi-endpoint providers."""
+    return llm_service.endpoint_status()
+
+
+async def _sse_events(req: GenerateRequest, response_format: str):
+    """Relay generate_stream events to the client as server-sent events."""
+    try:
+        async for event in llm_service.generate_stream(
+            prompt=req.prompt,
+            model=req.model,
+            response_format=response_format,
+            schema=req.schema,
+            tag=req.tag,
+            temperature=req.temperature,
+            cache=req.cache
+        ):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)}, ensure_ascii=False)}\n\n"
+    yield "data: [DONE]\n\n"
+
+class BatchGenerateRequest(BaseModel):
+    requests: List[GenerateRequest]
+    tag: Optional[str] = None  # Applied to every row of the batch (falls back to each item's tag)
 
 @app.post("/api/generate")
 async def generate(req: GenerateRequest):
@@ -78,42 +140,185 @@ async def generate(req: GenerateRequest):
         if actual_format == "dict" and not req.schema:
             raise HTTPException(status_code=400, detail="Schema is required for dict format")
             
-        result = llm_service.generate(
+        if req.stream:
+            return StreamingResponse(
+                _sse_events(req, actual_format),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+            
+        result = await llm_service.generate(
             prompt=req.prompt,
             model=req.model,
             response_format=actual_format,
             schema=req.schema,
-            tag=req.tag
+            tag=req.tag,
+            temperature=req.temperature,
+            cache=req.cache,
+            repair=req.repair,
+            hedge=req.hedge,
+            coalesce=req.coalesce
         )
         return {"status": "success", "data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-from logger import get_logs, init_db, count_logs, purge_logs, toggle_log_lock, purge_logs_by_count
+@app.post("/api/generate/batch")
+async def generate_batch(req: BatchGenerateRequest):
+    """Run a list of generations, streaming NDJSON results in completion order."""
+    batch_id = uuid.uuid4().hex
+    items = [
+        {
+            "prompt": item.prompt,
+            "model": item.model,
+            "response_format": "dict" if item.schema else "text",
+            "schema": item.schema,
+            "tag": item.tag,
+            "temperature": item.temperature,
+            "cache": item.cache,
+            "repair": item.repair,
+            "hedge": item.hedge,
+            "coalesce": item.coalesce
+        }
+        for item in req.requests
+    ]
+
+    async def lines():
+        async for result in llm_service.generate_batch(items, tag=req.tag, batch_id=batch_id):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Batch-Id": batch_id})
+
+from logger import get_logs, init_db, count_logs, toggle_log_lock
 
 # ...
 
 class LogLockRequest(BaseModel):
     locked: bool
 
+# Handlers that query SQLite are plain functions, so FastAPI runs them in
+# its threadpool: a read or a lock toggle waiting on the write lock (log
+# batches, retention, VACUUM) never stalls the event loop
+
 @app.patch("/api/logs/{log_id}")
-async def toggle_log(log_id: int, req: LogLockRequest):
+def toggle_log(log_id: int, req: LogLockRequest):
     success = toggle_log_lock(log_id, req.locked)
+    if not success:
+        # Archived logs move back into logs.db when locked
+        from archive import set_archived_lock
+        success = set_archived_lock(log_id, req.locked)
     if not success:
         raise HTTPException(status_code=404, detail="Log not found")
     return {"status": "success", "locked": req.locked}
 
+@app.delete("/api/logs")
+async def delete_logs(days_to_keep: Optional[int] = None, count_to_keep: Optional[int] = None):
+    """
+    Purge logs older than ``days_to_keep`` days and/or beyond the newest
+    ``count_to_keep``. Locked logs are kept. Deletes run in small batches on
+    a worker thread, so log writes from /api/generate keep flowing.
+    """
+    if days_to_keep is None and count_to_keep is None:
+        raise HTTPException(status_code=400, detail="Pass days_to_keep and/or count_to_keep")
+    if (days_to_keep is not None and days_to_keep < 0) or (count_to_keep is not None and count_to_keep < 1):
+        raise HTTPException(status_code=400, detail="days_to_keep must be >= 0 and count_to_keep >= 1")
+    result = await asyncio.to_thread(
+        retention.run_once, {"max_age_days": days_to_keep, "max_rows": count_to_keep}
+    )
+    return {"status": "success", **result}
+
+@app.get("/api/retention")
+async def read_retention():
+    """Retention policy, last run and database size."""
+    return await asyncio.to_thread(retention.status)
+
+@app.post("/api/retention/run")
+async def run_retention_now():
+    return await asyncio.to_thread(retention.run_once)
+
+@app.post("/api/retention/vacuum")
+async def vacuum_database():
+    """
+    One-off full VACUUM that switches databases created before retention to
+    incremental auto-vacuum. Blocks log writes while it runs.
+    """
+    from logger import db_size, vacuum_db
+    await asyncio.to_thread(vacuum_db)
+    return await asyncio.to_thread(db_size)
+
+@app.get("/api/partitions")
+def read_partitions():
+    """Archive partitions: closed periods moved out of logs.db."""
+    from logger import list_partitions
+    return list_partitions()
+
+@app.post("/api/partitions")
+async def create_partition(period: str, compress: bool = False):
+    """Archive a closed month (YYYY-MM) or day (YYYY-MM-DD)."""
+    from archive import archive_partition
+    try:
+        return await asyncio.to_thread(archive_partition, period, compress)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/partitions/{name}/compress")
+async def compress_log_partition(name: str):
+    from archive import compress_partition
+    try:
+        return await asyncio.to_thread(compress_partition, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/api/partitions/{name}")
+async def delete_partition(name: str):
+    """Delete an archive partition and the logs in it."""
+    from archive import drop_partition
+    try:
+        if not await asyncio.to_thread(drop_partition, name):
+            raise HTTPException(status_code=404, detail="Partition not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success"}
+
 @app.get("/api/logs")
-async def read_logs(
+def read_logs(
     page: int = 1, 
     limit: int = 50,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    tag: Optional[str] = None
+    tag: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    q: Optional[str] = None,
+    format: Optional[str] = None,
+    provider: Optional[str] = None,
+    status: Optional[str] = None,
+    min_tokens: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    schema_id: Optional[int] = None,
+    sort: str = "id",
+    order: str = "desc",
+    full: bool = False
 ):
+    # before_id/after_id (cursor) pagination is the fast path; page is only
+    # turned into an OFFSET when no cursor is given. Search results (q) and
+    # other sort orders always use page/OFFSET. Rows leave out the response
+    # and metadata blobs unless full=true.
+    if sort not in LOG_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(LOG_SORT_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    filters = dict(
+        format=format, provider=provider, status=status,
+        min_tokens=min_tokens, max_tokens=max_tokens, schema_id=schema_id
+    )
     offset = (page - 1) * limit
-    logs = get_logs(limit=limit, offset=offset, start_date=start_date, end_date=end_date, tag=tag)
-    total = count_logs(start_date=start_date, end_date=end_date, tag=tag)
+    logs = get_logs(
+        limit=limit, offset=offset, start_date=start_date, end_date=end_date, tag=tag,
+        before_id=before_id, after_id=after_id, q=q, sort=sort, order=order, full=full, **filters
+    )
+    total = count_logs(start_date=start_date, end_date=end_date, tag=tag, q=q, **filters)
+    keyset = not q and sort == "id" and order == "desc"
     
     return {
         "data": logs,
@@ -121,14 +326,181 @@ async def read_logs(
             "page": page,
             "limit": limit,
             "total": total,
-            "pages": (total + limit - 1) // limit
+            "pages": (total + limit - 1) // limit,
+            # Cursors: pass before_id for the next (older) page, after_id for the previous one
+            "before_id": logs[-1]["id"] if len(logs) == limit and keyset else None,
+            "after_id": logs[0]["id"] if logs and keyset else None
         }
     }
 
+@app.get("/api/logs/export")
+def export_logs_file(
+    format: str = "ndjson",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    tag: Optional[str] = None,
+    provider: Optional[str] = None,
+    status: Optional[str] = None,
+    min_tokens: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    schema_id: Optional[int] = None,
+    log_format: Optional[str] = None
+):
+    """
+    Stream matching logs as NDJSON, CSV or Parquet, oldest first.
+
+    ``format`` picks the file format, so the typed format column is
+    filtered with ``log_format``. Rows are read and encoded one chunk at a
+    time (on a worker thread), so exports of any size run in constant memory.
+    """
+    from logger import export_logs
+    from export import EXPORT_FORMATS, export_chunks, pa
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if format == "parquet" and pa is None:
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow on the server")
+    media_type, extension = EXPORT_FORMATS[format]
+    batches = export_logs(
+        start_date=start_date, end_date=end_date, tag=tag,
+        format=log_format, provider=provider, status=status,
+        min_tokens=min_tokens, max_tokens=max_tokens, schema_id=schema_id
+    )
+    filename = f"logs-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{extension}"
+    return StreamingResponse(
+        export_chunks(format, batches),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/logs/stream")
+async def stream_logs(
+    request: Request,
+    after_id: Optional[int] = None,
+    tag: Optional[str] = None,
+    model: Optional[str] = None
+):
+    """
+    Live tail of new logs as server-sent events ("log" events with the light
+    list rows, newest last), pushed from the log writer instead of polling
+    /api/logs. Pass the last id seen as ``after_id`` (browsers send it as
+    Last-Event-ID when they reconnect) to replay what was missed; a "reset"
+    event means too much was missed and the page should be reloaded. Slow
+    clients get a "dropped" event and the stream ends.
+    """
+    from live import log_broker
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after_id = int(last_event_id)
+
+    async def events():
+        yield "retry: 1000\n\n"
+        async for event in log_broker.tail(after_id, tag, model):
+            if event["event"] == "keepalive":
+                yield ": keepalive\n\n"
+            elif event["event"] == "log":
+                entry = event["data"]
+                yield f"id: {entry['id']}\nevent: log\ndata: {json.dumps(entry, ensure_ascii=False)}\n\n"
+            else:
+                yield f"event: {event['event']}\ndata: {{}}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/logs/import")
+async def import_logs_file(request: Request, import_id: Optional[str] = None):
+    """
+    Bulk import a JSONL body (legacy llm.jsonl lines or NDJSON from
+    /api/logs/export, optionally sent with Content-Encoding: gzip).
+
+    The body is streamed and committed in chunks on a worker thread. Pass
+    ``import_id`` to make the import resumable: re-sending the same body
+    with the same id skips the lines that were already committed. Indexes
+    stay live here; use import_logs.py for offline loads of large files.
+    """
+    import zlib
+    from importer import LogImporter
+    importer = await asyncio.to_thread(LogImporter, import_id)
+    decompressor = zlib.decompressobj(wbits=31) if request.headers.get("content-encoding") == "gzip" else None
+    pending = b""
+    lines: List[bytes] = []
+    try:
+        async for data in request.stream():
+            if decompressor is not None:
+                data = decompressor.decompress(data)
+            *complete, pending = (pending + data).split(b"\n")
+            lines.extend(complete)
+            if len(lines) >= importer.chunk_size:
+                await asyncio.to_thread(importer.add_lines, lines)
+                lines = []
+        if decompressor is not None:
+            pending += decompressor.flush()
+        if pending:
+            lines.append(pending)
+        await asyncio.to_thread(importer.add_lines, lines)
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+    return importer.progress()
+
 # API-only mode - frontend served separately on port 31160
 
+@app.get("/api/stats")
+def read_stats(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    model: Optional[str] = None,
+    tag: Optional[str] = None,
+    group_by: str = "model",
+    percentiles: str = "50,95,99"
+):
+    """Latency percentiles, error rates and token totals from the hourly rollups."""
+    from logger import get_stats
+    try:
+        pcts = [float(p) for p in percentiles.split(",") if p.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be comma-separated numbers")
+    groups = [g.strip() for g in group_by.split(",") if g.strip()]
+    return {
+        "data": get_stats(
+            start_date=start_date, end_date=end_date, model=model, tag=tag,
+            group_by=groups, percentiles=pcts
+        )
+    }
+
 @app.get("/api/logs/tags")
-async def get_log_tags():
+def get_log_tags():
     """Get unique tags from logs."""
     from logger import get_unique_tags
     return get_unique_tags()
+
+@app.get("/api/logs/dictionaries")
+def read_log_dictionaries():
+    """Compression settings and the shared zstd dictionaries for large log bodies."""
+    from logger import list_dictionaries
+    return list_dictionaries()
+
+@app.post("/api/logs/dictionaries")
+async def train_log_dictionary(samples: int = 2000):
+    """Train a new dictionary on recent compressed logs; new logs are compressed with it."""
+    from logger import train_dictionary
+    try:
+        return await asyncio.to_thread(train_dictionary, samples)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/logs/{log_id}")
+def read_log(log_id: int):
+    """One log with its response, metadata and schema."""
+    from logger import get_log
+    log = get_log(log_id)
+    if log is None:
+        raise HTTPException(status_code=404, detail="Log not found")
+    return log
+
+@app.get("/api/schemas")
+def read_schemas():
+    """Stored dict-mode schemas; filter logs by one with /api/logs?schema_id=..."""
+    from logger import list_schemas
+    return {"data": list_schemas()}
@@ -0,0 +1,178 @@
+# Minimal Prometheus-style metrics for the request hot path.
+#
+# Histograms preallocate their buckets per label set and updates take no
+# locks: series are written from the event loop (or the log writer thread
+# for log writes) and a scrape only needs an approximately consistent view.
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+_registry: List["_Metric"] = []
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in list(self._values.items())
+        ]
+
+class Gauge(_Metric):
+    """Gauge set directly or computed at scrape time by ``callback``."""
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+    ):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def _samples(self) -> List[str]:
+        values = dict(self._values)
+        if self._callback is not None:
+            try:
+                values.update(self._callback())
+            except Exception as e:
+                print(f"Error collecting metric {self.name}: {e}")
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, series in list(self._series.items()):
+            counts = list(series)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Hot-path metrics
+REQUESTS = Counter(
+    "simple_llm_requests_total", "Generation requests by model, provider and status.",
+    ("model", "provider", "status")
+)
+REQUEST_SECONDS = Histogram(
+    "simple_llm_request_duration_seconds", "End-to-end generation latency.", ("model",)
+)
+PROVIDER_SECONDS = Histogram(
+    "simple_llm_provider_duration_seconds", "Time spent in provider HTTP calls (per attempt).",
+    ("provider", "model")
+)
+JSON_PARSE_SECONDS = Histogram(
+    "simple_llm_json_parse_duration_seconds", "Time spent parsing dict-mode responses.",
+    buckets=FAST_BUCKETS
+)
+VALIDATION_SECONDS = Histogram(
+    "simple_llm_schema_validation_duration_seconds", "Time spent validating dict-mode replies.",
+    buckets=FAST_BUCKETS
+)
+LOG_WRITE_SECONDS = Histogram(
+    "simple_llm_log_write_duration_seconds", "Time spent committing a batch of log rows.",
+    buckets=FAST_BUCKETS
+)
+LOG_ROWS = Counter("simple_llm_log_rows_written_total", "Log rows committed to SQLite.")
+RETENTION_DELETED = Counter(
+    "simple_llm_retention_deleted_rows_total", "Log rows deleted by retention, by policy.", ("policy",)
+)
+HEDGES = Counter(
+    "simple_llm_hedges_total", "Hedged provider calls by provider and outcome (primary, hedge, no_budget).",
+    ("provider", "outcome")
+)
+TOKENS = Counter(
+    "simple_llm_tokens_total", "Token usage reported by providers.", ("model", "provider", "type")
+)
+IN_FLIGHT = Gauge("simple_llm_requests_in_flight", "Generation requests currently running.")
+IN_FLIGHT.set(0)
@@ -0,0 +1,125 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from archive import archive_partition, closed_periods, drop_partition
+from logger import (
+    compact_search_index, db_size, incremental_vacuum, list_partitions, purge_logs, purge_logs_by_count,
+    purge_logs_by_size
+)
+from metrics import RETENTION_DELETED
+
+DEFAULT_RETENTION_INTERVAL = 300  # Seconds between scheduled retention runs
+
+def run_retention(policy: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a retention policy once: {"max_age_days", "max_rows", "max_db_bytes",
+    "archive_after_days", "archive_period", "archive_compress"} (any subset).
+    Locked logs are always kept. Closed periods older than archive_after_days
+    are first moved into archive partitions; max_age_days also drops archived
+    partitions that ended before the cutoff (max_rows and max_db_bytes only
+    apply to logs.db). Deletes run in small batches, then the search index
+    drops the deleted entries and freed pages are handed back to the filesystem.
+    """
+    started = time.perf_counter()
+    deleted = {}
+    archived = []
+    if policy.get("archive_after_days") is not None:
+        for name in closed_periods(float(policy["archive_after_days"]), policy.get("archive_period") or "month"):
+            archive_partition(name, compress=bool(policy.get("archive_compress")))
+            archived.append(name)
+    if policy.get("max_age_days") is not None:
+        deleted["age"] = purge_logs(int(policy["max_age_days"]))
+        cutoff = (datetime.utcnow() - timedelta(days=int(policy["max_age_days"]))).isoformat()
+        dropped = 0
+        for partition in list_partitions():
+            if partition["end_ts"] <= cutoff and partition["state"] == "archived":
+                drop_partition(partition["name"])
+                dropped += partition["rows"]
+        deleted["age"] += dropped
+    if policy.get("max_rows") is not None:
+        deleted["rows"] = purge_logs_by_count(int(policy["max_rows"]))
+    if policy.get("max_db_bytes") is not None:
+        deleted["size"] = purge_logs_by_size(int(policy["max_db_bytes"]))
+    for reason, count in deleted.items():
+        if count:
+            RETENTION_DELETED.inc(reason, amount=count)
+    if sum(deleted.values()) or archived:
+        compact_search_index()
+    released = incremental_vacuum()
+    return {
+        "finished_at": datetime.utcnow().isoformat(),
+        "deleted": sum(deleted.values()),
+        "deleted_by_policy": deleted,
+        "archived": archived,
+        "vacuumed_pages": released,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+class RetentionScheduler:
+    """
+    Background thread applying the retention policy from settings.json
+    ("retention": {"max_age_days": 30, "max_rows": ..., "max_db_bytes": ...,
+    "archive_after_days": ..., "interval_seconds": 300}). The policy is read on every run, so saved
+    settings take effect without a restart.
+    """
+
+    def __init__(self, get_policy: Callable[[], Dict[str, Any]]):
+        self._get_policy = get_policy
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._run_lock = threading.Lock()
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="log-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def trigger(self):
+        """Run as soon as possible instead of waiting for the next interval."""
+        self._wake.set()
+
+    def run_once(self, policy: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Apply ``policy`` (default: the configured one) now, e.g. for a manual purge."""
+        # Manual purges and scheduled runs don't interleave their batches
+        with self._run_lock:
+            result = run_retention(self._get_policy() or {} if policy is None else policy)
+            self.last_run = result
+            return result
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "policy": self._get_policy() or {},
+            "running": self._thread is not None,
+            "last_run": self.last_run,
+            "db": db_size(),
+        }
+
+    def _run(self):
+        while not self._stopped.is_set():
+            policy = self._get_policy() or {}
+            self._wake.wait(float(policy.get("interval_seconds") or DEFAULT_RETENTION_INTERVAL))
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                result = self.run_once()
+                if result["deleted"] or result["vacuumed_pages"] or result["archived"]:
+                    print(
+                        f"Retention removed {result['deleted']} logs, archived {len(result['archived'])} periods, "
+                        f"released {result['vacuumed_pages']} pages."
+                    )
+            except Exception as e:
+                print(f"Retention run failed: {e}")
@@ -0,0 +1,120 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from string_schema import string_to_json_schema, json_schema_to_pydantic
+except ImportError:
+    string_to_json_schema = None
+    json_schema_to_pydantic = None
+
+try:
+    from pydantic import TypeAdapter, ValidationError
+except ImportError:
+    TypeAdapter = None
+    ValidationError = None
+
+DEFAULT_SCHEMA_CACHE_SIZE = 256
+MAX_VALIDATION_ERRORS = 10     # Errors kept per failed validation
+
+class CompiledSchema:
+    """
+    A dict-mode schema ready for use: the JSON Schema sent to the model and
+    a validator for replies, built by compile() (pydantic-core under the
+    hood). Schemas the validator can't express validate as "skipped".
+    """
+
+    def __init__(self, json_schema: Dict[str, Any], text: str):
+        self.json_schema = json_schema
+        self.text = text
+        self.compiled = False
+        self._validate: Optional[Callable[[Any], Any]] = None
+
+    def compile(self):
+        if self.compiled:
+            return
+        try:
+            self._validate = _build_validator(self.json_schema)
+        except Exception as e:
+            print(f"Schema validation unavailable for this schema: {e}")
+            self._validate = None
+        self.compiled = True
+
+    def validate(self, data: Any) -> Optional[List[str]]:
+        """Validation errors for ``data`` ([] if valid), or None if it can't be checked."""
+        self.compile()
+        if self._validate is None:
+            return None
+        try:
+            self._validate(data)
+            return []
+        except ValidationError as e:
+            return [
+                f"{'.'.join(str(part) for part in error['loc']) or '$'}: {error['msg']}"
+                for error in e.errors()[:MAX_VALIDATION_ERRORS]
+            ]
+
+def _build_validator(json_schema: Dict[str, Any]) -> Optional[Callable[[Any], Any]]:
+    if json_schema_to_pydantic is None or TypeAdapter is None:
+        return None
+    kind = json_schema.get("type")
+    if kind == "object":
+        return json_schema_to_pydantic(json_schema, "Response").model_validate
+    if kind == "array" and (json_schema.get("items") or {}).get("type") == "object":
+        item_model = json_schema_to_pydantic(json_schema["items"], "ResponseItem")
+        return TypeAdapter(List[item_model]).validate_python
+    return None
+
+class SchemaCache:
+    """
+    Bounded LRU of compiled schemas keyed by the schema text from the request.
+
+    Looking a schema up only converts it (string-schema syntax to JSON
+    Schema); building the validator is left to CompiledSchema.compile() so
+    callers can run it off the event loop while the provider call is in
+    flight.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_SCHEMA_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CompiledSchema]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, schema: str) -> CompiledSchema:
+        with self._lock:
+            compiled = self._entries.get(schema)
+            if compiled is not None:
+                self._entries.move_to_end(schema)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        compiled = _convert(schema)
+        with self._lock:
+            self._entries[schema] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+def _convert(schema: str) -> CompiledSchema:
+    """Parse a JSON Schema, or convert string-schema syntax into one."""
+    try:
+        json_schema = json.loads(schema)
+        if isinstance(json_schema, dict):
+            return CompiledSchema(json_schema, schema)
+    except json.JSONDecodeError:
+        pass
+    if string_to_json_schema is None:
+        raise RuntimeError("string-schema library not found, please install it or use valid JSON schema")
+    try:
+        json_schema = string_to_json_schema(schema)
+    except Exception as e:
+        raise RuntimeError(f"Failed to parse schema string: {e}")
+    return CompiledSchema(json_schema, json.dumps(json_schema))
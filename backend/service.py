@@ -3,52 +3,459 @@
 
 import os
 import json
-import requests
 import time
+import asyncio
+import random
+import uuid
+import httpx
+from collections import deque
+from contextlib import aclosing
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
-from logger import log_llm_call
-try:
-    from string_schema import string_to_json_schema
-except ImportError:
-    string_to_json_schema = None
+from typing import Dict, Any, Optional, Union, AsyncIterator
+from logger import log_llm_call_async
+from metrics import Gauge, HEDGES, REQUESTS, REQUEST_SECONDS, PROVIDER_SECONDS, JSON_PARSE_SECONDS, VALIDATION_SECONDS, TOKENS, IN_FLIGHT
+from cache import ResponseCache, make_cache_key, CACHE_MODES, DEFAULT_MAX_BYTES, DEFAULT_TTL_SECONDS
+from schemas import CompiledSchema, SchemaCache
 
-# ... (rest of imports)
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Connection pool defaults per provider base URL (override with
+# "max_connections" / "max_keepalive_connections" in the provider settings)
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+PROVIDER_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+DEFAULT_TEMPERATURE = 0.7
+
+# Concurrent batch items per provider (override with "batch_concurrency" in the provider settings)
+DEFAULT_BATCH_CONCURRENCY = 8
+
+# Provider scheduling defaults (override per provider in settings.json:
+# "requests_per_minute", "tokens_per_minute", "max_concurrency",
+# "min_concurrency", "max_retries", "latency_tolerance"). Without
+# "max_concurrency" the ceiling is the provider's connection pool size
+# ("max_connections" per endpoint), so the limit never caps below it
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_LATENCY_TOLERANCE = 3.0    # Shrink concurrency when latency per output token exceeds this x its floor
+LATENCY_FLOOR_WINDOW = 30.0        # Seconds a latency floor holds before it is measured again
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+DECREASE_COOLDOWN = 1.0            # Seconds between multiplicative decreases
+COMPLETION_TOKEN_ESTIMATE = 256    # Reserved per request until the real usage is known
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+OVERLOAD_STATUS = {429, 503}
+
+# Multi-endpoint providers (override per provider in settings.json:
+# "endpoints": [base URLs], "balance", "health_interval", "cooldown", "failure_threshold")
+BALANCE_STRATEGIES = ("least_outstanding", "latency")
+DEFAULT_HEALTH_INTERVAL = 15.0     # Seconds between endpoint health checks (0 disables them)
+DEFAULT_ENDPOINT_COOLDOWN = 30.0   # Seconds a failing endpoint stays out of rotation
+DEFAULT_FAILURE_THRESHOLD = 3      # Retryable errors in a row that take an endpoint out of rotation
+HEALTH_CHECK_TIMEOUT = httpx.Timeout(5.0)
+
+# Hedged requests (per provider in settings.json: "hedge": {"enabled", "delay_ms",
+# "percentile", "max_ratio", "fallback_model"})
+DEFAULT_HEDGE_PERCENTILE = 95.0
+DEFAULT_HEDGE_RATIO = 0.05         # Hedges allowed per primary request
+HEDGE_BUDGET_BURST = 10.0          # Unused hedge budget kept for bursts of slow calls
+HEDGE_LATENCY_WINDOW = 200         # Recent call latencies per model for the percentile delay
+HEDGE_MIN_SAMPLES = 20             # Latencies needed before the percentile delay applies
+
+class ProviderError(RuntimeError):
+    """Provider call failure with the HTTP status and Retry-After hint when known."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (seconds or HTTP date) as seconds from now."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _connection_failed(error: BaseException) -> bool:
+    """Whether a provider call lost its connection to the endpoint (safe to send elsewhere)."""
+    cause = error.__cause__ if isinstance(error, ProviderError) else error
+    return isinstance(cause, (httpx.NetworkError, httpx.ConnectTimeout, httpx.RemoteProtocolError))
+
+def _estimate_tokens(messages: list) -> int:
+    """Rough token count for rate budgeting (about 4 characters per token)."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + COMPLETION_TOKEN_ESTIMATE
+
+def _add_usage(usage: dict, extra: dict) -> dict:
+    """Sum two provider usage dicts (e.g. a reply and its repair)."""
+    total = dict(usage or {})
+    for key, value in (extra or {}).items():
+        if isinstance(value, (int, float)) and isinstance(total.get(key, 0), (int, float)):
+            total[key] = total.get(key, 0) + value
+    return total
+
+def _usage_metadata(usage: dict, spent: dict) -> Dict[str, Any]:
+    """
+    Log metadata for token usage. "usage" (what the stats rollups and token
+    filters read) holds only the tokens this request's own provider calls
+    spent; a reply reused from the cache or a coalesced call keeps its
+    original usage under "reused_usage".
+    """
+    if usage and usage != spent:
+        return {"usage": spent, "reused_usage": usage}
+    return {"usage": spent}
 
-# ... (inside class)
+def _record_validation(metadata: Dict[str, Any], problems: Optional[list]):
+    if problems is None:
+        metadata["validation"] = "skipped"
+    elif problems:
+        metadata["validation"] = "failed"
+        metadata["validation_errors"] = problems
+    else:
+        metadata["validation"] = "passed"
+
+class TokenBucket:
+    """
+    Reservation-style token bucket: callers take what they need and are told
+    how long to wait, so the balance may go negative under load.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens; returns seconds to wait before using them."""
+        self._refill()
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, amount: float):
+        """Correct an earlier reservation (positive takes more, negative refunds)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+class ProviderScheduler:
+    """
+    Admission control for one provider.
+
+    Requests pass a requests/min and tokens/min token bucket, any Retry-After
+    pause, and an adaptive concurrency limit (AIMD): the limit grows by
+    1/limit per success and is halved on 429/overload/transport errors or
+    cut by 10% when latency drifts well above its recent floor. Latency is
+    measured per completion token, so long answers don't read as overload,
+    and the floor is the lowest EWMA of the last one or two
+    LATENCY_FLOOR_WINDOWs, so a single fast call can't pin it down for good.
+    """
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        rpm = config.get("requests_per_minute")
+        tpm = config.get("tokens_per_minute")
+        self.requests = TokenBucket(float(rpm)) if rpm else None
+        self.tokens = TokenBucket(float(tpm)) if tpm else None
+        connections = int(config.get("max_connections", DEFAULT_MAX_CONNECTIONS)) * max(1, len(config.get("endpoints") or []))
+        self.max_concurrency = max(1, int(config.get("max_concurrency", connections)))
+        self.min_concurrency = max(1, min(self.max_concurrency, int(config.get("min_concurrency", DEFAULT_MIN_CONCURRENCY))))
+        self.max_retries = int(config.get("max_retries", DEFAULT_MAX_RETRIES))
+        self.latency_tolerance = float(config.get("latency_tolerance", DEFAULT_LATENCY_TOLERANCE))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._latency_ewma: Optional[float] = None
+        self._floor_window_start = time.monotonic()
+        self._floor_previous: Optional[float] = None  # Lowest EWMA of the last full window
+        self._floor_current: Optional[float] = None   # Lowest EWMA of the window in progress
+        self._cond = asyncio.Condition()
+
+    def pause(self, seconds: float):
+        """Hold all new requests for ``seconds`` (from a Retry-After header)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+    async def acquire(self, estimated_tokens: int) -> float:
+        """Wait for rate budget and a concurrency slot; returns seconds waited."""
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            delay = 0.0
+            if self.requests:
+                delay = max(delay, self.requests.reserve(1))
+            if self.tokens:
+                delay = max(delay, self.tokens.reserve(estimated_tokens))
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with self._cond:
+                await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+                self.in_flight += 1
+        finally:
+            self.waiting -= 1
+        return time.monotonic() - start
 
-    def generate(
+    @property
+    def latency_floor(self) -> Optional[float]:
+        floors = [f for f in (self._floor_previous, self._floor_current) if f is not None]
+        return min(floors) if floors else None
+
+    def _observe_latency(self, per_token: float, now: float) -> bool:
+        """Feed one latency per token sample; True when it reads as overload."""
+        if now - self._floor_window_start > LATENCY_FLOOR_WINDOW:
+            self._floor_previous = self._floor_current
+            self._floor_current = None
+            self._floor_window_start = now
+        if self._latency_ewma is None:
+            self._latency_ewma = per_token
+        else:
+            self._latency_ewma = 0.9 * self._latency_ewma + 0.1 * per_token
+        if self._floor_current is None or self._latency_ewma < self._floor_current:
+            self._floor_current = self._latency_ewma
+        return self._latency_ewma > self.latency_floor * self.latency_tolerance
+
+    async def release(
         self,
-        prompt: str,
-        model: str,
-        response_format: str = "text",
-        schema: Optional[str] = None,
-        tag: Optional[str] = None
-    ) -> Union[str, Dict[str, Any]]:
+        latency: float,
+        error: Optional[BaseException] = None,
+        tokens_used: Optional[int] = None,
+        estimated_tokens: int = 0,
+        completion_tokens: Optional[int] = None
+    ):
         """
-        Unified generation method.
+        Return the slot and feed the outcome into the AIMD controller.
+        Without ``completion_tokens`` (no usage reported) a success only
+        grows the limit, as its latency can't be compared.
         """
-        # Auto-detect format based on schema
-        if schema:
-            response_format = "dict"
-            # Try parsing as JSON first
-            try:
-                json.loads(schema)
-            except json.JSONDecodeError:
-                # If not JSON, try string-schema
-                if string_to_json_schema:
-                    try:
-                        print(f"DEBUG: Converting string-schema: {schema}")
-                        schema_dict = string_to_json_schema(schema)
-                        schema = json.dumps(schema_dict)
-                    except Exception as e:
-                        raise RuntimeError(f"Failed to parse schema string: {e}")
-                else:
-                    raise RuntimeError("string-schema library not found, please install it or use valid JSON schema")
-            
-        start_time = time.time()
+        if self.tokens and tokens_used is not None:
+            self.tokens.adjust(tokens_used - estimated_tokens)
+        now = time.monotonic()
+        if error is not None:
+            overloaded = isinstance(error, ProviderError) and error.retryable
+            if overloaded and now - self._last_decrease > DECREASE_COOLDOWN:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            slow = completion_tokens and self._observe_latency(latency / completion_tokens, now)
+            if slow and now - self._last_decrease > DECREASE_COOLDOWN:
+                self.limit = max(self.min_concurrency, self.limit * 0.9)
+                self._last_decrease = now
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
 
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+class Endpoint:
+    """One base URL of a multi-endpoint provider, with its load and health."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.latency_ewma: Optional[float] = None
+        self.healthy = True
+        self.down_until = 0.0
+        self.failures = 0          # Retryable errors in a row
+        self.requests = 0
+        self.errors = 0
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "latency_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+class EndpointPool:
+    """
+    Load balancing across the "endpoints" (base URLs) of one provider.
+
+    Each attempt goes to the healthy endpoint with the fewest outstanding
+    requests ("least_outstanding") or the lowest expected latency, its
+    latency EWMA times its queue ("latency"); ties take turns. A lost
+    connection, or failure_threshold retryable errors in a row, takes an
+    endpoint out of rotation for the cooldown. After that a successful health
+    check (GET {url}/models) brings it back, or with health checks disabled
+    the next request tries it again. When every endpoint is down, the one
+    that failed first is tried anyway.
+    """
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        urls = [url.strip().rstrip("/") for url in config.get("endpoints") or [] if url and url.strip()]
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(urls)]
+        self.strategy = config.get("balance", BALANCE_STRATEGIES[0])
+        if self.strategy not in BALANCE_STRATEGIES:
+            print(f"Unknown balance '{self.strategy}' for {name}, using {BALANCE_STRATEGIES[0]}")
+            self.strategy = BALANCE_STRATEGIES[0]
+        self.health_interval = float(config.get("health_interval", DEFAULT_HEALTH_INTERVAL))
+        self.health_path = config.get("health_path", "/models")
+        self.cooldown = float(config.get("cooldown", DEFAULT_ENDPOINT_COOLDOWN))
+        self.failure_threshold = max(1, int(config.get("failure_threshold", DEFAULT_FAILURE_THRESHOLD)))
+        self._turn = 0
+        self._health_task: Optional[asyncio.Task] = None
+
+    def start(self, get_client):
+        """Start background health checks (needs a running event loop)."""
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._check_health(get_client))
+
+    def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    def _in_rotation(self, endpoint: Endpoint, now: float) -> bool:
+        # Without health checks an endpoint gets a trial request once its cooldown is over
+        return endpoint.healthy or (self._health_task is None and now >= endpoint.down_until)
+
+    def available(self, exclude=()) -> bool:
+        now = time.monotonic()
+        return any(e.url not in exclude and self._in_rotation(e, now) for e in self.endpoints)
+
+    def choose(self, exclude=()) -> Endpoint:
+        """Endpoint for the next attempt, skipping the URLs in ``exclude`` where possible."""
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e.url not in exclude and self._in_rotation(e, now)]
+        if not candidates:
+            others = [e for e in self.endpoints if e.url not in exclude] or self.endpoints
+            return min(others, key=lambda e: e.down_until)
+        self._turn += 1
+        start = self._turn % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        if self.strategy == "latency":
+            return min(candidates, key=lambda e: (e.latency_ewma or 0.0) * (e.outstanding + 1))
+        return min(candidates, key=lambda e: e.outstanding)
+
+    def begin(self, endpoint: Endpoint):
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+
+    def finish(self, endpoint: Endpoint, latency: float, error: Optional[BaseException] = None):
+        """Record an attempt's outcome (cancellations only free the slot)."""
+        endpoint.outstanding -= 1
+        if error is None:
+            endpoint.failures = 0
+            if endpoint.latency_ewma is None:
+                endpoint.latency_ewma = latency
+            else:
+                endpoint.latency_ewma = 0.8 * endpoint.latency_ewma + 0.2 * latency
+            if not endpoint.healthy and self._health_task is None:
+                self._mark_up(endpoint)
+        elif isinstance(error, ProviderError):
+            endpoint.errors += 1
+            if error.retryable:
+                endpoint.failures += 1
+            failing = _connection_failed(error) or endpoint.failures >= self.failure_threshold
+            if failing and (endpoint.healthy or time.monotonic() >= endpoint.down_until):
+                self._mark_down(endpoint)
+
+    def status(self) -> Dict[str, Any]:
+        return {"balance": self.strategy, "endpoints": [e.status() for e in self.endpoints]}
+
+    def _mark_down(self, endpoint: Endpoint):
+        endpoint.healthy = False
+        endpoint.down_until = time.monotonic() + self.cooldown
+        print(f"{self.name} endpoint {endpoint.url} out of rotation for {self.cooldown:g}s")
+
+    def _mark_up(self, endpoint: Endpoint):
+        endpoint.healthy = True
+        endpoint.failures = 0
+        print(f"{self.name} endpoint {endpoint.url} back in rotation")
+
+    async def _check_health(self, get_client):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*(self._probe(e, get_client) for e in self.endpoints))
+
+    async def _probe(self, endpoint: Endpoint, get_client):
+        if not endpoint.healthy and time.monotonic() < endpoint.down_until:
+            return
+        try:
+            response = await get_client(endpoint.url).get(
+                endpoint.url + self.health_path, timeout=HEALTH_CHECK_TIMEOUT
+            )
+            ok = response.status_code < 500
+        except httpx.HTTPError:
+            ok = False
+        if ok and not endpoint.healthy:
+            self._mark_up(endpoint)
+        elif not ok and endpoint.healthy:
+            self._mark_down(endpoint)
+
+class HedgePolicy:
+    """
+    Hedged requests for one provider.
+
+    If a call hasn't answered after the hedge delay, a second attempt is
+    sent (to "fallback_model" when set, else the same model on another
+    endpoint where there is one) and the first success wins. The delay is
+    "delay_ms", or the "percentile" of the model's recent call latencies
+    (delay_ms, if set, is used until there are enough of them). Hedges are
+    paid from a budget that every request adds "max_ratio" to, so they
+    never exceed that share of traffic.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.enabled = bool(config.get("enabled", False))
+        self.delay_ms = config.get("delay_ms")
+        percentile = config.get("percentile")
+        if percentile is None and self.delay_ms is None:
+            percentile = DEFAULT_HEDGE_PERCENTILE
+        self.percentile = float(percentile) if percentile is not None else None
+        self.max_ratio = float(config.get("max_ratio", DEFAULT_HEDGE_RATIO))
+        self.fallback_model = config.get("fallback_model")
+        self._budget = 0.0
+        self._latencies: Dict[str, deque] = {}
+
+    def observe(self, model: str, seconds: float):
+        window = self._latencies.get(model)
+        if window is None:
+            window = self._latencies[model] = deque(maxlen=HEDGE_LATENCY_WINDOW)
+        window.append(seconds)
+
+    def delay(self, model: str) -> Optional[float]:
+        """Seconds to wait before hedging a call to ``model`` (None: not yet known)."""
+        if self.percentile is not None:
+            window = self._latencies.get(model)
+            if window is not None and len(window) >= HEDGE_MIN_SAMPLES:
+                ordered = sorted(window)
+                return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+        return float(self.delay_ms) / 1000 if self.delay_ms is not None else None
+
+    def earn(self):
+        """Credit the budget for one request."""
+        self._budget = min(HEDGE_BUDGET_BURST, self._budget + self.max_ratio)
+
+    def spend(self) -> bool:
+        if self._budget < 1:
+            return False
+        self._budget -= 1
+        return True
 
 class LLMService:
 
@@ -56,6 +463,16 @@ class LLMService:
 
     def __init__(self):
         self.settings_file = Path("../data/settings.json")
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.cache: Optional[ResponseCache] = None
+        # In-flight provider calls by request key, shared by identical concurrent requests
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._batch_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._schedulers: Dict[str, ProviderScheduler] = {}
+        self._pools: Dict[str, EndpointPool] = {}
+        self._hedges: Dict[str, HedgePolicy] = {}
+        # Converted/compiled dict-mode schemas by schema text
+        self.schemas = SchemaCache()
         self.load_settings()
 
     def load_settings(self):
@@ -94,6 +511,30 @@ class LLMService:
         
         self.model_names = self.settings.get("model_names", "")
         
+        # Rebuilt lazily so changed limits take effect
+        self._schedulers = {}
+        self._batch_semaphores = {}
+        self._hedges = {}
+        for pool in self._pools.values():
+            pool.close()
+        self._pools = {}
+        
+        # Response cache (opt-in): {"enabled": true, "max_bytes": ..., "ttl_seconds": ..., "persistent": false}
+        self.cache_settings = self.settings.get("cache", {})
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self.cache_settings.get("enabled"):
+            self.cache = ResponseCache(
+                max_bytes=int(self.cache_settings.get("max_bytes", DEFAULT_MAX_BYTES)),
+                ttl_seconds=float(self.cache_settings.get("ttl_seconds", DEFAULT_TTL_SECONDS)),
+                persistent=bool(self.cache_settings.get("persistent", False))
+            )
+        
+        # Log retention, applied by the background RetentionScheduler:
+        # {"max_age_days": ..., "max_rows": ..., "max_db_bytes": ..., "interval_seconds": 300}
+        self.retention_settings = self.settings.get("retention", {})
+        
         # Create default settings file if it doesn't exist
         if not self.settings_file.exists():
             self._save_settings()
@@ -102,7 +543,9 @@ class LLMService:
         """Save current settings to JSON file."""
         settings_data = {
             "providers": self.providers,
-            "model_names": self.model_names
+            "model_names": self.model_names,
+            "cache": self.cache_settings,
+            "retention": self.retention_settings
         }
         with open(self.settings_file, "w") as f:
             json.dump(settings_data, f, indent=2)
@@ -136,8 +579,39 @@ class LLMService:
         
         return provider, api_key, base_url, actual_model
 
-    def _call_provider(self, model: str, messages: list) -> tuple[str, dict]:
-        """Generic call to compatible APIs."""
+    def _get_client(self, provider: str, base_url: str) -> httpx.AsyncClient:
+        """Return the pooled async HTTP client for a provider base URL.
+
+        One client is kept per base URL so keep-alive (and HTTP/2 where the
+        server supports it) connections are reused across requests.
+        """
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            provider_config = self.providers.get(provider, {})
+            max_connections = int(provider_config.get("max_connections", DEFAULT_MAX_CONNECTIONS))
+            max_keepalive = int(provider_config.get("max_keepalive_connections", DEFAULT_MAX_KEEPALIVE))
+            client = httpx.AsyncClient(
+                http2=True,
+                timeout=PROVIDER_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=min(max_keepalive, max_connections),
+                ),
+            )
+            self._clients[base_url] = client
+        return client
+
+    async def aclose(self):
+        """Close all pooled provider connections."""
+        for pool in self._pools.values():
+            pool.close()
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def _build_request(self, model: str, messages: list, temperature: float) -> tuple[str, str, dict, dict]:
+        """Build (provider, base_url, headers, payload) for a chat completion call."""
         provider, api_key, base_url, actual_model = self._get_provider_config(model)
         
         headers = {
@@ -159,21 +633,220 @@ class LLMService:
         payload = {
             "model": actual_model,
             "messages": messages,
-            "temperature": 0.7
+            "temperature": temperature
         }
+        return provider, base_url, headers, payload
+
+    def _pool(self, provider: str) -> Optional[EndpointPool]:
+        """Endpoint pool of a provider configured with "endpoints", else None."""
+        pool = self._pools.get(provider)
+        if pool is None:
+            config = self.providers.get(provider, {})
+            if not config.get("endpoints"):
+                return None
+            pool = EndpointPool(provider, config)
+            if not pool.endpoints:
+                return None
+            pool.start(lambda url: self._get_client(provider, url))
+            self._pools[provider] = pool
+        return pool
+
+    def endpoint_status(self) -> Dict[str, Any]:
+        """Load and health of every multi-endpoint provider."""
+        pools = {name: self._pool(name) for name in list(self.providers)}
+        return {name: pool.status() for name, pool in pools.items() if pool is not None}
+
+    def _scheduler(self, provider: str) -> ProviderScheduler:
+        scheduler = self._schedulers.get(provider)
+        if scheduler is None:
+            scheduler = ProviderScheduler(provider, self.providers.get(provider, {}))
+            self._schedulers[provider] = scheduler
+        return scheduler
+
+    async def _call_provider(
+        self,
+        model: str,
+        messages: list,
+        temperature: float = DEFAULT_TEMPERATURE,
+        stats: Optional[Dict[str, Any]] = None,
+        avoid_endpoint: Optional[str] = None
+    ) -> tuple[str, dict]:
+        """
+        Scheduled call to compatible APIs.
+
+        Waits for the provider's rate budget and concurrency slot, and retries
+        429/overload/transport failures with jittered exponential backoff (or
+        the provider's Retry-After). Queue wait and retry counts are written
+        to ``stats`` when given. Multi-endpoint providers skip
+        ``avoid_endpoint`` while another endpoint is available.
+        """
+        provider = self._get_provider_config(model)[0]
+        scheduler = self._scheduler(provider)
+        pool = self._pool(provider)
+        estimated = _estimate_tokens(messages)
+        queue_s = 0.0
+        attempt = 0
+        tried = {avoid_endpoint} if avoid_endpoint else set()
         
+        while True:
+            queue_s += await scheduler.acquire(estimated)
+            if stats is not None:
+                stats["queue_ms"] = round(queue_s * 1000, 1)
+            endpoint = pool.choose(tried) if pool else None
+            if endpoint is not None:
+                pool.begin(endpoint)
+                if stats is not None:
+                    stats["endpoint"] = endpoint.url
+            started = time.monotonic()
+            try:
+                content, usage = await self._request_completion(
+                    model, messages, temperature, endpoint.url if endpoint else None
+                )
+            except ProviderError as e:
+                PROVIDER_SECONDS.observe(time.monotonic() - started, provider, model)
+                await scheduler.release(time.monotonic() - started, error=e)
+                if endpoint is not None:
+                    pool.finish(endpoint, time.monotonic() - started, error=e)
+                    tried.add(endpoint.url)
+                    # Lost connections go straight to another endpoint, outside the retry budget
+                    if _connection_failed(e) and pool.available(tried):
+                        if stats is not None:
+                            stats["failovers"] = stats.get("failovers", 0) + 1
+                        continue
+                if not e.retryable or attempt >= scheduler.max_retries:
+                    raise
+                if e.retry_after is not None:
+                    scheduler.pause(e.retry_after)
+                else:
+                    await asyncio.sleep(scheduler.retry_delay(attempt))
+                attempt += 1
+                if stats is not None:
+                    stats["retries"] = attempt
+                continue
+            except BaseException as e:
+                await scheduler.release(time.monotonic() - started, error=e)
+                if endpoint is not None:
+                    pool.finish(endpoint, time.monotonic() - started, error=e)
+                raise
+            PROVIDER_SECONDS.observe(time.monotonic() - started, provider, model)
+            await scheduler.release(
+                time.monotonic() - started,
+                tokens_used=(usage or {}).get("total_tokens"),
+                estimated_tokens=estimated,
+                completion_tokens=(usage or {}).get("completion_tokens")
+            )
+            if endpoint is not None:
+                pool.finish(endpoint, time.monotonic() - started)
+            return content, usage
+
+    def _hedge_policy(self, provider: str) -> HedgePolicy:
+        policy = self._hedges.get(provider)
+        if policy is None:
+            policy = HedgePolicy(self.providers.get(provider, {}).get("hedge") or {})
+            self._hedges[provider] = policy
+        return policy
+
+    async def _call_hedged(
+        self,
+        model: str,
+        messages: list,
+        temperature: float,
+        stats: Dict[str, Any],
+        hedge: Optional[bool] = None
+    ) -> tuple[str, dict]:
+        """
+        _call_provider with the provider's hedging (``hedge`` overrides its
+        "enabled" setting). When a hedge was sent, ``stats`` describes only
+        the winning attempt and ``stats["hedge"]`` records which one won
+        ("primary" or "hedge"), the delay used and the losing attempt's stats;
+        the loser is cancelled.
+        """
+        provider = self._get_provider_config(model)[0]
+        policy = self._hedge_policy(provider)
+        if not (policy.enabled if hedge is None else hedge):
+            return await self._call_provider(model, messages, temperature, stats)
+        policy.earn()
+        delay = policy.delay(model)
+        started = time.monotonic()
+        if delay is None:
+            content, usage = await self._call_provider(model, messages, temperature, stats)
+            policy.observe(model, time.monotonic() - started)
+            return content, usage
+
+        # Each attempt fills its own dict so the logged stats never mix the two
+        primary_stats: Dict[str, Any] = {}
+        hedge_stats: Dict[str, Any] = {}
+        primary = asyncio.create_task(self._call_provider(model, messages, temperature, primary_stats))
+        tasks = {primary}
+        hedge_info: Optional[Dict[str, Any]] = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if policy.spend():
+                    hedge_model = policy.fallback_model or model
+                    tasks.add(asyncio.create_task(self._call_provider(
+                        hedge_model, messages, temperature, hedge_stats, avoid_endpoint=primary_stats.get("endpoint")
+                    )))
+                    hedge_info = {"delay_ms": round(delay * 1000, 1)}
+                    if hedge_model != model:
+                        hedge_info["model"] = hedge_model
+                else:
+                    HEDGES.inc(provider, "no_budget")
+            # First success wins; a failed attempt waits for the other one
+            errors: Dict[asyncio.Task, BaseException] = {}
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        errors[task] = task.exception()
+                if winner is None:
+                    continue
+                stats.update(primary_stats if winner is primary else hedge_stats)
+                if hedge_info is not None:
+                    outcome = "primary" if winner is primary else "hedge"
+                    hedge_info["winner"] = outcome
+                    hedge_info["loser"] = hedge_stats if winner is primary else primary_stats
+                    stats["hedge"] = hedge_info
+                    HEDGES.inc(provider, outcome)
+                policy.observe(model, time.monotonic() - started)
+                return winner.result()
+            stats.update(primary_stats)
+            raise errors.get(primary) or next(iter(errors.values()))
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _request_completion(
+        self,
+        model: str,
+        messages: list,
+        temperature: float,
+        base_url: Optional[str] = None
+    ) -> tuple[str, dict]:
+        """Generic call to compatible APIs (``base_url`` picks one of the provider's endpoints)."""
+        provider, default_url, headers, payload = self._build_request(model, messages, temperature)
+        base_url = base_url or default_url
         endpoint = f"{base_url}/chat/completions"
         
         try:
-            response = requests.post(
+            client = self._get_client(provider, base_url)
+            response = await client.post(
                 endpoint,
                 headers=headers,
-                json=payload,
-                timeout=60
+                json=payload
             )
             
             if response.status_code != 200:
-                raise RuntimeError(f"API Request failed ({provider}): {response.text}")
+                raise ProviderError(
+                    f"API Request failed ({provider}): {response.text}",
+                    status_code=response.status_code,
+                    retry_after=_parse_retry_after(response.headers.get("Retry-After"))
+                )
                 
             data = response.json()
             usage = data.get("usage", {})
@@ -189,81 +862,562 @@ class LLMService:
             return content, usage
                  
         except Exception as e:
-             raise RuntimeError(f"Provider call failed: {e}")
+             status_code = getattr(e, "status_code", None)
+             raise ProviderError(
+                 f"Provider call failed: {e}",
+                 status_code=status_code,
+                 retry_after=getattr(e, "retry_after", None),
+                 retryable=status_code in RETRYABLE_STATUS or isinstance(e, httpx.TransportError)
+             ) from e
+
+
+    def _build_messages(self, prompt: str, response_format: str, schema: Optional[str]) -> list:
+        """Prepare chat messages for a prompt (with JSON instructions in dict mode)."""
+        system_message = "You are a helpful assistant."
+        user_message = prompt
+        
+        if response_format == "dict" and schema:
+            system_message += f"\nYou must respond with a valid JSON object matching this schema: {schema}"
+            user_message += "\nRespond ONLY with the JSON."
+        
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ]
 
+    def _prepare_schema(self, schema: Optional[str]) -> tuple[Optional[CompiledSchema], Optional[asyncio.Task]]:
+        """
+        Look up a dict-mode schema. The first time a schema is seen its
+        validator is built on a worker thread (returned task) while the
+        provider call runs.
+        """
+        if not schema:
+            return None, None
+        compiled = self.schemas.get(schema)
+        if compiled.compiled:
+            return compiled, None
+        return compiled, asyncio.create_task(asyncio.to_thread(compiled.compile))
 
-    def generate(
+    async def _validate(
+        self,
+        compiled: CompiledSchema,
+        compile_task: Optional[asyncio.Task],
+        result: Any
+    ) -> Optional[list]:
+        """Validation errors for a parsed reply ([] if valid, None if unchecked)."""
+        if compile_task is not None:
+            await compile_task
+        started = time.perf_counter()
+        try:
+            return compiled.validate(result)
+        finally:
+            VALIDATION_SECONDS.observe(time.perf_counter() - started)
+
+    async def _repair(
+        self,
+        model: str,
+        messages: list,
+        temperature: float,
+        raw_content: str,
+        problems: list,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> tuple[str, dict]:
+        """One extra round trip asking the model to fix a reply that failed parsing or validation."""
+        repair_messages = messages + [
+            {"role": "assistant", "content": raw_content},
+            {"role": "user", "content": (
+                "Your reply does not match the schema:\n- " + "\n- ".join(problems)
+                + "\nRespond ONLY with the corrected JSON."
+            )}
+        ]
+        return await self._call_provider(model, repair_messages, temperature, stats)
+
+    def _parse_response(self, raw_content: str, response_format: str) -> Union[str, Dict[str, Any]]:
+        """Turn raw completion text into the result for the requested format."""
+        if response_format == "dict":
+            # Clean code blocks if present
+            cleaned = raw_content.strip()
+            if cleaned.startswith("```"):
+                cleaned = cleaned.split("\n", 1)[1]
+                if cleaned.endswith("```"):
+                    cleaned = cleaned.rsplit("\n", 1)[0]
+            
+            started = time.perf_counter()
+            try:
+                return json.loads(cleaned)
+            except json.JSONDecodeError as e:
+                raise RuntimeError(f"Failed to parse JSON response: {cleaned}") from e
+            finally:
+                JSON_PARSE_SECONDS.observe(time.perf_counter() - started)
+        return raw_content
+
+    async def _stream_provider(
+        self,
+        model: str,
+        messages: list,
+        temperature: float = DEFAULT_TEMPERATURE,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """
+        Streaming call to compatible APIs (OpenAI-style SSE).
+
+        Yields (content_delta, usage) pairs; usage is only non-empty on the
+        final chunk when the provider reports it. Goes through the provider
+        scheduler like _call_provider; failures are only retried before the
+        first chunk has been passed on.
+        """
+        provider, base_url, headers, payload = self._build_request(model, messages, temperature)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+        
+        scheduler = self._scheduler(provider)
+        pool = self._pool(provider)
+        estimated = _estimate_tokens(messages)
+        queue_s = 0.0
+        attempt = 0
+        tried = set()
+        
+        while True:
+            queue_s += await scheduler.acquire(estimated)
+            if stats is not None:
+                stats["queue_ms"] = round(queue_s * 1000, 1)
+            endpoint = pool.choose(tried) if pool else None
+            if endpoint is not None:
+                pool.begin(endpoint)
+                base_url = endpoint.url
+                if stats is not None:
+                    stats["endpoint"] = endpoint.url
+            started = time.monotonic()
+            failure: Optional[BaseException] = None
+            tokens_used = None
+            completion_tokens = None
+            streaming = False
+            try:
+                client = self._get_client(provider, base_url)
+                async with client.stream("POST", f"{base_url}/chat/completions", headers=headers, json=payload) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode("utf-8", errors="replace")
+                        raise ProviderError(
+                            f"API Request failed ({provider}): {body}",
+                            status_code=response.status_code,
+                            retry_after=_parse_retry_after(response.headers.get("Retry-After")),
+                            retryable=response.status_code in RETRYABLE_STATUS
+                        )
+                        
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        if "error" in chunk:
+                            raise ProviderError(f"API stream error ({provider}): {chunk['error']}")
+                        delta = ""
+                        if chunk.get("choices"):
+                            delta = chunk["choices"][0].get("delta", {}).get("content") or ""
+                        usage = chunk.get("usage") or {}
+                        if usage:
+                            tokens_used = usage.get("total_tokens")
+                            completion_tokens = usage.get("completion_tokens")
+                        if delta or usage:
+                            streaming = True
+                            yield delta, usage
+                return
+            except ProviderError as e:
+                failure = e
+            except Exception as e:
+                failure = ProviderError(f"Provider call failed: {e}", retryable=isinstance(e, httpx.TransportError))
+                failure.__cause__ = e
+            except BaseException as e:
+                failure = e
+                raise
+            finally:
+                PROVIDER_SECONDS.observe(time.monotonic() - started, provider, model)
+                await scheduler.release(
+                    time.monotonic() - started,
+                    error=failure,
+                    tokens_used=tokens_used,
+                    estimated_tokens=estimated,
+                    completion_tokens=completion_tokens
+                )
+                if endpoint is not None:
+                    pool.finish(endpoint, time.monotonic() - started, error=failure)
+                
+            if endpoint is not None and not streaming:
+                tried.add(endpoint.url)
+                if _connection_failed(failure) and pool.available(tried):
+                    if stats is not None:
+                        stats["failovers"] = stats.get("failovers", 0) + 1
+                    continue
+            if streaming or not failure.retryable or attempt >= scheduler.max_retries:
+                raise failure
+            if failure.retry_after is not None:
+                scheduler.pause(failure.retry_after)
+            else:
+                await asyncio.sleep(scheduler.retry_delay(attempt))
+            attempt += 1
+            if stats is not None:
+                stats["retries"] = attempt
+
+    async def _call_provider_shared(
+        self,
+        key: str,
+        model: str,
+        messages: list,
+        temperature: float,
+        stats: Dict[str, Any],
+        hedge: Optional[bool] = None
+    ) -> tuple[str, dict, bool]:
+        """
+        Single-flight wrapper around _call_hedged.
+
+        While a call for ``key`` is pending, identical requests wait for its
+        result (or exception) instead of going upstream. Returns
+        (content, usage, coalesced).
+        """
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                content, usage = await asyncio.shield(pending)
+                return content, usage, True
+            except asyncio.CancelledError:
+                # The leading request was cancelled (not us): make our own call
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            return await self._call_provider_shared(key, model, messages, temperature, stats, hedge)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            content, usage = await self._call_hedged(model, messages, temperature, stats, hedge)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody was waiting
+            raise
+        else:
+            future.set_result((content, usage))
+            return content, usage, False
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _record_request(self, model: str, start_time: float, error: Optional[str], usage: Optional[dict]):
+        """Update request counters and latency/token metrics for one generation."""
+        provider = model.split(":", 1)[0].lower() if ":" in model else "openrouter"
+        REQUESTS.inc(model, provider, "error" if error else "success")
+        REQUEST_SECONDS.observe(time.time() - start_time, model)
+        if usage:
+            if usage.get("prompt_tokens"):
+                TOKENS.inc(model, provider, "prompt", amount=usage["prompt_tokens"])
+            if usage.get("completion_tokens"):
+                TOKENS.inc(model, provider, "completion", amount=usage["completion_tokens"])
+
+    async def generate(
         self,
         prompt: str,
         model: str,
         response_format: str = "text",
         schema: Optional[str] = None,
-        tag: Optional[str] = None
+        tag: Optional[str] = None,
+        temperature: Optional[float] = None,
+        cache: Optional[str] = None,
+        log_metadata: Optional[Dict[str, Any]] = None,
+        repair: bool = False,
+        hedge: Optional[bool] = None,
+        coalesce: Optional[bool] = None
     ) -> Union[str, Dict[str, Any]]:
         """
         Unified generation method.
+
+        In dict mode the parsed reply is validated against the schema and the
+        outcome recorded in the log metadata ("validation", plus
+        "validation_errors" when it failed). With ``repair`` a reply that
+        fails parsing or validation gets one more round trip asking the model
+        to correct it; that call's stats are logged under "repair".
+
+        When the response cache is enabled, ``cache`` controls its use for this
+        request: "default" (read and write), "bypass" (neither) or "refresh"
+        (skip the lookup, store the new reply).
+
+        With ``coalesce``, identical concurrent requests share one provider
+        call; every caller still gets its own log row, marked ``coalesced``
+        when it reused another request's call. It defaults to on only at
+        temperature 0, so callers sampling the same prompt on purpose get
+        their own samples, and is always off when ``cache`` is "bypass".
+
+        ``hedge`` turns hedging of the provider call on or off for this
+        request (default: the provider's "hedge" setting). Hedged calls get a
+        "hedge" entry naming the attempt that won ("primary" or "hedge") and
+        holding the losing attempt's stats.
+
+        ``log_metadata`` is merged into the metadata of the log row.
         """
         # Auto-detect format based on schema
         if schema:
             response_format = "dict"
+        if temperature is None:
+            temperature = DEFAULT_TEMPERATURE
+        cache_mode = cache or "default"
+        if cache_mode not in CACHE_MODES:
+            raise RuntimeError(f"Invalid cache mode '{cache}', expected one of {', '.join(CACHE_MODES)}")
+        if coalesce is None:
+            coalesce = temperature == 0
             
         start_time = time.time()
         error = None
         result = None
         usage = {}
+        spent = {}  # Usage of the provider calls this request made itself
+        extra_metadata: Dict[str, Any] = dict(log_metadata or {})
+        IN_FLIGHT.inc()
         
         try:
-            # Prepare messages
-            system_message = "You are a helpful assistant."
-            user_message = prompt
-            
-            if response_format == "dict" and schema:
-                system_message += f"\nYou must respond with a valid JSON object matching this schema: {schema}"
-                user_message += "\nRespond ONLY with the JSON."
+            compiled, compile_task = self._prepare_schema(schema if response_format == "dict" else None)
+            messages = self._build_messages(prompt, response_format, compiled.text if compiled else schema)
             
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ]
+            # Call API (or answer from the response cache)
+            request_key = make_cache_key(model, messages, temperature)
+            response_cache = self.cache if cache_mode != "bypass" else None
+            cached = response_cache.get(request_key) if response_cache and cache_mode == "default" else None
+            fresh = False  # A reply of our own, to cache once it parses and validates
+            if cached is not None:
+                raw_content, usage = cached
+                extra_metadata["cache"] = "hit"
+            else:
+                if cache_mode == "bypass" or not coalesce:
+                    raw_content, usage = await self._call_hedged(model, messages, temperature, extra_metadata, hedge)
+                    coalesced = False
+                else:
+                    # Recorded up front so failed calls are marked too
+                    extra_metadata["coalesced"] = request_key in self._inflight
+                    raw_content, usage, coalesced = await self._call_provider_shared(
+                        request_key, model, messages, temperature, extra_metadata, hedge
+                    )
+                extra_metadata["coalesced"] = coalesced
+                fresh = not coalesced
+                spent = usage if fresh else {}
+                if response_cache:
+                    extra_metadata["cache"] = "refresh" if cache_mode == "refresh" else "miss"
             
+            # Process response
+            try:
+                result = self._parse_response(raw_content, response_format)
+                problems = await self._validate(compiled, compile_task, result) if compiled else None
+            except RuntimeError as e:
+                if not (repair and compiled):
+                    raise
+                result, problems = None, [str(e)]
+            if problems and repair:
+                # The repair call's queue/endpoint/retries go in their own entry
+                # so they don't overwrite those of the original call
+                repair_stats: Dict[str, Any] = {}
+                raw_content, repair_usage = await self._repair(
+                    model, messages, temperature, raw_content, problems, repair_stats
+                )
+                usage = _add_usage(usage, repair_usage)
+                spent = _add_usage(spent, repair_usage)
+                extra_metadata["repaired"] = True
+                extra_metadata["repair"] = repair_stats
+                result = self._parse_response(raw_content, response_format)
+                problems = await self._validate(compiled, compile_task, result)
+                # Keep the corrected reply so cache hits don't repeat the repair
+                fresh = True
+            if compiled:
+                _record_validation(extra_metadata, problems)
+            if response_cache and fresh and not problems:
+                response_cache.set(request_key, raw_content, usage)
+                
+        except asyncio.CancelledError:
+            error = "Cancelled"
+            raise
+        except Exception as e:
+            error = str(e)
+            raise e
+        finally:
+            IN_FLIGHT.dec()
+            self._record_request(model, start_time, error, spent)
+            await log_llm_call_async(
+                model=model,
+                prompt=prompt,
+                response=result if not error else None,
+                start_time=start_time,
+                error=error,
+                metadata={"format": response_format, "schema": schema, **_usage_metadata(usage, spent), **extra_metadata},
+                tag=tag
+            )
             
-            # Call API
-            raw_content, usage = self._call_provider(model, messages)
+        return result
 
+    async def generate_stream(
+        self,
+        prompt: str,
+        model: str,
+        response_format: str = "text",
+        schema: Optional[str] = None,
+        tag: Optional[str] = None,
+        temperature: Optional[float] = None,
+        cache: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of generate.
+
+        Yields {"delta": text} events as the provider produces tokens, then a
+        final {"done": True, "data": result}. The assembled text is logged
+        with time-to-first-token and tokens/second in the metadata. Dict-mode
+        replies are validated like in generate, but never repaired.
+        """
+        if schema:
+            response_format = "dict"
+        if temperature is None:
+            temperature = DEFAULT_TEMPERATURE
+        cache_mode = cache or "default"
+        if cache_mode not in CACHE_MODES:
+            raise RuntimeError(f"Invalid cache mode '{cache}', expected one of {', '.join(CACHE_MODES)}")
             
-            # Process response
-            if response_format == "dict":
-                # Clean code blocks if present
-                cleaned = raw_content.strip()
-                if cleaned.startswith("```"):
-                    cleaned = cleaned.split("\n", 1)[1]
-                    if cleaned.endswith("```"):
-                        cleaned = cleaned.rsplit("\n", 1)[0]
-                
-                try:
-                    result = json.loads(cleaned)
-                    # Validate with string-schema if available?
-                    # For now, just trust JSON load or use simple validation
-                except json.JSONDecodeError as e:
-                    raise RuntimeError(f"Failed to parse JSON response: {cleaned}") from e
+        start_time = time.time()
+        error = None
+        result = None
+        usage = {}
+        spent = {}  # Usage of the provider call this request made itself
+        extra_metadata: Dict[str, Any] = {"stream": True}
+        IN_FLIGHT.inc()
+        
+        try:
+            compiled, compile_task = self._prepare_schema(schema if response_format == "dict" else None)
+            messages = self._build_messages(prompt, response_format, compiled.text if compiled else schema)
+            
+            request_key = make_cache_key(model, messages, temperature)
+            response_cache = self.cache if cache_mode != "bypass" else None
+            cached = response_cache.get(request_key) if response_cache and cache_mode == "default" else None
+            if cached is not None:
+                raw_content, usage = cached
+                extra_metadata["cache"] = "hit"
+                yield {"delta": raw_content}
             else:
-                result = raw_content
+                parts = []
+                first_token_at = None
+                chunks = 0
+                provider_stream = self._stream_provider(model, messages, temperature, extra_metadata)
+                async with aclosing(provider_stream):
+                    async for delta, chunk_usage in provider_stream:
+                        if chunk_usage:
+                            usage = spent = chunk_usage
+                        if delta:
+                            if first_token_at is None:
+                                first_token_at = time.time()
+                                extra_metadata["ttft_ms"] = round((first_token_at - start_time) * 1000, 1)
+                            chunks += 1
+                            parts.append(delta)
+                            yield {"delta": delta}
+                raw_content = "".join(parts)
                 
+                if first_token_at is not None:
+                    generation_s = time.time() - first_token_at
+                    tokens = usage.get("completion_tokens") or chunks
+                    if generation_s > 0:
+                        extra_metadata["tokens_per_second"] = round(tokens / generation_s, 1)
+                if response_cache:
+                    extra_metadata["cache"] = "refresh" if cache_mode == "refresh" else "miss"
+            
+            result = self._parse_response(raw_content, response_format)
+            problems = await self._validate(compiled, compile_task, result) if compiled else None
+            if compiled:
+                _record_validation(extra_metadata, problems)
+            if response_cache and cached is None and not problems:
+                response_cache.set(request_key, raw_content, usage)
+            yield {"done": True, "data": result}
+            
+        except (asyncio.CancelledError, GeneratorExit):
+            error = "Stream cancelled by client"
+            raise
         except Exception as e:
             error = str(e)
             raise e
         finally:
-            log_llm_call(
+            IN_FLIGHT.dec()
+            self._record_request(model, start_time, error, spent)
+            await log_llm_call_async(
                 model=model,
                 prompt=prompt,
                 response=result if not error else None,
                 start_time=start_time,
                 error=error,
-                metadata={"format": response_format, "schema": schema, "usage": usage},
+                metadata={"format": response_format, "schema": schema, **_usage_metadata(usage, spent), **extra_metadata},
                 tag=tag
             )
-            
-        return result
+
+    def _batch_semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Per-provider limit on concurrently running batch items."""
+        semaphore = self._batch_semaphores.get(provider)
+        if semaphore is None:
+            limit = int(self.providers.get(provider, {}).get("batch_concurrency", DEFAULT_BATCH_CONCURRENCY))
+            semaphore = asyncio.Semaphore(max(1, limit))
+            self._batch_semaphores[provider] = semaphore
+        return semaphore
+
+    async def generate_batch(
+        self,
+        items: list,
+        tag: Optional[str] = None,
+        batch_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run many generate() calls and yield results in completion order.
+
+        ``items`` are dicts of generate() keyword arguments. Concurrency is
+        capped per provider (shared by all running batches). Every log row
+        gets the batch's ``batch_id`` in its metadata and, when given, the
+        batch ``tag``. Yields {"index", "status", "data" | "error"}.
+        """
+        batch_id = batch_id or uuid.uuid4().hex
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def run(index: int, item: Dict[str, Any]):
+            try:
+                provider = self._get_provider_config(item["model"])[0]
+                async with self._batch_semaphore(provider):
+                    data = await self.generate(
+                        **{**item, "tag": tag or item.get("tag")},
+                        log_metadata={"batch_id": batch_id, "batch_index": index}
+                    )
+                await results.put({"index": index, "status": "success", "data": data})
+            except Exception as e:
+                await results.put({"index": index, "status": "error", "error": str(e)})
+
+        tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(items)]
+        try:
+            for _ in range(len(tasks)):
+                yield await results.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let cancelled items finish their cleanup (log row, slot release) before returning
+            await asyncio.gather(*tasks, return_exceptions=True)
 
 # Singleton instance
 llm_service = LLMService()
+
+def _scheduler_gauge(attribute: str):
+    return lambda: {(name,): getattr(s, attribute) for name, s in list(llm_service._schedulers.items())}
+
+Gauge("simple_llm_provider_in_flight", "Provider calls holding a concurrency slot.", ("provider",),
+      callback=_scheduler_gauge("in_flight"))
+Gauge("simple_llm_provider_waiting", "Provider calls queued for rate budget or a slot.", ("provider",),
+      callback=_scheduler_gauge("waiting"))
+Gauge("simple_llm_provider_concurrency_limit", "Current adaptive concurrency limit.", ("provider",),
+      callback=_scheduler_gauge("limit"))
+
+def _endpoint_gauge(attribute: str):
+    return lambda: {
+        (name, e.url): float(getattr(e, attribute))
+        for name, pool in list(llm_service._pools.items()) for e in pool.endpoints
+    }
+
+Gauge("simple_llm_endpoint_outstanding", "Provider calls in flight per endpoint.", ("provider", "endpoint"),
+      callback=_endpoint_gauge("outstanding"))
+Gauge("simple_llm_endpoint_healthy", "1 while an endpoint is in rotation.", ("provider", "endpoint"),
+      callback=_endpoint_gauge("healthy"))
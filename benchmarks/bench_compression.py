@@ -0,0 +1,155 @@
+"""
+Storage ratio and read/write overhead of compressed log bodies.
+
+Writes the same synthetic RAG workload (a long system prompt plus chunks
+retrieved from a shared corpus, JSON answers with citations) three times:
+plain TEXT, zstd frames, and zstd frames with a trained shared dictionary.
+Each run reports bytes on disk and per operation timings for the write path
+(_log_row + batched _write_logs), a list page, opening one log, a search
+and a full export.
+
+Run from the repository root (needs zstandard):
+    python benchmarks/bench_compression.py --rows 20000
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+import compression  # noqa: E402
+import logger  # noqa: E402
+
+SYSTEM = (
+    "You are a support assistant for an internal knowledge base. Answer only from the context "
+    "documents below. Cite every claim as [doc N]. If the context does not contain the answer, "
+    "say so and suggest which team to ask. Keep answers under 200 words, use bullet points for "
+    "steps, and never invent configuration values, URLs or version numbers.\n"
+) * 3
+
+
+class Corpus:
+    """Zipf-distributed pseudo-English: chunks repeat across prompts, as retrieval does."""
+
+    def __init__(self, rng, vocab=3000, documents=400, chunk_words=350):
+        syllables = ["ka", "to", "ri", "men", "sa", "lo", "ver", "dis", "an", "el", "con", "pro", "ing", "ed", "ter"]
+        self.words = sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(vocab)})
+        self.weights = [1 / (rank + 1) for rank in range(len(self.words))]
+        self.rng = rng
+        self.chunks = [self.text(chunk_words) for _ in range(documents)]
+
+    def text(self, words):
+        tokens = self.rng.choices(self.words, self.weights, k=words)
+        sentences = [" ".join(tokens[i:i + 14]).capitalize() + "." for i in range(0, words, 14)]
+        return " ".join(sentences)
+
+
+def workload(rows, seed=7):
+    rng = random.Random(seed)
+    corpus = Corpus(rng)
+    start = datetime.utcnow() - timedelta(days=1)
+    for i in range(rows):
+        # Most calls are RAG prompts of 10-40KB; the rest are short chat turns
+        if rng.random() < 0.8:
+            picked = rng.sample(range(len(corpus.chunks)), rng.randint(4, 16))
+            context = "\n\n".join(f"[doc {n}] {corpus.chunks[n]}" for n in picked)
+            prompt = f"{SYSTEM}\nContext:\n{context}\n\nQuestion: {corpus.text(20)}?"
+            answer = {"answer": corpus.text(rng.randint(60, 300)), "citations": sorted(rng.sample(picked, 3))}
+        else:
+            prompt = f"Question: {corpus.text(rng.randint(10, 60))}?"
+            answer = {"answer": corpus.text(rng.randint(10, 80)), "citations": []}
+        yield (
+            (start + timedelta(seconds=i)).isoformat(), "gpt-4o", prompt, json.dumps(answer),
+            rng.uniform(300, 4000), None,
+            {"format": "json", "usage": {"prompt_tokens": len(prompt) // 4, "total_tokens": len(prompt) // 4 + 200}},
+            "rag"
+        )
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def run(mode, rows, batch, train_after, repeat):
+    tmp = Path(tempfile.mkdtemp(prefix="simple-llm-compress-"))
+    logger.DB_FILE = tmp / "logs.db"
+    logger.LEGACY_LOG_FILE = tmp / "llm.jsonl"
+    logger.DICT_TRAIN_AFTER = 10 ** 9  # Trained explicitly below
+    compression.body_codec.min_bytes = 0 if mode == "plain" else compression.COMPRESS_MIN_BYTES
+    logger.init_db()
+
+    write_seconds = 0.0
+    calls = workload(rows)
+    written = 0
+    while written < rows:
+        if mode == "zstd+dict" and written >= train_after and compression.body_codec.active is None:
+            logger.train_dictionary()
+        chunk = [next(calls) for _ in range(min(batch, rows - written))]
+        # Compression happens in _log_row, so it is timed along with the write
+        t0 = time.perf_counter()
+        logger._write_logs([logger._log_row(*call) for call in chunk])
+        write_seconds += time.perf_counter() - t0
+        written += len(chunk)
+    with logger.get_db().reader() as conn:
+        raw = conn.execute(
+            'SELECT SUM(length(CAST(log_body(prompt) AS BLOB)) + length(CAST(log_body(response) AS BLOB))) FROM logs'
+        ).fetchone()[0]
+        stored = conn.execute('SELECT SUM(length(prompt) + length(response)) FROM logs').fetchone()[0]
+    with logger.get_db().writer() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    disk = logger.DB_FILE.stat().st_size
+
+    middle = rows // 2
+    page = timed(lambda: logger.get_logs(limit=50), repeat)
+    deep = timed(lambda: logger.get_logs(limit=50, before_id=middle), repeat)
+    one = timed(lambda: [logger.get_log(i) for i in range(middle, middle + 50)], repeat) / 50
+    search = timed(lambda: logger.get_logs(q="question", limit=50), repeat)
+    t0 = time.perf_counter()
+    exported = sum(len(chunk) for chunk in logger.export_logs())
+    export_seconds = time.perf_counter() - t0
+
+    logger.close_db()
+    compression.body_codec.clear()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "mode": mode, "raw_mb": raw / 1e6, "stored_mb": stored / 1e6, "disk_mb": disk / 1e6,
+        "ratio": raw / stored, "write_us": write_seconds / rows * 1e6,
+        "page_ms": page, "deep_ms": deep, "get_ms": one, "search_ms": search,
+        "export_rows_s": exported / export_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=logger.LOG_BATCH_SIZE)
+    parser.add_argument("--train-after", type=int, default=2000,
+                        help="rows written before the dictionary is trained (zstd+dict)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if compression.zstandard is None:
+        sys.exit("zstandard is not installed (pip install zstandard)")
+
+    print(f"{'mode':>10} {'raw MB':>8} {'body MB':>8} {'disk MB':>8} {'ratio':>6} {'write us/row':>13} "
+          f"{'page ms':>8} {'deep ms':>8} {'get ms':>7} {'search ms':>10} {'export rows/s':>14}")
+    for mode in ("plain", "zstd", "zstd+dict"):
+        r = run(mode, args.rows, args.batch, args.train_after, args.repeat)
+        print(f"{r['mode']:>10} {r['raw_mb']:>8.1f} {r['stored_mb']:>8.1f} {r['disk_mb']:>8.1f} {r['ratio']:>6.1f} "
+              f"{r['write_us']:>13.0f} {r['page_ms']:>8.2f} {r['deep_ms']:>8.2f} {r['get_ms']:>7.3f} "
+              f"{r['search_ms']:>10.1f} {r['export_rows_s']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Export throughput: streaming NDJSON/CSV/Parquet vs paging /api/logs.
+
+Create the dataset first, e.g. 1M rows:
+    python create_test_data.py --rows 1000000 --db /tmp/logs-1m.db
+
+Then run (from the repository root):
+    python benchmarks/bench_export.py --db /tmp/logs-1m.db
+
+Peak RSS is reported per format to show that memory stays flat while the
+output grows. Parquet is skipped when pyarrow isn't installed.
+"""
+import argparse
+import resource
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+import logger  # noqa: E402
+import export  # noqa: E402
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_export(fmt, chunk_size):
+    rows = 0
+    size = 0
+
+    def counted():
+        nonlocal rows
+        for batch in logger.export_logs(chunk_size=chunk_size):
+            rows += len(batch)
+            yield batch
+
+    t0 = time.perf_counter()
+    for chunk in export.export_chunks(fmt, counted()):
+        size += len(chunk)
+    return rows, size, time.perf_counter() - t0
+
+
+def run_paging(limit, max_rows):
+    """The old way: walk /api/logs pages (full rows + a count per page)."""
+    rows = 0
+    t0 = time.perf_counter()
+    page = 1
+    while rows < max_rows:
+        batch = logger.get_logs(limit=limit, offset=(page - 1) * limit, full=True)
+        logger.count_logs()
+        if not batch:
+            break
+        rows += len(batch)
+        page += 1
+    return rows, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--chunk-size", type=int, default=logger.EXPORT_CHUNK_SIZE)
+    parser.add_argument("--paging-rows", type=int, default=50000,
+                        help="rows to fetch through OFFSET paging for comparison (0 to skip)")
+    args = parser.parse_args()
+
+    logger.DB_FILE = Path(args.db)
+    logger.init_db()
+    print(f"{'format':>8} {'rows':>10} {'MB':>9} {'seconds':>8} {'rows/s':>10} {'MB/s':>7} {'peak RSS MB':>12}")
+
+    for fmt in ("ndjson", "csv", "parquet"):
+        if fmt == "parquet" and export.pa is None:
+            print(f"{fmt:>8} skipped (pyarrow not installed)")
+            continue
+        rows, size, seconds = run_export(fmt, args.chunk_size)
+        mb = size / 1e6
+        print(f"{fmt:>8} {rows:>10} {mb:>9.1f} {seconds:>8.2f} {rows / seconds:>10.0f} "
+              f"{mb / seconds:>7.1f} {peak_rss_mb():>12.0f}")
+
+    if args.paging_rows:
+        rows, seconds = run_paging(50, args.paging_rows)
+        print(f"{'paging':>8} {rows:>10} {'':>9} {seconds:>8.2f} {rows / seconds:>10.0f}")
+
+    logger.close_db()
+
+
+if __name__ == "__main__":
+    main()
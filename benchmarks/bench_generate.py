@@ -0,0 +1,88 @@
+"""
+Load benchmark for LLMService.generate against a local mock OpenAI-compatible server.
+
+Usage (from the repository root):
+    python benchmarks/bench_generate.py --requests 500 --concurrency 200 --latency-ms 200
+
+Runs in a temporary working directory so ../data/settings.json and logs.db are not touched.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import mock_openai  # noqa: E402
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def run(args):
+    # Import after chdir so the service singleton uses the temp data dir
+    import logger
+    from service import llm_service
+
+    logger.init_db()
+    if not args.sync_logs:
+        logger.start_log_writer()
+
+    latencies = []
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with sem:
+            t0 = time.perf_counter()
+            await llm_service.generate(prompt=f"prompt {i}", model="ollama:mock", tag="bench")
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    # Warm up the connection pool
+    await llm_service.generate(prompt="warmup", model="ollama:mock", tag="bench")
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - t0
+    await llm_service.aclose()
+    logger.stop_log_writer()
+
+    print(f"requests:     {args.requests}")
+    print(f"concurrency:  {args.concurrency}")
+    print(f"mock latency: {args.latency_ms:.0f} ms")
+    print(f"elapsed:      {elapsed:.2f} s")
+    print(f"throughput:   {args.requests / elapsed:.1f} req/s")
+    print(f"p50 / p95 / p99: {percentile(latencies, 50):.1f} / "
+          f"{percentile(latencies, 95):.1f} / {percentile(latencies, 99):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=31199)
+    parser.add_argument("--sync-logs", action="store_true", help="write each log row inline")
+    args = parser.parse_args()
+
+    mock_openai.start_in_thread(args.port, args.latency_ms)
+
+    workdir = Path(tempfile.mkdtemp(prefix="simple-llm-bench-")) / "backend"
+    workdir.mkdir(parents=True)
+    os.chdir(workdir)
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Tail latency of LLMService.generate with and without hedged requests.
+
+The mock server answers MOCK_SLOW_RATE of the requests MOCK_SLOW_FACTOR
+times slower than --latency-ms. Usage (from the repository root):
+    python benchmarks/bench_hedge.py --requests 1000 --slow-rate 0.03 --percentile 95
+
+Runs in a temporary working directory so ../data/settings.json and logs.db are not touched.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import mock_openai  # noqa: E402
+from bench_generate import percentile  # noqa: E402
+
+
+async def run(args):
+    # Import after chdir so the service singleton uses the temp data dir
+    import logger
+    from metrics import HEDGES
+    from service import llm_service
+
+    logger.init_db()
+    logger.start_log_writer()
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one(i, hedge, latencies):
+        async with sem:
+            t0 = time.perf_counter()
+            await llm_service.generate(prompt=f"prompt {i}", model="ollama:mock", cache="bypass", hedge=hedge)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    llm_service.providers["ollama"]["hedge"] = {"percentile": args.percentile, "max_ratio": args.max_ratio}
+    for hedge in (False, True):
+        llm_service._hedges = {}
+        latencies = []
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i, hedge, latencies) for i in range(args.requests)))
+        elapsed = time.perf_counter() - t0
+        print(f"hedging {'on ' if hedge else 'off'}: {elapsed:.2f} s, p50 / p95 / p99 / max: "
+              f"{percentile(latencies, 50):.0f} / {percentile(latencies, 95):.0f} / "
+              f"{percentile(latencies, 99):.0f} / {max(latencies):.0f} ms")
+    outcomes = {labels[1]: int(count) for labels, count in HEDGES._values.items()}
+    sent = outcomes.get("primary", 0) + outcomes.get("hedge", 0)
+    print(f"hedges sent: {sent} ({sent / args.requests:.1%} of requests), outcomes: {outcomes}")
+    await llm_service.aclose()
+    logger.stop_log_writer()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-factor", type=float, default=10)
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--max-ratio", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=31198)
+    args = parser.parse_args()
+
+    mock_openai.SLOW_RATE = args.slow_rate
+    mock_openai.SLOW_FACTOR = args.slow_factor
+    mock_openai.start_in_thread(args.port, args.latency_ms)
+
+    workdir = Path(tempfile.mkdtemp(prefix="simple-llm-bench-")) / "backend"
+    workdir.mkdir(parents=True)
+    os.chdir(workdir)
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
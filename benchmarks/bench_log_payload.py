@@ -0,0 +1,86 @@
+"""
+Dashboard page load: bytes on the wire and server time for one /api/logs page.
+
+Fills a database with the synthetic RAG workload of bench_compression.py,
+then requests the same 50-row page as full rows (response and metadata
+included), as light rows with prompt previews, light rows gzip and brotli
+compressed, and a revalidation with If-None-Match (304). Opening one log
+through /api/logs/{id} is timed too.
+
+Usage (from the repository root):
+    python benchmarks/bench_log_payload.py --rows 2000
+
+Runs in a temporary working directory so ../data/settings.json and logs.db are not touched.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from bench_compression import workload  # noqa: E402
+
+
+def fetch(client, url, headers, repeat):
+    """Best time (ms), bytes on the wire and the ETag of a GET."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with client.stream("GET", url, headers=headers) as response:
+            raw = b"".join(response.iter_raw())
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, len(raw), response.status_code, response.headers.get("etag")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="simple-llm-bench-")) / "backend"
+    workdir.mkdir(parents=True)
+    os.chdir(workdir)
+
+    # Import after chdir so the app uses the temp data dir
+    import logger
+    import http_middleware
+    from fastapi.testclient import TestClient
+    from main import app
+
+    logger.init_db()
+    calls = workload(args.rows)
+    for start in range(0, args.rows, logger.LOG_BATCH_SIZE):
+        count = min(logger.LOG_BATCH_SIZE, args.rows - start)
+        logger._write_logs([logger._log_row(*next(calls)) for _ in range(count)])
+
+    page = f"/api/logs?limit={args.limit}"
+    identity = {"Accept-Encoding": "identity"}
+    with TestClient(app) as client:
+        _, _, _, etag = fetch(client, page, identity, 1)
+        cases = [
+            ("full rows", page + "&full=true", identity),
+            ("light rows", page, identity),
+            ("light + gzip", page, {"Accept-Encoding": "gzip"}),
+        ]
+        if http_middleware.brotli is not None:
+            cases.append(("light + br", page, {"Accept-Encoding": "br"}))
+        cases += [
+            ("304 revalidate", page, {**identity, "If-None-Match": etag}),
+            ("one log (gzip)", f"/api/logs/{args.rows // 2}", {"Accept-Encoding": "gzip"}),
+        ]
+        print(f"{'request':>16} {'status':>6} {'KB':>9} {'ms':>8}")
+        for name, url, headers in cases:
+            ms, size, status, _ = fetch(client, url, headers, args.repeat)
+            print(f"{name:>16} {status:>6} {size / 1024:>9.1f} {ms:>8.2f}")
+    logger.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Mixed insert / paginated-read throughput benchmark for backend/logger.py.
+
+Usage (from the repository root):
+    python benchmarks/bench_logger.py --seconds 10 --writers 4 --readers 4
+    python benchmarks/bench_logger.py --legacy   # connection-per-call, rollback journal
+
+The --legacy mode reproduces the previous access pattern (a fresh
+sqlite3.connect per operation on a DELETE-journal database) so the two
+numbers can be compared on the same machine.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+import logger  # noqa: E402
+
+
+def legacy_insert(db_file, i):
+    conn = sqlite3.connect(db_file)
+    logger._register_functions(conn)
+    conn.execute(logger.INSERT_LOG_SQL, logger._log_row(
+        time.strftime("%Y-%m-%dT%H:%M:%S"), "bench-model", f"prompt {i}", json.dumps("response"),
+        12.5, None, {"format": "text"}, "bench"))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(db_file, page):
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    conn.execute("SELECT * FROM logs ORDER BY id DESC LIMIT 50 OFFSET ?", (page * 50,)).fetchall()
+    conn.execute("SELECT COUNT(*) FROM logs").fetchone()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="simple-llm-bench-"))
+    logger.DB_FILE = tmp / "logs.db"
+    logger.LEGACY_LOG_FILE = tmp / "llm.jsonl"
+    logger.init_db()
+    logger.close_db()
+
+    with sqlite3.connect(logger.DB_FILE) as conn:
+        logger._register_functions(conn)
+        if args.legacy:
+            conn.execute("PRAGMA journal_mode = DELETE")
+        conn.executemany(logger.INSERT_LOG_SQL, (
+            logger._log_row("2024-01-01T00:00:00", "bench-model", f"seed {i}", json.dumps("response"),
+                            10.0, None, {"format": "text"}, "seed")
+            for i in range(args.seed_rows)))
+
+    counts = {"insert": 0, "read": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+
+    def writer(n):
+        i = 0
+        while time.perf_counter() < stop:
+            if args.legacy:
+                legacy_insert(logger.DB_FILE, i)
+            else:
+                logger.log_llm_call("bench-model", f"prompt {n}-{i}", "response", time.time(),
+                                    metadata={"format": "text"}, tag="bench")
+            i += 1
+        with lock:
+            counts["insert"] += i
+
+    def reader(n):
+        i = 0
+        while time.perf_counter() < stop:
+            page = i % 20
+            if args.legacy:
+                legacy_read(logger.DB_FILE, page)
+            else:
+                logger.get_logs(limit=50, offset=page * 50)
+                logger.count_logs()
+            i += 1
+        with lock:
+            counts["read"] += i
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    logger.close_db()
+
+    mode = "legacy (connect per call, rollback journal)" if args.legacy else "pooled (WAL)"
+    print(f"mode:          {mode}")
+    print(f"inserts/sec:   {counts['insert'] / args.seconds:.0f}")
+    print(f"page reads/sec:{counts['read'] / args.seconds:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+OFFSET vs keyset (cursor) pagination latency on a large logs database.
+
+Create the dataset first, e.g. 5M rows:
+    python create_test_data.py --rows 5000000 --db /tmp/logs-5m.db
+
+Then run (from the repository root):
+    python benchmarks/bench_pagination.py --db /tmp/logs-5m.db
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+import logger  # noqa: E402
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.DB_FILE = Path(args.db)
+    logger.init_db()  # ensures indexes exist
+    total = logger.count_logs()
+    print(f"rows: {total}")
+    print(f"{'page':>10} {'offset ms':>10} {'keyset ms':>10}")
+
+    for page in (1, 10, 100, 1000, 10000, 50000):
+        offset = (page - 1) * args.limit
+        if offset >= total:
+            break
+        # Cursor for this page = id of the last row on the previous page
+        with logger.get_db().reader() as conn:
+            row = conn.execute("SELECT id FROM logs ORDER BY id DESC LIMIT 1 OFFSET ?", (max(offset - 1, 0),)).fetchone()
+        before_id = row[0] if offset else None
+
+        offset_ms, a = timed(lambda: logger.get_logs(limit=args.limit, offset=offset), args.repeat)
+        keyset_ms, b = timed(lambda: logger.get_logs(limit=args.limit, before_id=before_id), args.repeat)
+        assert [r["id"] for r in a] == [r["id"] for r in b]
+        print(f"{page:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+    logger.close_db()
+
+
+if __name__ == "__main__":
+    main()
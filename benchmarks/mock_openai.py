@@ -0,0 +1,88 @@
+"""
+Minimal OpenAI-compatible mock server used by the benchmarks.
+
+Run standalone:
+    python benchmarks/mock_openai.py --port 31199 --latency-ms 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+
+import json
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "200"))
+TOKEN_INTERVAL_MS = float(os.getenv("MOCK_TOKEN_INTERVAL_MS", "10"))
+# Fraction of requests answered with 429 + Retry-After, to exercise client backoff
+THROTTLE_RATE = float(os.getenv("MOCK_THROTTLE_RATE", "0"))
+RETRY_AFTER_S = os.getenv("MOCK_RETRY_AFTER", "0.2")
+# Fraction of requests that take SLOW_FACTOR x the latency, to exercise hedging
+SLOW_RATE = float(os.getenv("MOCK_SLOW_RATE", "0"))
+SLOW_FACTOR = float(os.getenv("MOCK_SLOW_FACTOR", "10"))
+
+app = FastAPI(title="Mock OpenAI")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if THROTTLE_RATE and random.random() < THROTTLE_RATE:
+        return JSONResponse({"error": {"message": "rate limited"}}, status_code=429,
+                            headers={"Retry-After": RETRY_AFTER_S})
+    slow = SLOW_RATE and random.random() < SLOW_RATE
+    await asyncio.sleep(LATENCY_MS * (SLOW_FACTOR if slow else 1) / 1000)
+    prompt = body["messages"][-1]["content"]
+    content = f"echo: {prompt[:64]}"
+    if body.get("stream"):
+        return StreamingResponse(_stream(body, content), media_type="text/event-stream")
+    return {
+        "id": "mock-1",
+        "object": "chat.completion",
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                  "total_tokens": len(prompt.split()) + len(content.split())},
+    }
+
+
+async def _stream(body, content):
+    words = content.split(" ")
+    for i, word in enumerate(words):
+        delta = word if i == 0 else " " + word
+        chunk = {"id": "mock-1", "object": "chat.completion.chunk", "model": body.get("model"),
+                 "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(TOKEN_INTERVAL_MS / 1000)
+    if body.get("stream_options", {}).get("include_usage"):
+        chunk = {"id": "mock-1", "object": "chat.completion.chunk", "choices": [],
+                 "usage": {"prompt_tokens": 1, "completion_tokens": len(words), "total_tokens": 1 + len(words)}}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def start_in_thread(port: int, latency_ms: float = LATENCY_MS) -> uvicorn.Server:
+    """Start the mock server on a background thread and wait until it is up."""
+    global LATENCY_MS
+    LATENCY_MS = latency_ms
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=31199)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    args = parser.parse_args()
+    LATENCY_MS = args.latency_ms
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -1,14 +1,26 @@
 
+import argparse
+import random
 import sqlite3
 import json
+import sys
 import time
 from datetime import datetime, timedelta
+from pathlib import Path
 
 DB_FILE = "data/logs.db"
 
+BULK_MODELS = ["gpt-4o", "claude-3-5-sonnet", "gpt-3.5-turbo", "ollama:llama3"]
+BULK_TAGS = ["physics-101", "user-gen", "geography", "error-test", "bench", None]
+BULK_BATCH_SIZE = 50000
+
 def get_db_connection():
+    sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+    import logger
     conn = sqlite3.connect(DB_FILE)
     conn.row_factory = sqlite3.Row
+    # The search triggers call log_body() to index compressed bodies
+    logger._register_functions(conn)
     return conn
 
 def create_sample_logs():
@@ -94,5 +106,61 @@ def create_sample_logs():
     conn.close()
     print("Sample logs created successfully!")
 
+def create_bulk_logs(rows: int, days: int = 90):
+    """Insert `rows` synthetic logs spread evenly over the last `days` days."""
+    # Make sure the schema (and its indexes) exists
+    sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+    import logger
+    logger.DB_FILE = Path(DB_FILE)
+    logger.init_db()
+    logger.close_db()
+
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=days)
+    step = timedelta(days=days) / max(rows, 1)
+    t0 = time.time()
+
+    def generate(offset, count):
+        for i in range(offset, offset + count):
+            error = "Rate limited" if rng.random() < 0.02 else None
+            tokens = rng.randint(20, 2000)
+            yield logger._log_row(
+                (start + step * i).isoformat(),
+                rng.choice(BULK_MODELS),
+                f"Synthetic prompt #{i}: summarize document {rng.randint(1, 10**6)}.",
+                None if error else json.dumps(f"Synthetic response #{i}"),
+                rng.uniform(150, 8000),
+                error,
+                {"format": "text", "usage": {"total_tokens": tokens}},
+                rng.choice(BULK_TAGS),
+            )
+
+    # Load without secondary indexes, then build each one in a single pass
+    with logger.deferred_indexes():
+        conn = get_db_connection()
+        conn.execute("PRAGMA synchronous = OFF")
+        for offset in range(0, rows, BULK_BATCH_SIZE):
+            count = min(BULK_BATCH_SIZE, rows - offset)
+            conn.executemany(logger.INSERT_LOG_SQL, generate(offset, count))
+            conn.commit()
+            print(f"  {offset + count}/{rows} rows ({time.time() - t0:.1f}s)")
+        conn.close()
+
+    # Raw inserts bypass the logger, so fold them into the stats rollups and search index
+    logger.rebuild_rollups()
+    logger.catch_up_search_index()
+    logger.close_db()
+    print(f"Created {rows} synthetic logs in {time.time() - t0:.1f}s")
+
 if __name__ == "__main__":
-    create_sample_logs()
+    parser = argparse.ArgumentParser(description="Create sample logs (or a large synthetic dataset with --rows).")
+    parser.add_argument("--rows", type=int, default=0, help="number of synthetic rows to bulk insert")
+    parser.add_argument("--days", type=int, default=90, help="spread synthetic rows over this many days")
+    parser.add_argument("--db", default=DB_FILE, help="database file (default: data/logs.db)")
+    args = parser.parse_args()
+    DB_FILE = args.db
+
+    if args.rows:
+        create_bulk_logs(args.rows, args.days)
+    else:
+        create_sample_logs()
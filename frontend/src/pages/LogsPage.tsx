@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import api from "@/lib/api";
 import { RefreshCcw, Trash2, ChevronLeft, ChevronRight, Pin } from "lucide-react";
 
@@ -34,12 +34,20 @@ interface LogEntry {
   timestamp: string;
   model: string;
   prompt: string;
-  response: any;
+  response?: any;
   duration_ms: number;
   error?: string;
   metadata?: any;
   locked: boolean;
   tag?: string | null;
+  format?: string | null;
+  provider?: string | null;
+  status?: string | null;
+  prompt_tokens?: number | null;
+  completion_tokens?: number | null;
+  total_tokens?: number | null;
+  schema_id?: number | null;
+  schema?: string | null;
 }
 
 interface PaginationData {
@@ -47,6 +55,13 @@ interface PaginationData {
   limit: number;
   total: number;
   pages: number;
+  before_id?: number | null;
+  after_id?: number | null;
+}
+
+interface PageCursor {
+  before_id?: number;
+  after_id?: number;
 }
 
 export default function LogsPage() {
@@ -63,10 +78,10 @@ export default function LogsPage() {
   const [purgeOpen, setPurgeOpen] = useState(false);
   const [purgeOption, setPurgeOption] = useState("30d"); 
 
-  const fetchLogs = async (page = 1) => {
+  const fetchLogs = async (page = 1, cursor?: PageCursor) => {
     setLoading(true);
     try {
-      const params: any = { page, limit: pagination.limit };
+      const params: any = { page, limit: pagination.limit, ...cursor };
       if (tagSearch !== "all") params.tag = tagSearch;
 
       const res = await api.get("/api/logs", { params });
@@ -79,6 +94,17 @@ export default function LogsPage() {
     }
   };
 
+  // List rows are light; the response, metadata and schema load when a log is opened
+  const openLog = async (log: LogEntry) => {
+    setSelectedLog(log);
+    try {
+      const res = await api.get(`/api/logs/${log.id}`);
+      setSelectedLog(current => current?.id === log.id ? res.data : current);
+    } catch (err) {
+      console.error("Failed to fetch log", err);
+    }
+  };
+
   const fetchTags = async () => {
     try {
       const res = await api.get("/api/logs/tags");
@@ -120,11 +146,44 @@ export default function LogsPage() {
     fetchTags();
   }, [tagSearch]); // Refetch when filters change
 
+  // Newest id on screen, where the live tail resumes from
+  const newestId = useRef<number | null>(null);
+  useEffect(() => {
+    newestId.current = pagination.page === 1 && logs.length ? logs[0].id : newestId.current;
+  }, [logs, pagination.page]);
+
+  // Live tail: new logs are pushed by the server while the first page is shown
+  const onFirstPage = pagination.page === 1;
+  useEffect(() => {
+    if (!onFirstPage) return;
+    const params = new URLSearchParams();
+    if (tagSearch !== "all") params.set("tag", tagSearch);
+    if (newestId.current !== null) params.set("after_id", String(newestId.current));
+    const source = new EventSource(`${api.defaults.baseURL}/api/logs/stream?${params}`);
+    source.addEventListener("log", (event) => {
+      const entry: LogEntry = JSON.parse((event as MessageEvent).data);
+      // Reopening the stream can replay rows the last fetch already counted
+      if (newestId.current !== null && entry.id <= newestId.current) return;
+      newestId.current = entry.id;
+      setLogs(prev => [entry, ...prev].slice(0, pagination.limit));
+      setPagination(prev => ({
+        ...prev,
+        total: prev.total + 1,
+        pages: Math.max(1, Math.ceil((prev.total + 1) / prev.limit)),
+      }));
+    });
+    // Missed too much while disconnected
+    source.addEventListener("reset", () => fetchLogs(1));
+    return () => source.close();
+  }, [tagSearch, onFirstPage]);
+
+  // A chat from the header: the live tail covers the first page, other pages jump back to it
   useEffect(() => {
+    if (onFirstPage) return;
     const handleRefresh = () => fetchLogs(1);
     window.addEventListener("refresh-logs", handleRefresh);
     return () => window.removeEventListener("refresh-logs", handleRefresh);
-  }, []);
+  }, [onFirstPage]);
 
   return (
     <div className="flex flex-col gap-6 w-full max-w-6xl mx-auto p-4">
@@ -200,8 +259,8 @@ export default function LogsPage() {
           </div>
         ) : (
           logs.map((log) => {
-             const formatType = log.metadata?.format === 'dict' ? 'get_dict' : 'get_text';
-             const tokens = log.metadata?.usage?.total_tokens;
+             const formatType = log.format === 'dict' ? 'get_dict' : 'get_text';
+             const tokens = log.total_tokens;
              const promptLine = log.prompt.split('\n')[0];
  
              return (
@@ -228,7 +287,7 @@ export default function LogsPage() {
                   <div 
                     className="text-sm font-medium truncate cursor-pointer hover:bg-muted/50 -mx-2 px-2 py-1 rounded-md transition-colors" 
                     title="Click to view full details"
-                    onClick={() => setSelectedLog(log)}
+                    onClick={() => openLog(log)}
                   >
                     {log.tag && (
                       <Badge variant="outline" className="mr-2 px-1.5 h-5 text-[10px] bg-blue-50/50 text-blue-600 border-blue-200 dark:bg-blue-900/20 dark:text-blue-300 dark:border-blue-800">
@@ -254,7 +313,7 @@ export default function LogsPage() {
                         </button>
 
                         <span className="font-mono shrink-0 text-muted-foreground/70">
-                            {tokens !== undefined ? `${tokens} toks` : ''}
+                            {tokens != null ? `${tokens} toks` : ''}
                         </span>
                     </div>
                    
@@ -272,7 +331,10 @@ export default function LogsPage() {
         <Button 
             variant="outline" 
             size="sm" 
-            onClick={() => fetchLogs(pagination.page - 1)} 
+            onClick={() => fetchLogs(
+                pagination.page - 1,
+                pagination.page > 2 && pagination.after_id ? { after_id: pagination.after_id } : undefined
+            )} 
             disabled={pagination.page <= 1 || loading}
         >
             <ChevronLeft className="h-4 w-4" />
@@ -283,7 +345,11 @@ export default function LogsPage() {
         <Button 
             variant="outline" 
             size="sm" 
-            onClick={() => fetchLogs(pagination.page + 1)} 
+            onClick={() => {
+                // Live rows shift the first page, so page past its last row on screen
+                const beforeId = logs.length ? logs[logs.length - 1].id : pagination.before_id;
+                fetchLogs(pagination.page + 1, beforeId ? { before_id: beforeId } : undefined);
+            }} 
             disabled={pagination.page >= pagination.pages || loading}
         >
             <ChevronRight className="h-4 w-4" />
@@ -354,25 +420,25 @@ export default function LogsPage() {
                             </div>
                             <div className="space-y-1">
                                 <span className="text-xs font-semibold text-muted-foreground uppercase tracking-wider">Token Usage</span>
-                                <p className="font-medium text-sm">{selectedLog?.metadata?.usage?.total_tokens ?? 'N/A'}</p>
+                                <p className="font-medium text-sm">{selectedLog?.total_tokens ?? 'N/A'}</p>
                             </div>
                             <div className="space-y-1">
                                 <span className="text-xs font-semibold text-muted-foreground uppercase tracking-wider">Response Format</span>
-                                <p className="font-medium text-sm text-blue-500">{selectedLog?.metadata?.format === 'dict' ? 'get_dict' : 'get_text'}</p>
+                                <p className="font-medium text-sm text-blue-500">{selectedLog?.format === 'dict' ? 'get_dict' : 'get_text'}</p>
                             </div>
                         </div>
 
-                        {selectedLog?.metadata?.schema && (
+                        {selectedLog?.schema && (
                             <div className="space-y-2">
                                 <span className="text-xs font-semibold text-muted-foreground uppercase tracking-wider">JSON Schema</span>
                                 <div 
                                     className="bg-muted/30 p-3 rounded-md border text-xs overflow-auto max-h-40 font-mono whitespace-pre syntax-highlight"
-                                    dangerouslySetInnerHTML={{ __html: syntaxHighlight(JSON.stringify(selectedLog.metadata.schema, null, 2)) }}
+                                    dangerouslySetInnerHTML={{ __html: syntaxHighlight(JSON.stringify(selectedLog.schema, null, 2)) }}
                                 />
                             </div>
                         )}
 
-                        {selectedLog?.metadata && Object.keys(selectedLog.metadata).length > (selectedLog?.metadata?.schema ? 3 : 2) && (
+                        {selectedLog?.metadata && Object.keys(selectedLog.metadata).length > 2 && (
                             <div className="space-y-2">
                                 <span className="text-xs font-semibold text-muted-foreground uppercase tracking-wider">Raw Metadata</span>
                                 <div 
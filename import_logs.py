@@ -0,0 +1,72 @@
+"""
+Bulk import JSONL logs into the log database.
+
+Accepts the legacy logs/llm.jsonl format and the NDJSON written by
+GET /api/logs/export (so logs from another instance can be merged in):
+
+    python import_logs.py export.ndjson
+    python import_logs.py logs.ndjson.gz --db /tmp/logs.db
+    curl -s http://other:8000/api/logs/export | python import_logs.py -
+
+Imports are resumable: re-running with the same file (or --import-id)
+skips the lines that were already committed. Secondary indexes are
+dropped during the load and rebuilt at the end; pass --no-defer-indexes
+when the server is serving queries from the same database.
+"""
+import argparse
+import gzip
+import sys
+from pathlib import Path
+
+DB_FILE = "data/logs.db"
+
+def open_input(path: str):
+    if path == "-":
+        return sys.stdin.buffer
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import JSONL logs (legacy or exported NDJSON).")
+    parser.add_argument("file", help="JSONL/NDJSON file, optionally .gz, or - for stdin")
+    parser.add_argument("--db", default=DB_FILE, help="database file (default: data/logs.db)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="lines per transaction")
+    parser.add_argument("--import-id", default=None,
+                        help="resume key (default: the file's absolute path; stdin imports aren't resumable without it)")
+    parser.add_argument("--no-defer-indexes", action="store_true",
+                        help="keep secondary indexes and search indexing live during the import")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+    import logger
+    from importer import IMPORT_CHUNK_SIZE, LogImporter
+
+    logger.DB_FILE = Path(args.db)
+    logger.init_db()
+
+    import_id = args.import_id
+    if import_id is None and args.file != "-":
+        import_id = f"file:{Path(args.file).resolve()}"
+    importer = LogImporter(import_id=import_id, chunk_size=args.chunk_size or IMPORT_CHUNK_SIZE)
+    if importer.resume_from:
+        print(f"Resuming {import_id} after line {importer.resume_from}")
+
+    try:
+        with open_input(args.file) as f:
+            if args.no_defer_indexes:
+                importer.import_lines(f, progress=True)
+            else:
+                with logger.deferred_indexes():
+                    importer.import_lines(f, progress=True)
+                print("Rebuilt indexes, updating the search index...")
+                logger.catch_up_search_index()
+    finally:
+        logger.close_db()
+
+    for sample in importer.error_samples:
+        print(f"  skipped {sample}")
+    print(f"Imported {importer.imported} logs ({importer.errors} bad lines).")
+
+if __name__ == "__main__":
+    main()
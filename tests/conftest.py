@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import logger  # noqa: E402
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    A fresh logs.db for one test.
+
+    The backend resolves ../data relative to its working directory (it is
+    started from backend/), so tests run from an empty directory next to a
+    temporary data directory.
+    """
+    workdir = tmp_path / "backend"
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    logger.close_db()
+    logger.init_db()
+    yield logger
+    logger.stop_log_writer()
+    logger.close_db()
+
+def add_logs(rows):
+    """Write (timestamp, tag, prompt) rows synchronously; returns their ids."""
+    with logger.get_db().writer() as conn:
+        first_id = logger._insert_logs(conn, [
+            logger._log_row(timestamp, "ollama:test", prompt, '"ok"', 10.0, None, {}, tag)
+            for timestamp, tag, prompt in rows
+        ])
+    return list(range(first_id, first_id + len(rows)))
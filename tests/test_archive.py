@@ -0,0 +1,73 @@
+import archive
+import logger
+from conftest import add_logs
+
+def _add_months():
+    """Eight logs in each of January and February 2024 and four recent ones."""
+    rows = [(f"2024-01-{day:02d}T12:00:00", "jan", f"january {day}") for day in range(1, 9)]
+    rows += [(f"2024-02-{day:02d}T12:00:00", "feb", f"february {day}") for day in range(1, 9)]
+    rows += [(f"2099-01-0{day}T12:00:00", "now", f"recent {day}") for day in range(1, 5)]
+    return add_logs(rows)
+
+def _page_through(limit, **filters):
+    ids, before_id = [], None
+    while True:
+        page = logger.get_logs(limit=limit, before_id=before_id, **filters)
+        if not page:
+            return ids
+        ids += [log["id"] for log in page]
+        before_id = page[-1]["id"]
+
+def test_keyset_pagination_spans_partitions(db):
+    ids = _add_months()
+    archive.archive_partition("2024-01")
+    archive.archive_partition("2024-02", compress=True)
+    with logger.get_db().reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 4
+    expected = sorted(ids, reverse=True)
+    for limit in (3, 5, 20):
+        assert _page_through(limit) == expected
+    assert _page_through(3, tag="feb") == expected[4:12]
+    assert logger.count_logs() == len(ids)
+    assert logger.count_logs(start_date="2024-01-05T00:00:00", end_date="2024-02-02T23:59:59") == 6
+    newer = logger.get_logs(limit=5, after_id=ids[5])
+    assert sorted(log["id"] for log in newer) == ids[6:11]
+
+def test_locked_logs_stay_in_logs_db(db):
+    ids = _add_months()
+    logger.toggle_log_lock(ids[0], True)
+    partition = archive.archive_partition("2024-01")
+    assert partition["rows"] == 7
+    assert logger.get_log(ids[0])["locked"]
+    assert _page_through(4) == sorted(ids, reverse=True)
+
+def test_lock_taken_during_the_move_keeps_the_row(db, monkeypatch):
+    ids = _add_months()
+    finish = archive.finish_partition_moves
+
+    def lock_then_finish():
+        # The archive copy is built; the row gets locked before it is deleted from logs.db
+        logger.toggle_log_lock(ids[2], True)
+        return finish()
+
+    monkeypatch.setattr(archive, "finish_partition_moves", lock_then_finish)
+    partition = archive.archive_partition("2024-01")
+    assert partition["rows"] == 7
+    with logger.get_db().reader() as conn:
+        assert conn.execute("SELECT locked FROM logs WHERE id = ?", (ids[2],)).fetchone()[0]
+    assert _page_through(6) == sorted(ids, reverse=True)
+    assert logger.count_logs() == len(ids)
+    assert logger.count_logs(tag="jan") == 8
+
+def test_locking_an_archived_log_moves_it_back(db):
+    ids = _add_months()
+    archive.archive_partition("2024-01")
+    archive.archive_partition("2024-02", compress=True)
+    for log_id in (ids[3], ids[10]):
+        assert archive.set_archived_lock(log_id, True)
+        assert logger.get_log(log_id)["locked"]
+    assert archive.set_archived_lock(ids[-1], True) is False  # Not archived
+    assert _page_through(5) == sorted(ids, reverse=True)
+    assert logger.count_logs() == len(ids)
+    assert logger.count_logs(q="january") == 8
+    assert [p["rows"] for p in logger.list_partitions()] == [7, 7]
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+
+import logger
+from cache import ResponseCache
+from service import LLMService, ProviderError
+
+MODEL = "ollama:test"
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+class FakeProvider:
+    """Stands in for LLMService._call_hedged: counts calls, answers after ``delay``."""
+
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self, model, messages, temperature, stats, hedge=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return "reply", dict(USAGE)
+
+@pytest.fixture
+def service(db):
+    svc = LLMService()
+    svc.cache = None
+    yield svc
+    asyncio.run(svc.aclose())
+
+def _log_rows():
+    with logger.get_db().reader() as conn:
+        return [
+            (row[0], json.loads(row[1]))
+            for row in conn.execute("SELECT error, metadata FROM logs ORDER BY id")
+        ]
+
+def test_identical_requests_share_one_call_at_temperature_zero(service):
+    provider = service._call_hedged = FakeProvider()
+
+    async def main():
+        return await asyncio.gather(*(service.generate("hi", MODEL, temperature=0) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["reply"] * 3
+    assert provider.calls == 1
+    rows = _log_rows()
+    assert sorted(metadata["coalesced"] for _, metadata in rows) == [False, True, True]
+    # Only the call that went upstream spent tokens
+    assert sum(metadata["usage"].get("total_tokens", 0) for _, metadata in rows) == 15
+
+def test_sampling_requests_are_not_coalesced_by_default(service):
+    provider = service._call_hedged = FakeProvider()
+
+    async def main():
+        await asyncio.gather(*(service.generate("hi", MODEL, temperature=0.7) for _ in range(3)))
+        await asyncio.gather(*(service.generate("hi", MODEL, temperature=0.7, coalesce=True) for _ in range(3)))
+
+    asyncio.run(main())
+    assert provider.calls == 4
+
+def test_leader_error_reaches_every_waiting_request(service):
+    provider = service._call_hedged = FakeProvider(error=ProviderError("upstream down", status_code=503))
+
+    async def main():
+        return await asyncio.gather(
+            *(service.generate("hi", MODEL, temperature=0) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert provider.calls == 1
+    assert all(isinstance(result, ProviderError) for result in results)
+    rows = _log_rows()
+    assert [error for error, _ in rows] == ["upstream down"] * 3
+    assert sorted(metadata["coalesced"] for _, metadata in rows) == [False, True, True]
+    assert not service._inflight
+
+def test_cancelled_leader_lets_waiting_requests_call_themselves(service):
+    provider = service._call_hedged = FakeProvider(delay=0.1)
+
+    async def main():
+        leader = asyncio.create_task(service.generate("hi", MODEL, temperature=0))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(service.generate("hi", MODEL, temperature=0))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "reply"
+    assert provider.calls == 2
+    assert sorted(error or "" for error, _ in _log_rows()) == ["", "Cancelled"]
+
+def test_cache_hits_spend_no_tokens(service):
+    service.cache = ResponseCache(max_bytes=1 << 20, ttl_seconds=60, persistent=False)
+    provider = service._call_hedged = FakeProvider()
+
+    async def main():
+        await service.generate("hi", MODEL, temperature=0)
+        await service.generate("hi", MODEL, temperature=0)
+
+    asyncio.run(main())
+    assert provider.calls == 1
+    (_, first), (_, second) = _log_rows()
+    assert first["usage"] == USAGE
+    assert second["cache"] == "hit"
+    assert second["usage"] == {}
+    assert second["reused_usage"] == USAGE
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import logger
+from export import ndjson_chunks
+from importer import LogImporter
+
+def _lines(count):
+    return [
+        json.dumps({"timestamp": f"2024-03-01T00:00:{i:02d}", "model": "ollama:test", "prompt": f"line {i}", "response": "ok"})
+        for i in range(count)
+    ]
+
+def _prompts():
+    with logger.get_db().reader() as conn:
+        return [row[0] for row in conn.execute("SELECT log_body(prompt) FROM logs ORDER BY id")]
+
+def _interrupted(lines, after):
+    for i, line in enumerate(lines):
+        if i == after:
+            raise KeyboardInterrupt
+        yield line
+
+def test_interrupted_import_resumes_without_duplicates(db):
+    lines = _lines(10)
+    with pytest.raises(KeyboardInterrupt):
+        LogImporter(import_id="test", chunk_size=3).import_lines(_interrupted(lines, 7))
+    # Two full chunks were committed before the interruption
+    assert len(_prompts()) == 6
+
+    importer = LogImporter(import_id="test", chunk_size=3)
+    progress = importer.import_lines(lines)
+    assert progress["skipped"] == 6
+    assert progress["imported"] == 4
+    assert _prompts() == [f"line {i}" for i in range(10)]
+
+    # A finished import is a no-op
+    progress = LogImporter(import_id="test", chunk_size=3).import_lines(lines)
+    assert progress["imported"] == 0
+    assert len(_prompts()) == 10
+
+def test_bad_lines_are_counted_and_skipped(db):
+    lines = _lines(3) + ["{not json", "[1, 2]", ""]
+    progress = LogImporter().import_lines(lines)
+    assert progress["imported"] == 3
+    assert progress["errors"] == 2
+    assert len(progress["error_samples"]) == 2
+
+def test_export_round_trip_keeps_schemas_and_locks(db):
+    logger.log_llm_call("ollama:test", "with schema", {"a": 1}, 0, metadata={"schema": "a:int"}, tag="t")
+    logger.log_llm_call("ollama:test", "plain", "text", 0, tag="t")
+    with logger.get_db().writer() as conn:
+        conn.execute("UPDATE logs SET locked = 1 WHERE prompt = 'plain'")
+    exported = b"".join(ndjson_chunks(logger.export_logs())).splitlines()
+    assert len(exported) == 2
+
+    with logger.get_db().writer() as conn:
+        conn.execute("DELETE FROM logs")
+    progress = LogImporter().import_lines(exported)
+    assert progress["imported"] == 2
+    assert progress["unresolved_schemas"] == 0
+    logs = {log["prompt"]: logger.get_log(log["id"]) for log in logger.get_logs(full=True)}
+    assert logs["with schema"]["schema"] == "a:int"
+    assert logs["plain"]["locked"]
+
+def test_schema_ids_without_text_are_reported(db):
+    line = json.dumps({"timestamp": "2024-03-01T00:00:00", "model": "ollama:test", "prompt": "old", "schema_id": 7})
+    progress = LogImporter().import_lines([line])
+    assert progress["imported"] == 1
+    assert progress["unresolved_schemas"] == 1
@@ -0,0 +1,62 @@
+import logger
+from conftest import add_logs
+
+ROWS = [
+    ("2024-03-01T08:00:00", "a", "first"),
+    ("2024-03-01T09:00:00", "a", "second"),
+    ("2024-03-01T10:00:00", None, "untagged"),
+    ("2024-03-02T08:00:00", "b", "third"),
+    ("2024-03-03T23:59:59", "a", "fourth"),
+]
+
+def _counters():
+    with logger.get_db().reader() as conn:
+        counted = {
+            (row[0], row[1]): (row[2], row[3])
+            for row in conn.execute("SELECT day, tag, count, locked FROM log_counts WHERE count > 0")
+        }
+        actual = {
+            (row[0], row[1]): (row[2], row[3])
+            for row in conn.execute('''
+                SELECT substr(timestamp, 1, 10), COALESCE(tag, ''), COUNT(*), SUM(IFNULL(locked, 0) != 0)
+                FROM logs GROUP BY 1, 2
+            ''')
+        }
+    return counted, actual
+
+def test_counters_match_count_after_inserts(db):
+    add_logs(ROWS)
+    counted, actual = _counters()
+    assert counted == actual
+    assert logger.count_logs() == len(ROWS)
+    assert logger.count_logs(tag="a") == 3
+
+def test_counters_follow_locks_updates_and_deletes(db):
+    ids = add_logs(ROWS)
+    logger.toggle_log_lock(ids[0], True)
+    logger.toggle_log_lock(ids[3], True)
+    logger.toggle_log_lock(ids[3], False)
+    with logger.get_db().writer() as conn:
+        conn.execute("UPDATE logs SET tag = 'moved', timestamp = '2024-03-05T00:00:00' WHERE id = ?", (ids[1],))
+        conn.execute("DELETE FROM logs WHERE id = ?", (ids[2],))
+    counted, actual = _counters()
+    assert counted == actual
+    assert counted[("2024-03-01", "a")] == (1, 1)
+
+def test_counters_match_after_purges(db):
+    ids = add_logs(ROWS)
+    logger.toggle_log_lock(ids[0], True)
+    logger.purge_logs_by_count(1)
+    counted, actual = _counters()
+    assert counted == actual
+    # The locked row survives the purge and still counts
+    assert logger.count_logs() == 2
+
+def test_date_range_counts_match_rows(db):
+    add_logs(ROWS)
+    start, end = "2024-03-01T09:30:00", "2024-03-03T12:00:00"
+    with logger.get_db().reader() as conn:
+        expected = conn.execute(
+            "SELECT COUNT(*) FROM logs WHERE timestamp >= ? AND timestamp <= ?", (start, end)
+        ).fetchone()[0]
+    assert logger.count_logs(start_date=start, end_date=end) == expected
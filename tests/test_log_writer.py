@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+import logger
+from logger import LogWriter
+
+def _row(i):
+    return logger._log_row(f"2024-01-01T00:00:{i % 60:02d}", "ollama:test", f"prompt {i}", '"ok"', 1.0, None, {}, "writer")
+
+def _count():
+    with logger.get_db().reader() as conn:
+        return conn.execute("SELECT COUNT(*) FROM logs WHERE tag = 'writer'").fetchone()[0]
+
+def test_rows_are_written_in_batches(db, monkeypatch):
+    batches = []
+    write_logs = logger._write_logs
+    monkeypatch.setattr(logger, "_write_logs", lambda rows: (batches.append(len(rows)), write_logs(rows)))
+    writer = LogWriter(batch_size=10, flush_interval=1.0)
+    for i in range(25):
+        writer.submit(_row(i))
+    writer.start()
+    writer.flush()
+    writer.stop()
+    assert batches == [10, 10, 5]
+    assert _count() == 25
+
+def test_partial_batch_is_flushed_after_the_interval(db):
+    writer = LogWriter(batch_size=100, flush_interval=0.05)
+    writer.start()
+    writer.submit(_row(0))
+    deadline = time.monotonic() + 2
+    while _count() == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+    assert _count() == 1
+
+def test_stop_drains_the_queue(db):
+    writer = LogWriter(batch_size=3, flush_interval=1.0)
+    for i in range(7):
+        writer.submit(_row(i))
+    writer.start()
+    writer.stop()
+    assert _count() == 7
+
+def test_full_queue_writes_inline_instead_of_dropping(db, monkeypatch):
+    monkeypatch.setattr(logger, "LOG_QUEUE_PUT_TIMEOUT", 0.05)
+    writer = LogWriter(max_queue=2)  # Not started: nothing drains the queue
+    for i in range(5):
+        writer.submit(_row(i))
+    assert writer.qsize() == 2
+    assert _count() == 3
+    writer.start()
+    writer.stop()
+    assert _count() == 5
+
+def test_full_queue_blocks_until_space_frees_up(db):
+    writer = LogWriter(batch_size=1, flush_interval=0.01, max_queue=1)
+    writer.submit(_row(0))
+    started = time.monotonic()
+    threading.Timer(0.2, writer.start).start()
+    writer.submit(_row(1))  # Waits for the writer to take the first row
+    assert time.monotonic() - started >= 0.15
+    writer.stop()
+    assert _count() == 2
+
+def test_submit_async_waits_off_the_event_loop(db, monkeypatch):
+    monkeypatch.setattr(logger, "LOG_QUEUE_PUT_TIMEOUT", 0.3)
+    writer = LogWriter(max_queue=1)
+    writer.submit(_row(0))
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await writer.submit_async(_row(1))  # Queue full: waits, then writes inline
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 10
+    writer.start()
+    writer.stop()
+    assert _count() == 2
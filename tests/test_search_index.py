@@ -0,0 +1,55 @@
+import json
+
+import logger
+from conftest import add_logs
+from importer import LogImporter
+
+def _index_state(conn):
+    """Search results plus FTS5's averages record, which a stray 'delete' skews."""
+    averages = conn.execute("SELECT block FROM logs_fts_data WHERE id = 1").fetchone()[0]
+    matches = {
+        term: [row[0] for row in conn.execute(
+            "SELECT rowid FROM logs_fts WHERE logs_fts MATCH ? ORDER BY rowid", (term,)
+        )]
+        for term in ("apple", "banana", "cherry", "tagged")
+    }
+    return averages, matches
+
+def assert_index_consistent():
+    with logger.get_db().writer() as conn:
+        before = _index_state(conn)
+        conn.execute("INSERT INTO logs_fts (logs_fts) VALUES ('rebuild')")
+        after = _index_state(conn)
+    assert before == after
+
+def test_index_follows_inserts_updates_and_deletes(db):
+    ids = add_logs([
+        ("2024-03-01T08:00:00", "tagged", "apple pie"),
+        ("2024-03-01T09:00:00", None, "banana split"),
+        ("2024-03-01T10:00:00", None, "cherry tart"),
+    ])
+    with logger.get_db().writer() as conn:
+        conn.execute("UPDATE logs SET prompt = 'banana bread' WHERE id = ?", (ids[0],))
+        conn.execute("DELETE FROM logs WHERE id = ?", (ids[2],))
+    logger.toggle_log_lock(ids[1], True)
+    assert_index_consistent()
+    assert [log["id"] for log in logger.get_logs(q="banana")] == sorted(ids[:2], reverse=True)
+    assert logger.get_logs(q="cherry") == []
+
+def test_deletes_during_a_deferred_import_keep_the_index_intact(db):
+    add_logs([("2024-03-01T08:00:00", None, "apple pie")])
+    lines = [json.dumps({"timestamp": "2024-03-02T08:00:00", "model": "ollama:test", "prompt": f"cherry {i}"}) for i in range(5)]
+    with logger.deferred_indexes():
+        LogImporter().import_lines(lines)
+        # Retention can delete imported rows before they are indexed
+        with logger.get_db().writer() as conn:
+            conn.execute("DELETE FROM logs WHERE prompt = 'cherry 0'")
+    assert logger.catch_up_search_index() == 4
+    assert_index_consistent()
+    assert len(logger.get_logs(q="cherry")) == 4
+
+def test_purges_keep_the_index_intact(db):
+    add_logs([("2024-03-01T08:00:00", None, f"apple {i}") for i in range(20)])
+    logger.purge_logs_by_count(5, batch_size=4)
+    assert_index_consistent()
+    assert logger.count_logs(q="apple") == 5